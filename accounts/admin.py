@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .forms import CustomUserCreationForm, CustomUserChangeForm
-from .models import CustomUser, UserProfile
+from .models import CustomUser, StatisticsSnapshot, UserProfile
 
 
 class CustomUserAdmin(UserAdmin):
@@ -19,3 +19,9 @@ class CustomUserAdmin(UserAdmin):
 
 admin.site.register(UserProfile)
 admin.site.register(CustomUser, CustomUserAdmin)
+
+
+@admin.register(StatisticsSnapshot)
+class StatisticsSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['name', 'computed_at', 'compute_seconds']
+    readonly_fields = ['name', 'data', 'computed_at', 'compute_seconds']
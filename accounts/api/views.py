@@ -351,14 +351,14 @@ def dashboard_data(request):
         if user_type == 'student':
             from students.models import Student, AcademicRecord
             from courses.models import CourseEnrollment
-            from attendance.models import Attendance
+            from attendance.analytics import attendance_totals
             
             student = Student.objects.filter(user=user).first()
             if student:
                 enrollments_count = CourseEnrollment.objects.filter(student=student).count()
-                attendance_records = Attendance.objects.filter(student=student)
-                present_count = attendance_records.filter(status='present').count()
-                total_attendance = attendance_records.count()
+                attendance = attendance_totals(student_ids=[user.id])
+                present_count = attendance['days_present']
+                total_attendance = attendance['total_days']
                 attendance_rate = (present_count / total_attendance * 100) if total_attendance > 0 else 0
                 
                 stats = {
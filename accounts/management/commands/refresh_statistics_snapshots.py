@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.snapshots import refresh_snapshot, registered_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Recompute statistics snapshots (all of them, or the names given)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Snapshot names; defaults to every registered snapshot')
+
+    def handle(self, *args, **options):
+        names = options['names'] or registered_snapshots()
+        unknown = set(names) - set(registered_snapshots())
+        if unknown:
+            raise CommandError(f"Unknown snapshots: {', '.join(sorted(unknown))}")
+
+        for name in names:
+            snapshot = refresh_snapshot(name)
+            self.stdout.write(self.style.SUCCESS(
+                f'Refreshed {name} in {snapshot.compute_seconds:.2f}s'
+            ))
@@ -1,4 +1,5 @@
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 
@@ -64,3 +65,18 @@ class UserProfile(models.Model):
                     'date_joined': timezone.now().date()
                 }
             )
+
+
+class StatisticsSnapshot(models.Model):
+    """Precomputed payload for a statistics endpoint, maintained by accounts.snapshots"""
+    name = models.CharField(max_length=100, unique=True)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    computed_at = models.DateTimeField()
+    compute_seconds = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"{self.name} snapshot ({self.computed_at})"
+
+    @property
+    def age_seconds(self):
+        return (timezone.now() - self.computed_at).total_seconds()
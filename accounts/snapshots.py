@@ -0,0 +1,93 @@
+"""
+Statistics snapshots.
+
+Dashboard statistics are expensive to compute and cheap to serve stale.
+An app registers a compute function under a name in its ``snapshots.py``
+module (discovered at startup)::
+
+    @register_snapshot('courses', max_age=600)
+    def course_statistics():
+        return {...}  # JSON-serializable
+
+and its ``statistics`` action returns ``snapshot_response(request, 'courses')``.
+The payload is stored in ``StatisticsSnapshot`` and served with its age;
+it is recomputed by ``manage.py refresh_statistics_snapshots`` (run from
+cron or any scheduler), inline when missing or older than ``max_age``,
+or when an admin passes ``?fresh=1``.
+"""
+
+import time
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .models import StatisticsSnapshot
+
+DEFAULT_MAX_AGE = 60 * 15
+
+_registry = {}
+
+
+def register_snapshot(name, max_age=DEFAULT_MAX_AGE):
+    """Decorator registering ``compute()`` as the snapshot called ``name``"""
+    def decorator(compute):
+        _registry[name] = (compute, max_age)
+        return compute
+    return decorator
+
+
+def registered_snapshots():
+    return sorted(_registry)
+
+
+def refresh_snapshot(name):
+    """Compute and store one snapshot; returns the saved StatisticsSnapshot"""
+    compute, _ = _registry[name]
+    started = time.monotonic()
+    data = compute()
+    elapsed = time.monotonic() - started
+
+    with transaction.atomic():
+        snapshot, _ = StatisticsSnapshot.objects.update_or_create(
+            name=name,
+            defaults={'data': data, 'computed_at': timezone.now(), 'compute_seconds': elapsed},
+        )
+    return snapshot
+
+
+def get_snapshot(name, fresh=False):
+    """The stored snapshot, recomputed if ``fresh``, missing or too old"""
+    if name not in _registry:
+        raise KeyError(f"No statistics snapshot registered as '{name}'")
+    _, max_age = _registry[name]
+
+    if not fresh:
+        snapshot = StatisticsSnapshot.objects.filter(name=name).first()
+        if snapshot is not None and snapshot.age_seconds <= max_age:
+            return snapshot
+    return refresh_snapshot(name)
+
+
+def wants_fresh(request):
+    """Only admins may force a recompute with ?fresh=1"""
+    user = request.user
+    return (
+        request.query_params.get('fresh', '').lower() in ['1', 'true', 'yes']
+        and (user.is_staff or user.is_superuser)
+    )
+
+
+def snapshot_response(request, name):
+    """Response with the snapshot payload plus a ``snapshot`` block giving its age"""
+    snapshot = get_snapshot(name, fresh=wants_fresh(request))
+    age = max(int(snapshot.age_seconds), 0)
+
+    data = dict(snapshot.data)
+    data['snapshot'] = {
+        'computed_at': snapshot.computed_at.isoformat(),
+        'age_seconds': age,
+    }
+    response = Response(data)
+    response['Age'] = str(age)
+    return response
@@ -1,7 +1,8 @@
 from django.contrib import admin
-from .models import Attendance, AttendanceReport
+from .models import Attendance, AttendanceReport, AttendanceRollup
 
 admin.site.register(Attendance)
 admin.site.register(AttendanceReport)
+admin.site.register(AttendanceRollup)
 
 # Register your models here.
@@ -0,0 +1,35 @@
+"""
+Deferred low attendance checks.
+
+Marking attendance only records which students were touched; the alert
+evaluation (one grouped query that queues emails in the communication
+outbox) runs once per batch after the transaction commits. The emails
+themselves are sent by the ``send_queued_email`` worker, so requests
+never wait on the mail server.
+"""
+
+import logging
+
+from django.db import transaction
+
+from .models import Attendance
+
+logger = logging.getLogger(__name__)
+
+
+def queue_low_attendance_check(student_ids, threshold=0.75):
+    """Schedule one low attendance evaluation for ``student_ids`` after commit"""
+    student_ids = sorted(set(student_ids))
+    if not student_ids:
+        return
+
+    transaction.on_commit(lambda: run_low_attendance_check(student_ids, threshold))
+
+
+def run_low_attendance_check(student_ids, threshold=0.75):
+    """Never raises, so a failed check can't break the request that triggered it"""
+    try:
+        return Attendance.check_low_attendance_batch(student_ids, threshold)
+    except Exception:
+        logger.exception('Low attendance check failed for %d students', len(student_ids))
+        return []
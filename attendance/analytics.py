@@ -0,0 +1,239 @@
+"""
+Set-based attendance aggregations used by the attendance API.
+Every helper here returns a queryset or issues a fixed number of queries,
+independent of how many students or days are involved.
+"""
+
+from collections import defaultdict, deque
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Case, CharField, Count, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast, TruncMonth
+
+from .models import Attendance, AttendanceRollup, month_start, next_month
+
+
+# Severity bands for low attendance alerts as (name, rate upper bound).
+# A student falls in the first band whose bound is above their rate;
+# anyone below the threshold but above every band is a 'warning'.
+DEFAULT_SEVERITY_BANDS = [
+    ('critical', 0.50),
+    ('severe', 0.65),
+]
+
+
+def parse_severity_bands(value):
+    """
+    Parse a ``name:upper,name:upper`` query parameter into severity bands.
+    Raises ValueError on malformed input.
+    """
+    if not value:
+        return list(DEFAULT_SEVERITY_BANDS)
+
+    bands = []
+    for part in value.split(','):
+        name, _, upper = part.partition(':')
+        name = name.strip()
+        if not name or not upper:
+            raise ValueError(f"Invalid severity band '{part}'. Use name:rate")
+        bands.append((name, float(upper)))
+
+    return sorted(bands, key=lambda band: band[1])
+
+
+def student_attendance_rates(queryset, school_days=None):
+    """
+    Group attendance rows per student in a single aggregation with
+    total/present day counts and the attendance rate (0-1). With
+    ``school_days``, that is every student's total instead of their
+    number of rows.
+    """
+    total_days = Count('id') if school_days is None else Value(school_days)
+    return queryset.values(
+        'student', 'student__username', 'student__first_name', 'student__last_name'
+    ).annotate(
+        total_days=total_days,
+        present_days=Count('id', filter=Q(is_present=True)),
+    ).annotate(
+        attendance_rate=Cast('present_days', FloatField()) / Cast('total_days', FloatField())
+    )
+
+
+def low_attendance_queryset(queryset, threshold, bands=None, school_days=None):
+    """
+    Students whose attendance rate is below ``threshold``, annotated with a
+    severity band and ordered worst first (ties broken by student id).
+    Pass ``school_days`` (and a ``queryset`` restricted to those days) to
+    rate students against the calendar rather than their recorded days.
+    """
+    if bands is None:
+        bands = DEFAULT_SEVERITY_BANDS
+
+    severity = Case(
+        *[When(attendance_rate__lt=upper, then=Value(name)) for name, upper in bands if upper < threshold],
+        default=Value('warning'),
+        output_field=CharField(),
+    )
+
+    return student_attendance_rates(queryset, school_days).filter(
+        attendance_rate__lt=threshold
+    ).annotate(severity=severity).order_by('attendance_rate', 'student')
+
+
+def format_student_rate(row, threshold=None):
+    """Turn one row of ``student_attendance_rates`` into an API payload"""
+    full_name = f"{row['student__first_name']} {row['student__last_name']}".strip()
+    data = {
+        'student_id': row['student'],
+        'student_name': full_name or row['student__username'],
+        'total_days': row['total_days'],
+        'present_days': row['present_days'],
+        'attendance_rate': round(row['attendance_rate'] * 100, 2),
+    }
+    if 'severity' in row:
+        data['severity'] = row['severity']
+    if threshold is not None:
+        data['threshold'] = threshold * 100
+    return data
+
+
+def daily_trend_series(queryset, start_date, end_date, holiday_dates=(), moving_average=None, week_over_week=False):
+    """
+    Build a contiguous day-by-day attendance series from one grouped query.
+
+    Days without records are filled in; dates in ``holiday_dates`` are
+    flagged as non-school days with no rate instead of counting as 0%.
+    The optional moving average (over school days, ``moving_average`` days
+    wide) and week-over-week change are computed in the same pass.
+    """
+    counts = {
+        row['date']: row
+        for row in queryset.filter(date__range=[start_date, end_date]).values('date').annotate(
+            total=Count('id'),
+            present=Count('id', filter=Q(is_present=True))
+        )
+    }
+    holiday_dates = set(holiday_dates)
+
+    series = []
+    window = deque(maxlen=moving_average) if moving_average else None
+    current_date = start_date
+    while current_date <= end_date:
+        row = counts.get(current_date, {'total': 0, 'present': 0})
+        is_school_day = current_date not in holiday_dates
+        rate = None
+        if is_school_day:
+            rate = round(row['present'] / row['total'] * 100, 2) if row['total'] > 0 else 0
+
+        entry = {
+            'date': current_date.isoformat(),
+            'is_school_day': is_school_day,
+            'total_students': row['total'],
+            'present_students': row['present'],
+            'attendance_rate': rate,
+        }
+
+        if window is not None:
+            if rate is not None:
+                window.append(rate)
+            entry['moving_average'] = round(sum(window) / len(window), 2) if window else None
+
+        if week_over_week:
+            previous = series[-7]['attendance_rate'] if len(series) >= 7 else None
+            entry['week_over_week_change'] = (
+                round(rate - previous, 2) if rate is not None and previous is not None else None
+            )
+
+        series.append(entry)
+        current_date += timedelta(days=1)
+
+    return series
+
+
+def attendance_totals(start_date=None, end_date=None, student_ids=None, group_by=None):
+    """
+    Total/present day counts over an optional date range.
+
+    Whole months are read from ``AttendanceRollup``; only the partial months
+    at either edge of the range touch raw attendance rows, so this is at most
+    two grouped queries however long the range is. Returns
+    ``{'total_days', 'days_present'}``, or a dict of those keyed by student
+    id or month start when ``group_by`` is ``'student'`` or ``'month'``.
+    """
+    # Whole months are those starting on/after start_date and ending on/before end_date
+    rollup_from = None
+    if start_date is not None:
+        rollup_from = start_date if start_date.day == 1 else next_month(start_date)
+    rollup_to = None
+    if end_date is not None:
+        rollup_to = month_start(end_date + timedelta(days=1))
+
+    rollups = AttendanceRollup.objects.all()
+    raw = Attendance.objects.all()
+    if student_ids is not None:
+        rollups = rollups.filter(student_id__in=student_ids)
+        raw = raw.filter(student_id__in=student_ids)
+
+    raw_dates = Q()
+    if rollup_from is not None and rollup_to is not None and rollup_from >= rollup_to:
+        # The range sits inside a single month
+        rollups = None
+        raw_dates = Q(date__range=[start_date, end_date])
+    else:
+        if rollup_from is not None:
+            rollups = rollups.filter(month__gte=rollup_from)
+            if start_date < rollup_from:
+                raw_dates |= Q(date__gte=start_date, date__lt=rollup_from)
+        if rollup_to is not None:
+            rollups = rollups.filter(month__lt=rollup_to)
+            if rollup_to <= end_date:
+                raw_dates |= Q(date__gte=rollup_to, date__lte=end_date)
+
+    def grouped(queryset, **aggregates):
+        if group_by is None:
+            return [queryset.aggregate(**aggregates)]
+        return queryset.values(group_by).annotate(**aggregates).order_by()
+
+    sources = []
+    if rollups is not None:
+        sources.append(grouped(rollups, total=Sum('total_days'), present=Sum('days_present')))
+    if raw_dates:
+        raw = raw.filter(raw_dates)
+        if group_by == 'month':
+            raw = raw.annotate(month=TruncMonth('date'))
+        sources.append(grouped(
+            raw,
+            total=Count('id'),
+            present=Count('id', filter=Q(is_present=True))
+        ))
+
+    totals = defaultdict(lambda: {'total_days': 0, 'days_present': 0})
+    for rows in sources:
+        for row in rows:
+            key = row[group_by] if group_by else None
+            totals[key]['total_days'] += row['total'] or 0
+            totals[key]['days_present'] += row['present'] or 0
+
+    if group_by:
+        return dict(totals)
+    return dict(totals[None])
+
+
+def class_attendance_summary(class_id, start_date, end_date, index):
+    """
+    Present-day counts for every student in a class over the school days
+    (per the WorkingDayIndex ``index``) of a date range, in one grouped
+    query joined to the user names. Students with no records in the range
+    are included with zero days present. Ordered lowest attendance first.
+    """
+    return get_user_model().objects.filter(
+        student__class_group_id=class_id
+    ).annotate(
+        days_present=Count(
+            'attendances',
+            filter=index.school_days_q(start_date, end_date, 'attendances__date') & Q(attendances__is_present=True)
+        )
+    ).values(
+        'id', 'username', 'first_name', 'last_name', 'days_present'
+    ).order_by('days_present', 'id')
@@ -116,24 +116,19 @@ class StudentAttendanceSummarySerializer(serializers.Serializer):
 
 class AttendanceDetailSerializer(serializers.ModelSerializer):
     """Detailed serializer for attendance with all related information"""
-    student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
-    student_grade = serializers.CharField(source='student.grade', read_only=True)
-    student_id = serializers.CharField(source='student.student_id', read_only=True)
-    is_late = serializers.SerializerMethodField()
-    attendance_status_display = serializers.CharField(source='get_attendance_status_display', read_only=True)
+    student_name = serializers.CharField(source='student.get_full_name', read_only=True)
+    student_username = serializers.CharField(source='student.username', read_only=True)
+    student_grade = serializers.CharField(source='student.student.grade', read_only=True)
+    student_id = serializers.CharField(source='student.student.student_id', read_only=True)
+    status = serializers.SerializerMethodField()
     
     class Meta:
         model = Attendance
         fields = [
-            'id', 'student', 'date', 'attendance_status', 'time_in', 
-            'time_out', 'notes', 'student_name', 'student_grade',
-            'student_id', 'is_late', 'attendance_status_display'
+            'id', 'student', 'date', 'is_present', 'status',
+            'student_name', 'student_username', 'student_grade', 'student_id'
         ]
         read_only_fields = ['id']
     
-    def get_is_late(self, obj):
-        """Check if student was late (arrived after 8:00 AM)"""
-        if obj.time_in:
-            from datetime import time
-            return obj.time_in > time(8, 0)  # Assuming school starts at 8:00 AM
-        return False
+    def get_status(self, obj):
+        return 'Present' if obj.is_present else 'Absent'
@@ -1,19 +1,33 @@
-from rest_framework import viewsets, filters, status
+from rest_framework import viewsets, filters, serializers, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import FormParser, MultiPartParser
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Count, Avg, Sum
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.db.models import Q, Count, Avg, Sum, Min, Max
 from django.utils import timezone
 from datetime import datetime, timedelta, date
+import io
 from collections import defaultdict
 from django.contrib.auth import get_user_model
+from teachers.models import Class
 from accounts.permissions import (
     IsOwnerOrAdmin, IsStaffOrAdmin, IsTeacherOrAdmin,
     IsStudentOrTeacherOrAdmin, CanAccessAttendance
 )
 
+from ..alerts import queue_low_attendance_check
+from ..analytics import (
+    low_attendance_queryset, parse_severity_bands, format_student_rate, daily_trend_series,
+    attendance_totals, class_attendance_summary
+)
+from ..charts import attendance_chart_data
+from ..imports import import_attendance_csv
+from ..exports import stream_csv, stream_json_object, stream_ndjson
 from ..models import Attendance, AttendanceReport, SchoolCalendar
+from ..working_days import get_working_day_index
 from .serializers import (
     AttendanceSerializer, AttendanceReportSerializer, SchoolCalendarSerializer,
     AttendanceDetailSerializer, AttendanceStatsSerializer
@@ -21,6 +35,21 @@ from .serializers import (
 
 User = get_user_model()
 
+EXPORT_COLUMNS = ['id', 'student_id', 'student_username', 'student_name', 'date', 'is_present']
+EXPORT_CHUNK_SIZE = 5000
+
+CLASS_SUMMARY_COLUMNS = ['student_id', 'student_name', 'total_days', 'days_present', 'attendance_rate']
+
+# The statistics endpoint's per-day series covers at most this many days
+DAILY_STATISTICS_DAYS = 31
+
+
+def parse_date_param(value):
+    """Parse an optional YYYY-MM-DD query parameter; raises ValueError if malformed"""
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
 
 class AttendanceViewSet(viewsets.ModelViewSet):
     """
@@ -41,7 +70,7 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         """
         Role-based permissions for attendance management
         """
-        if self.action in ['create', 'update', 'partial_update', 'destroy', 'bulk_mark']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'bulk_mark', 'import_csv']:
             # Teachers and staff/admins can create/update attendance records
             permission_classes = [IsTeacherOrAdmin]
         elif self.action in ['low_attendance_alerts', 'statistics', 'trends']:
@@ -117,10 +146,83 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         class_id = self.request.query_params.get('class_id')
         if class_id:
             queryset = queryset.filter(student__student__class_group_id=class_id)
-            queryset = queryset.filter(student__student__class_group_id=class_id)
         
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream every attendance record visible to the user as CSV (default)
+        or NDJSON (``output=ndjson``), in constant memory. Honors the same
+        scoping and filters as the list endpoint.
+        """
+        output = request.query_params.get('output', 'csv')
+        if output not in ('csv', 'ndjson'):
+            return Response(
+                {'error': "output must be 'csv' or 'ndjson'"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            parse_date_param(request.query_params.get('start_date'))
+            parse_date_param(request.query_params.get('end_date'))
+        except ValueError:
+            return Response(
+                {'error': 'Invalid date format. Use YYYY-MM-DD'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        rows = self.filter_queryset(self.get_queryset()).order_by('date', 'student_id').values_list(
+            'id', 'student_id', 'student__username', 'student__first_name', 'student__last_name',
+            'date', 'is_present'
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        
+        def records():
+            for record_id, student_id, username, first_name, last_name, day, is_present in rows:
+                yield {
+                    'id': record_id,
+                    'student_id': student_id,
+                    'student_username': username,
+                    'student_name': f"{first_name} {last_name}".strip() or username,
+                    'date': day.isoformat(),
+                    'is_present': is_present,
+                }
+        
+        if output == 'csv':
+            response = StreamingHttpResponse(stream_csv(EXPORT_COLUMNS, records()), content_type='text/csv')
+        else:
+            response = StreamingHttpResponse(stream_ndjson(records()), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="attendance.{output}"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def import_csv(self, request):
+        """
+        Import a multi-date attendance CSV uploaded as ``file`` with
+        ``student``, ``date`` and ``is_present`` columns. Returns row counts
+        and a per-row error report.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'error': 'A CSV file upload named "file" is required'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        text_file = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            report = import_attendance_csv(text_file)
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response(
+                {'error': f'Invalid CSV: {str(e)}'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        finally:
+            # Don't let the wrapper close the upload's file for Django
+            text_file.detach()
+        
+        return Response(report)
+
     @action(detail=False, methods=['post'])
     def bulk_mark(self, request):
         """Mark attendance for multiple students at once"""
@@ -141,36 +243,61 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        created_attendances = []
-        updated_attendances = []
         errors = []
-        
+        marks = {}
+        invalid_marks = []
+        is_present_field = serializers.BooleanField()
+
         for student_data in students_data:
             student_id = student_data.get('student_id')
-            is_present = student_data.get('is_present', False)
-            
+
             if not student_id:
                 errors.append('Missing student_id in student data')
                 continue
-            
+
             try:
-                attendance, created = Attendance.objects.update_or_create(
-                    student_id=student_id,
-                    date=attendance_date,
-                    defaults={'is_present': is_present}
-                )
-                
-                if created:
-                    created_attendances.append(AttendanceDetailSerializer(attendance).data)
-                else:
-                    updated_attendances.append(AttendanceDetailSerializer(attendance).data)
-                    
-                # Check for low attendance
-                Attendance.check_low_attendance(attendance.student)
-                
-            except Exception as e:
-                errors.append(f"Error for student {student_id}: {str(e)}")
-        
+                # bool('false') is True; accept only what a BooleanField would
+                is_present = is_present_field.to_internal_value(student_data.get('is_present', False))
+            except serializers.ValidationError:
+                invalid_marks.append(f"Error for student {student_id}: is_present must be true or false")
+                continue
+
+            try:
+                marks[int(student_id)] = is_present
+            except (TypeError, ValueError):
+                errors.append(f"Error for student {student_id}: invalid student_id")
+
+        if invalid_marks:
+            return Response({'error': 'Invalid is_present values', 'errors': invalid_marks},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        known_ids = set(User.objects.filter(id__in=marks.keys()).values_list('id', flat=True))
+        for student_id in [student_id for student_id in marks if student_id not in known_ids]:
+            errors.append(f"Error for student {student_id}: student does not exist")
+            del marks[student_id]
+
+        created_ids, updated_ids = [], []
+        if marks:
+            with transaction.atomic():
+                created_ids, updated_ids = Attendance.upsert_for_date(attendance_date, marks)
+                # Evaluated once for the whole batch, inline once the transaction commits
+                queue_low_attendance_check(marks.keys())
+
+        # Re-serialize everything that was written with a single query
+        created_set = set(created_ids)
+        created_attendances = []
+        updated_attendances = []
+        attendances = Attendance.objects.filter(
+            date=attendance_date,
+            student_id__in=marks.keys()
+        ).select_related('student').order_by('student_id')
+        for attendance in attendances:
+            data = AttendanceSerializer(attendance).data
+            if attendance.student_id in created_set:
+                created_attendances.append(data)
+            else:
+                updated_attendances.append(data)
+
         return Response({
             'created_attendances': created_attendances,
             'updated_attendances': updated_attendances,
@@ -190,12 +317,16 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        attendances = self.queryset.filter(student_id=student_id)
-        
-        # Apply date filtering
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-        
+        try:
+            start_date = parse_date_param(request.query_params.get('start_date'))
+            end_date = parse_date_param(request.query_params.get('end_date'))
+        except ValueError:
+            return Response(
+                {'error': 'Invalid date format. Use YYYY-MM-DD'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        attendances = self.queryset.filter(student_id=student_id).select_related('student__student')
         if start_date:
             attendances = attendances.filter(date__gte=start_date)
         if end_date:
@@ -203,9 +334,17 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         
         serializer = AttendanceDetailSerializer(attendances, many=True)
         
-        # Calculate statistics
-        total_days = attendances.count()
-        present_days = attendances.filter(is_present=True).count()
+        # Statistics are over the school days of the period; an open end is
+        # bounded by the student's first or last record
+        if not (start_date and end_date):
+            recorded = attendances.aggregate(first=Min('date'), last=Max('date'))
+            start_date = start_date or recorded['first']
+            end_date = end_date or recorded['last']
+        total_days = present_days = 0
+        if start_date and end_date:
+            index = get_working_day_index()
+            total_days = index.count_school_days(start_date, end_date)
+            present_days = attendances.filter(index.school_days_q(start_date, end_date), is_present=True).count()
         absent_days = total_days - present_days
         attendance_percentage = (present_days / total_days * 100) if total_days > 0 else 0
         
@@ -260,43 +399,64 @@ class AttendanceViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def low_attendance_alerts(self, request):
-        """Get students with low attendance"""
-        threshold = float(request.query_params.get('threshold', 0.75))
-        days_back = int(request.query_params.get('days', 30))
-        
-        start_date = timezone.now().date() - timedelta(days=days_back)
-        
-        # Get all students with attendance records in the period
-        students_with_low_attendance = []
-        
-        for user in User.objects.all():
-            attendances = self.queryset.filter(
-                student=user, 
-                date__gte=start_date
+        """
+        Get students with low attendance.
+        Rates are computed in one grouped query and paginated, so the
+        number of queries does not grow with the roster.
+        """
+        try:
+            threshold = float(request.query_params.get('threshold', 0.75))
+            days_back = int(request.query_params.get('days', 30))
+            bands = parse_severity_bands(request.query_params.get('bands'))
+        except ValueError as e:
+            return Response(
+                {'error': f'Invalid parameters: {str(e)}'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            
-            total_days = attendances.count()
-            present_days = attendances.filter(is_present=True).count()
-            
-            if total_days > 0:
-                attendance_rate = present_days / total_days
-                if attendance_rate < threshold:
-                    students_with_low_attendance.append({
-                        'student_id': user.id,
-                        'student_name': user.get_full_name() or user.username,
-                        'total_days': total_days,
-                        'present_days': present_days,
-                        'attendance_rate': round(attendance_rate * 100, 2),
-                        'threshold': threshold * 100
-                    })
-        
-        return Response({
+
+        end_date = timezone.now().date()
+        start_date = end_date - timedelta(days=days_back)
+
+        # Rates are present school days over the school days in the period
+        index = get_working_day_index()
+        school_days = index.count_school_days(start_date, end_date)
+        alerts = low_attendance_queryset(
+            Attendance.objects.filter(index.school_days_q(start_date, end_date)),
+            threshold,
+            bands,
+            school_days=school_days
+        )
+        if not school_days:
+            alerts = alerts.none()
+
+        severity = request.query_params.get('severity')
+        if severity:
+            alerts = alerts.filter(severity=severity)
+
+        page = self.paginate_queryset(alerts)
+        rows = page if page is not None else list(alerts)
+        students_with_low_attendance = [format_student_rate(row, threshold) for row in rows]
+
+        response_data = {
             'low_attendance_students': students_with_low_attendance,
             'threshold_percentage': threshold * 100,
+            'severity_bands': [
+                {'severity': name, 'below_percentage': upper * 100}
+                for name, upper in bands if upper < threshold
+            ],
             'period_days': days_back,
             'start_date': start_date.isoformat(),
             'total_flagged': len(students_with_low_attendance)
-        })
+        }
+
+        if page is not None:
+            response_data.update({
+                'total_flagged': self.paginator.page.paginator.count,
+                'next': self.paginator.get_next_link(),
+                'previous': self.paginator.get_previous_link(),
+            })
+
+        return Response(response_data)
 
     @action(detail=False, methods=['get'])
     def statistics(self, request):
@@ -304,21 +464,29 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         # Date range filtering
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
+        try:
+            start = parse_date_param(start_date)
+            end = parse_date_param(end_date)
+        except ValueError:
+            return Response(
+                {'error': 'Invalid date format. Use YYYY-MM-DD'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        queryset = self.queryset
-        if start_date:
-            queryset = queryset.filter(date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(date__lte=end_date)
-        
-        total_records = queryset.count()
-        present_records = queryset.filter(is_present=True).count()
+        totals = attendance_totals(start, end)
+        total_records = totals['total_days']
+        present_records = totals['days_present']
         absent_records = total_records - present_records
         
         overall_attendance_rate = (present_records / total_records * 100) if total_records > 0 else 0
         
-        # Daily attendance rates for the period
-        daily_stats = queryset.values('date').annotate(
+        # Daily attendance rates for the last DAILY_STATISTICS_DAYS of the
+        # period only; the totals above cover all of it
+        daily_end = end or timezone.now().date()
+        daily_start = daily_end - timedelta(days=DAILY_STATISTICS_DAYS - 1)
+        if start and start > daily_start:
+            daily_start = start
+        daily_stats = Attendance.objects.filter(date__range=[daily_start, daily_end]).values('date').annotate(
             total=Count('id'),
             present=Count('id', filter=Q(is_present=True))
         ).order_by('date')
@@ -327,16 +495,15 @@ class AttendanceViewSet(viewsets.ModelViewSet):
             day['attendance_rate'] = (day['present'] / day['total'] * 100) if day['total'] > 0 else 0
             day['date'] = day['date'].isoformat()
         
-        # Monthly statistics
-        monthly_stats = queryset.extra(
-            select={'month': "strftime('%%Y-%%m', date)"}
-        ).values('month').annotate(
-            total=Count('id'),
-            present=Count('id', filter=Q(is_present=True))
-        ).order_by('month')
-        
-        for month in monthly_stats:
-            month['attendance_rate'] = (month['present'] / month['total'] * 100) if month['total'] > 0 else 0
+        # Monthly statistics from the rollup
+        monthly_stats = []
+        for month, counts in sorted(attendance_totals(start, end, group_by='month').items()):
+            monthly_stats.append({
+                'month': month.strftime('%Y-%m'),
+                'total': counts['total_days'],
+                'present': counts['days_present'],
+                'attendance_rate': (counts['days_present'] / counts['total_days'] * 100) if counts['total_days'] > 0 else 0
+            })
         
         return Response({
             'overall_statistics': {
@@ -346,7 +513,11 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                 'overall_attendance_rate': round(overall_attendance_rate, 2)
             },
             'daily_statistics': list(daily_stats),
-            'monthly_statistics': list(monthly_stats),
+            'daily_period': {
+                'start_date': daily_start.isoformat(),
+                'end_date': daily_end.isoformat()
+            },
+            'monthly_statistics': monthly_stats,
             'period': {
                 'start_date': start_date,
                 'end_date': end_date
@@ -355,44 +526,52 @@ class AttendanceViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def trends(self, request):
-        """Get attendance trends over time"""
-        days_back = int(request.query_params.get('days', 30))
-        start_date = timezone.now().date() - timedelta(days=days_back)
-        
-        # Get daily attendance rates for the period
-        daily_trends = []
-        current_date = start_date
+        """
+        Get attendance trends over time.
+        Optional query params: moving_average=<window days>, week_over_week=true
+        """
+        try:
+            days_back = int(request.query_params.get('days', 30))
+            moving_average = int(request.query_params.get('moving_average', 0))
+        except ValueError:
+            return Response(
+                {'error': 'days and moving_average must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        week_over_week = request.query_params.get('week_over_week', '').lower() in ['true', '1', 'yes']
+
         end_date = timezone.now().date()
-        
-        while current_date <= end_date:
-            day_attendances = self.queryset.filter(date=current_date)
-            total = day_attendances.count()
-            present = day_attendances.filter(is_present=True).count()
-            rate = (present / total * 100) if total > 0 else 0
-            
-            daily_trends.append({
-                'date': current_date.isoformat(),
-                'total_students': total,
-                'present_students': present,
-                'attendance_rate': round(rate, 2)
-            })
-            
-            current_date += timedelta(days=1)
-        
-        # Calculate trend direction
-        if len(daily_trends) >= 2:
-            recent_avg = sum([d['attendance_rate'] for d in daily_trends[-7:]]) / min(7, len(daily_trends))
-            older_avg = sum([d['attendance_rate'] for d in daily_trends[:-7]]) / max(1, len(daily_trends) - 7)
+        start_date = end_date - timedelta(days=days_back)
+
+        daily_trends = daily_trend_series(
+            Attendance.objects.all(),
+            start_date,
+            end_date,
+            holiday_dates=get_working_day_index().non_school_days(start_date, end_date),
+            moving_average=moving_average or None,
+            week_over_week=week_over_week
+        )
+
+        # Calculate trend direction over school days only
+        school_day_rates = [d['attendance_rate'] for d in daily_trends if d['is_school_day']]
+        recent_avg = 0
+        if len(school_day_rates) >= 2:
+            recent = school_day_rates[-7:]
+            older = school_day_rates[:-7] or recent
+            recent_avg = sum(recent) / len(recent)
+            older_avg = sum(older) / len(older)
             trend_direction = 'improving' if recent_avg > older_avg else 'declining' if recent_avg < older_avg else 'stable'
         else:
             trend_direction = 'insufficient_data'
-        
+
         return Response({
             'daily_trends': daily_trends,
             'trend_analysis': {
                 'direction': trend_direction,
-                'recent_average': round(recent_avg, 2) if len(daily_trends) >= 2 else 0,
-                'period_days': days_back
+                'recent_average': round(recent_avg, 2),
+                'period_days': days_back,
+                'school_days': len(school_day_rates),
+                'non_school_days': len(daily_trends) - len(school_day_rates)
             }
         })
 
@@ -476,6 +655,12 @@ class AttendanceReportViewSet(viewsets.ModelViewSet):
         # Default: no access
         return queryset.none()
 
+    @action(detail=True, methods=['get'])
+    def chart(self, request, pk=None):
+        """Chart data for a report, for drawing client-side"""
+        report = self.get_object()
+        return Response(attendance_chart_data(report.total_days, report.days_present))
+
     @action(detail=False, methods=['post'])
     def generate_report(self, request):
         """Generate a new attendance report"""
@@ -499,14 +684,8 @@ class AttendanceReportViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get attendance records for the period
-        attendances = Attendance.objects.filter(
-            student=student,
-            date__range=[start_date, end_date]
-        )
-        
-        total_days = (end_date - start_date).days + 1
-        days_present = attendances.filter(is_present=True).count()
+        total_days = get_working_day_index().count_school_days(start_date, end_date)
+        days_present = attendance_totals(start_date, end_date, student_ids=[student.id])['days_present']
         
         # Create or update report
         report, created = AttendanceReport.objects.update_or_create(
@@ -529,10 +708,14 @@ class AttendanceReportViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def class_summary(self, request):
-        """Get attendance summary for all students in a class"""
+        """
+        Get attendance summary for all students in a class.
+        Pass ``export=csv`` or ``export=json`` to stream the summary as a download.
+        """
         class_id = request.query_params.get('class_id')
         start_date_str = request.query_params.get('start_date')
         end_date_str = request.query_params.get('end_date')
+        export = request.query_params.get('export')
         
         if not all([class_id, start_date_str, end_date_str]):
             return Response(
@@ -549,49 +732,91 @@ class AttendanceReportViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get all students in the class (assuming relationship exists)
-        student_summaries = []
+        if export not in (None, 'csv', 'json'):
+            return Response(
+                {'error': "export must be 'csv' or 'json'"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # This would need to be adjusted based on your actual class-student relationship
-        # For now, getting all students with attendance in the period
-        students_with_attendance = Attendance.objects.filter(
-            date__range=[start_date, end_date]
-        ).values_list('student', flat=True).distinct()
+        if not Class.objects.filter(pk=class_id).exists():
+            return Response(
+                {'error': 'Class not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
         
-        for student_id in students_with_attendance:
-            student = User.objects.get(id=student_id)
-            attendances = Attendance.objects.filter(
-                student=student,
-                date__range=[start_date, end_date]
+        # Present days and the denominator both count school days only
+        index = get_working_day_index()
+        total_days = index.count_school_days(start_date, end_date)
+        summaries = class_attendance_summary(class_id, start_date, end_date, index)
+        
+        def summary_rows(rows):
+            for row in rows:
+                full_name = f"{row['first_name']} {row['last_name']}".strip()
+                attendance_rate = (row['days_present'] / total_days * 100) if total_days > 0 else 0
+                yield {
+                    'student_id': row['id'],
+                    'student_name': full_name or row['username'],
+                    'total_days': total_days,
+                    'days_present': row['days_present'],
+                    'attendance_rate': round(attendance_rate, 2)
+                }
+        
+        period = {
+            'start_date': start_date_str,
+            'end_date': end_date_str
+        }
+        
+        if export:
+            return self._stream_class_summary(
+                export, class_id, period, summary_rows(summaries.iterator(chunk_size=2000))
             )
-            
-            total_days = (end_date - start_date).days + 1
-            days_present = attendances.filter(is_present=True).count()
-            attendance_rate = (days_present / total_days * 100) if total_days > 0 else 0
-            
-            student_summaries.append({
-                'student_id': student.id,
-                'student_name': student.get_full_name() or student.username,
-                'total_days': total_days,
-                'days_present': days_present,
-                'attendance_rate': round(attendance_rate, 2)
-            })
         
-        # Sort by attendance rate (lowest first for attention)
-        student_summaries.sort(key=lambda x: x['attendance_rate'])
+        student_summaries = list(summary_rows(summaries))
         
         return Response({
             'class_id': class_id,
-            'period': {
-                'start_date': start_date_str,
-                'end_date': end_date_str
-            },
+            'period': period,
             'student_summaries': student_summaries,
             'class_statistics': {
                 'total_students': len(student_summaries),
                 'average_attendance_rate': sum([s['attendance_rate'] for s in student_summaries]) / len(student_summaries) if student_summaries else 0
             }
         })
+    
+    def _stream_class_summary(self, export, class_id, period, rows):
+        """Stream a class summary as CSV, or as JSON with the same shape as the regular response"""
+        filename = f"class_{class_id}_attendance_{period['start_date']}_{period['end_date']}"
+        
+        if export == 'csv':
+            response = StreamingHttpResponse(
+                stream_csv(CLASS_SUMMARY_COLUMNS, rows), content_type='text/csv'
+            )
+            response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+            return response
+        
+        # Class statistics are accumulated while the rows stream past
+        totals = {'students': 0, 'rate_sum': 0}
+        
+        def counted(rows):
+            for row in rows:
+                totals['students'] += 1
+                totals['rate_sum'] += row['attendance_rate']
+                yield row
+        
+        def class_statistics():
+            return {'class_statistics': {
+                'total_students': totals['students'],
+                'average_attendance_rate': totals['rate_sum'] / totals['students'] if totals['students'] else 0
+            }}
+        
+        response = StreamingHttpResponse(
+            stream_json_object(
+                {'class_id': class_id, 'period': period}, 'student_summaries', counted(rows), class_statistics
+            ),
+            content_type='application/json'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}.json"'
+        return response
 
 
 class SchoolCalendarViewSet(viewsets.ModelViewSet):
@@ -666,25 +891,18 @@ class SchoolCalendarViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get holidays in the range
-        holidays = self.queryset.filter(
-            date__range=[start_date, end_date],
-            is_holiday=True
-        ).values_list('date', flat=True)
-        
-        # Calculate working days
-        total_days = (end_date - start_date).days + 1
-        holiday_count = len(holidays)
-        working_days = total_days - holiday_count
+        index = get_working_day_index()
+        holidays = index.holidays_between(start_date, end_date)
         
         return Response({
             'period': {
                 'start_date': start_date_str,
                 'end_date': end_date_str
             },
-            'total_days': total_days,
-            'holidays': holiday_count,
-            'working_days': working_days,
+            'total_days': max((end_date - start_date).days + 1, 0),
+            'holidays': len(holidays),
+            'working_days': index.count_school_days(start_date, end_date),
+            'school_weekdays': list(index.school_weekdays),
             'holiday_dates': [h.isoformat() for h in holidays]
         })
 
@@ -0,0 +1,59 @@
+"""
+Attendance report charts.
+
+Charts are drawn with matplotlib's object-oriented ``Figure`` API, so no
+pyplot global state is shared between threads and nothing needs closing.
+matplotlib is imported on first render rather than at URL loading time.
+Rendered PNGs are cached under (student, range, data hash), so a report
+is only drawn again when its numbers change.
+"""
+
+import base64
+import hashlib
+import io
+import json
+
+from django.core.cache import cache
+
+CHART_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def attendance_chart_data(total_days, days_present):
+    """Chart series for a report; also the JSON payload for client-side drawing"""
+    return {
+        'type': 'bar',
+        'title': 'Attendance Report',
+        'y_label': 'Number of Days',
+        'labels': ['Present', 'Absent'],
+        'values': [days_present, max(total_days - days_present, 0)],
+    }
+
+
+def chart_cache_key(student_id, start_date, end_date, data):
+    digest = hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+    return f'attendance:chart:{student_id}:{start_date.isoformat()}:{end_date.isoformat()}:{digest}'
+
+
+def render_bar_chart(data):
+    """Render chart data to PNG bytes"""
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(10, 5))
+    axes = figure.subplots()
+    axes.bar(data['labels'], data['values'])
+    axes.set_title(data['title'])
+    axes.set_ylabel(data['y_label'])
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+def attendance_chart_png(student_id, start_date, end_date, data):
+    """Base64-encoded PNG for ``data``, rendered once per distinct input"""
+    key = chart_cache_key(student_id, start_date, end_date, data)
+    graph = cache.get(key)
+    if graph is None:
+        graph = base64.b64encode(render_bar_chart(data)).decode('utf-8')
+        cache.set(key, graph, CHART_CACHE_TIMEOUT)
+    return graph
@@ -0,0 +1,53 @@
+"""
+Streaming renderers for large attendance payloads.
+
+Rows are written out as they are produced so a response never holds the
+whole result set in memory; pair these with ``QuerySet.iterator()`` and
+``StreamingHttpResponse``.
+"""
+
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class Echo:
+    """File-like object whose ``write`` just returns the value, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns, rows):
+    """Yield a CSV header for ``columns`` and then one line per row dict"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([row[column] for column in columns])
+
+
+def stream_ndjson(rows):
+    """Yield one JSON document per line, one line per row"""
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+def stream_json_object(fields, list_key, rows, trailer=None):
+    """
+    Yield a JSON object with the static ``fields``, followed by ``list_key``
+    holding ``rows`` streamed one element at a time. ``trailer`` is called
+    after the rows are exhausted and may return more fields to append, so
+    totals can be accumulated while streaming.
+    """
+    encoder = DjangoJSONEncoder()
+    head = encoder.encode(fields)[:-1]
+    yield head + (', ' if fields else '') + encoder.encode(list_key) + ': ['
+
+    for index, row in enumerate(rows):
+        yield (', ' if index else '') + encoder.encode(row)
+
+    tail = trailer() if trailer else {}
+    yield ']' + ''.join(
+        f', {encoder.encode(key)}: {encoder.encode(value)}' for key, value in tail.items()
+    ) + '}'
@@ -0,0 +1,142 @@
+"""
+Bulk attendance import from CSV.
+
+The file needs ``student``, ``date`` (YYYY-MM-DD) and ``is_present``
+columns; ``student`` may be a ``Student.student_id``, an email address or
+a user id, tried in that order. Rows are read and written in batches:
+each batch resolves its students in one query and is upserted in its own
+transaction, so memory stays bounded however long the file is.
+"""
+
+import csv
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Attendance
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+REQUIRED_COLUMNS = ('student', 'date', 'is_present')
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'present', 'p'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'absent', 'a'}
+
+
+def parse_presence(value):
+    value = value.strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f"Invalid is_present value '{value}'")
+
+
+def parse_row(row):
+    """Validate one CSV row into (identifier, date, is_present); raises ValueError"""
+    identifier = (row['student'] or '').strip()
+    if not identifier:
+        raise ValueError('Missing student')
+
+    value = (row['date'] or '').strip()
+    try:
+        day = datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}'. Use YYYY-MM-DD")
+
+    return identifier, day, parse_presence(row['is_present'] or '')
+
+
+def resolve_students(identifiers):
+    """
+    Map student identifiers to user ids with a single query. A
+    ``Student.student_id`` match wins over an email, which wins over a
+    user id. Unknown identifiers are left out.
+    """
+    identifiers = set(identifiers)
+    emails = {value for value in identifiers if '@' in value}
+    user_ids = {int(value) for value in identifiers if value.isdigit()}
+
+    by_student_id, by_email, known_ids = {}, {}, set()
+    rows = get_user_model().objects.filter(
+        Q(student__student_id__in=identifiers) | Q(email__in=emails) | Q(pk__in=user_ids)
+    ).values_list('pk', 'email', 'student__student_id')
+    for pk, email, student_id in rows:
+        if student_id:
+            by_student_id[student_id] = pk
+        by_email[email] = pk
+        known_ids.add(pk)
+
+    resolved = {}
+    for value in identifiers:
+        if value in by_student_id:
+            resolved[value] = by_student_id[value]
+        elif value in by_email:
+            resolved[value] = by_email[value]
+        elif value.isdigit() and int(value) in known_ids:
+            resolved[value] = int(value)
+    return resolved
+
+
+def import_attendance_csv(text_file, batch_size=IMPORT_BATCH_SIZE, max_errors=MAX_REPORTED_ERRORS):
+    """
+    Import attendance rows from an open text file.
+
+    Returns a report with row counts and up to ``max_errors`` per-row
+    errors as ``{'row': line_number, 'error': message}``; ``error_count``
+    always has the full number. Raises ValueError if required columns are
+    missing. A later row for the same student and date overrides an
+    earlier one.
+    """
+    reader = csv.DictReader(text_file)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    report = {'rows': 0, 'imported': 0, 'created': 0, 'updated': 0, 'error_count': 0, 'errors': []}
+
+    def add_error(row_number, message):
+        report['error_count'] += 1
+        if len(report['errors']) < max_errors:
+            report['errors'].append({'row': row_number, 'error': message})
+
+    def flush(batch):
+        students = resolve_students(identifier for _, identifier, _, _ in batch)
+        marks = {}
+        for row_number, identifier, day, is_present in batch:
+            student_id = students.get(identifier)
+            if student_id is None:
+                add_error(row_number, f"Unknown student '{identifier}'")
+                continue
+            marks[(student_id, day)] = is_present
+
+        with transaction.atomic():
+            existing = Attendance.upsert_marks(marks)
+
+        report['imported'] += len(marks)
+        report['updated'] += len(existing)
+        report['created'] += len(marks) - len(existing)
+
+    batch = []
+    for row in reader:
+        report['rows'] += 1
+        # Line in the file, counting the header as line 1
+        row_number = reader.line_num
+        try:
+            identifier, day, is_present = parse_row(row)
+        except ValueError as exc:
+            add_error(row_number, str(exc))
+            continue
+
+        batch.append((row_number, identifier, day, is_present))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+
+    if batch:
+        flush(batch)
+
+    # Unknown students are only found when their batch is flushed
+    report['errors'].sort(key=lambda error: error['row'])
+    return report
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.imports import IMPORT_BATCH_SIZE, MAX_REPORTED_ERRORS, import_attendance_csv
+
+
+class Command(BaseCommand):
+    help = 'Import attendance from a CSV file with student, date and is_present columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='Rows per lookup and upsert transaction')
+        parser.add_argument('--max-errors', type=int, default=MAX_REPORTED_ERRORS, help='Row errors to print')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as text_file:
+                report = import_attendance_csv(
+                    text_file, batch_size=options['batch_size'], max_errors=options['max_errors']
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in report['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['error']}")
+        if report['error_count'] > len(report['errors']):
+            self.stderr.write(f"... and {report['error_count'] - len(report['errors'])} more errors")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['imported']} of {report['rows']} rows "
+            f"({report['created']} created, {report['updated']} updated, {report['error_count']} errors)"
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from attendance.models import AttendanceRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly attendance rollup table from raw attendance records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per read chunk and bulk insert')
+
+    def handle(self, *args, **options):
+        created = AttendanceRollup.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} attendance rollup rows'))
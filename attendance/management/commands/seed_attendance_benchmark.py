@@ -0,0 +1,110 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from attendance.analytics import low_attendance_queryset
+from attendance.models import Attendance, AttendanceRollup
+from attendance.working_days import get_working_day_index
+
+User = get_user_model()
+
+USERNAME_PREFIX = 'bench_student_'
+
+
+class Command(BaseCommand):
+    help = 'Seed a synthetic attendance roster (default 10k students x 180 days) for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=10000, help='Number of students to create')
+        parser.add_argument('--days', type=int, default=180, help='Number of days of attendance per student')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for attendance patterns')
+        parser.add_argument('--clear', action='store_true', help='Remove previously seeded benchmark students first')
+        parser.add_argument('--measure', action='store_true', help='Time the low attendance alert query after seeding')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted, _ = User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+            self.stdout.write(f'Removed {deleted} benchmark rows')
+
+        student_ids = self.create_students(options['students'], options['batch_size'])
+        self.create_attendance(student_ids, options['days'], options['batch_size'], options['seed'])
+
+        # bulk_create skips the signals that keep the rollups in step
+        rollups = AttendanceRollup.rebuild(batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(student_ids)} students x {options['days']} days, rebuilt {rollups} rollup rows"
+        ))
+
+        if options['measure']:
+            self.measure(options['days'])
+
+    def create_students(self, count, batch_size):
+        existing = set(
+            User.objects.filter(username__startswith=USERNAME_PREFIX).values_list('username', flat=True)
+        )
+        users = []
+        for i in range(count):
+            username = f'{USERNAME_PREFIX}{i:06d}'
+            if username in existing:
+                continue
+            users.append(User(
+                username=username,
+                email=f'{username}@benchmark.local',
+                first_name='Bench',
+                last_name=f'Student {i}',
+                password='!',
+            ))
+        User.objects.bulk_create(users, batch_size=batch_size)
+
+        return list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX)
+            .order_by('username')
+            .values_list('id', flat=True)[:count]
+        )
+
+    def create_attendance(self, student_ids, days, batch_size, seed):
+        rng = random.Random(seed)
+        today = timezone.now().date()
+        dates = [today - timedelta(days=offset) for offset in range(days)]
+
+        # Give every student their own presence probability so the roster
+        # spreads across all severity bands.
+        batch = []
+        for student_id in student_ids:
+            presence = rng.uniform(0.3, 1.0)
+            for day in dates:
+                batch.append(Attendance(student_id=student_id, date=day, is_present=rng.random() < presence))
+                if len(batch) >= batch_size:
+                    Attendance.objects.bulk_create(batch, ignore_conflicts=True)
+                    batch = []
+        if batch:
+            Attendance.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def measure(self, days):
+        end_date = timezone.now().date()
+        start_date = end_date - timedelta(days=days)
+        # The same query low_attendance_alerts runs
+        index = get_working_day_index()
+        alerts = low_attendance_queryset(
+            Attendance.objects.filter(index.school_days_q(start_date, end_date)), 0.75,
+            school_days=index.count_school_days(start_date, end_date),
+        )
+
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            flagged = alerts.count()
+            first_page = list(alerts[:10])
+            elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'Flagged {flagged} students, first page {len(first_page)} rows, '
+            f'{len(ctx.captured_queries)} queries in {elapsed:.3f}s'
+        )
@@ -0,0 +1,68 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_rollups(apps, schema_editor):
+    Attendance = apps.get_model('attendance', 'Attendance')
+    AttendanceRollup = apps.get_model('attendance', 'AttendanceRollup')
+
+    def make_rollup(cell, marks):
+        longest = current = 0
+        for is_present in marks:
+            current = current + 1 if is_present else 0
+            longest = max(longest, current)
+        return AttendanceRollup(
+            student_id=cell[0],
+            month=cell[1],
+            total_days=len(marks),
+            days_present=sum(1 for is_present in marks if is_present),
+            longest_streak=longest,
+            current_streak=current,
+        )
+
+    rollups = []
+    cell, marks = None, []
+    rows = Attendance.objects.order_by('student_id', 'date').values_list('student_id', 'date', 'is_present')
+    for student_id, day, is_present in rows.iterator(chunk_size=5000):
+        row_cell = (student_id, day.replace(day=1))
+        if row_cell != cell:
+            if cell is not None:
+                rollups.append(make_rollup(cell, marks))
+            cell, marks = row_cell, []
+        marks.append(is_present)
+    if cell is not None:
+        rollups.append(make_rollup(cell, marks))
+
+    AttendanceRollup.objects.bulk_create(rollups, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('total_days', models.PositiveIntegerField(default=0)),
+                ('days_present', models.PositiveIntegerField(default=0)),
+                ('longest_streak', models.PositiveIntegerField(default=0)),
+                ('current_streak', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['student', 'month'],
+                'unique_together': {('student', 'month')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,17 @@
-from django.db import models
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import models, transaction
 from django.conf import settings
-from django.core.mail import send_mail
+from django.utils import timezone
+from django.db.models import Count, Q
+
+from communication.models import OutgoingEmail
+from communication.outbox import dedup_window_key, queue_emails
+
+# Students get at most one low attendance email per fixed window of this many
+# days (with 7, per Sunday-to-Saturday week; see dedup_window_key)
+LOW_ATTENDANCE_ALERT_WINDOW_DAYS = 7
 
 
 class SchoolCalendar(models.Model):
@@ -12,6 +23,17 @@ class SchoolCalendar(models.Model):
         return f"{self.date} - {'Holiday' if self.is_holiday else 'School Day'}"
 
 
+class CalendarVersion(models.Model):
+    """
+    A single row counting changes to the school calendar and school
+    weekdays, so every process can tell when its working-day index is stale.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Calendar version {self.version}"
+
+
 class Attendance(models.Model):
     student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='attendances')
     date = models.DateField()
@@ -19,31 +41,227 @@ class Attendance(models.Model):
 
     class Meta:
         unique_together = ['student', 'date']
+        # Date-range scans across all students (daily statistics, trends)
+        indexes = [models.Index(fields=['date'])]
 
     def __str__(self):
         return f"{self.student.username} - {self.date} - {'Present' if self.is_present else 'Absent'}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember where the row lived so the rollup signal can refresh the
+        # old month too when the student or date is edited.
+        instance._loaded_rollup_cell = (instance.__dict__.get('student_id'), instance.__dict__.get('date'))
+        return instance
+
     @classmethod
     def mark_bulk_attendance(cls, date, student_data):
-        attendances = []
-        for student_id, is_present in student_data.items():
-            attendance = cls(student_id=student_id, date=date, is_present=is_present)
-            attendances.append(attendance)
-        cls.objects.bulk_create(attendances)
+        return cls.upsert_for_date(date, student_data)
+
+    @classmethod
+    def upsert_for_date(cls, date, student_data):
+        """
+        Insert or update attendance for many students on one date.
+        Returns (created_student_ids, updated_student_ids).
+        """
+        student_ids = list(student_data.keys())
+        existing = cls.upsert_marks({
+            (student_id, date): is_present for student_id, is_present in student_data.items()
+        })
+
+        created_ids = [student_id for student_id in student_ids if (student_id, date) not in existing]
+        updated_ids = [student_id for student_id in student_ids if (student_id, date) in existing]
+        return created_ids, updated_ids
+
+    @classmethod
+    def upsert_marks(cls, marks):
+        """
+        Insert or update attendance from a ``{(student_id, date): is_present}``
+        mapping using a single INSERT ... ON CONFLICT keyed on (student, date),
+        then refresh the affected rollup cells.
+        Returns the set of (student_id, date) pairs that already existed.
+        """
+        if not marks:
+            return set()
+
+        existing = set(cls.objects.filter(
+            student_id__in={student_id for student_id, _ in marks},
+            date__in={day for _, day in marks},
+        ).values_list('student_id', 'date')) & marks.keys()
+
+        cls.objects.bulk_create(
+            [cls(student_id=student_id, date=day, is_present=is_present)
+             for (student_id, day), is_present in marks.items()],
+            update_conflicts=True,
+            unique_fields=['student', 'date'],
+            update_fields=['is_present'],
+        )
+        AttendanceRollup.refresh_cells(marks.keys())
+        return existing
 
     @classmethod
     def check_low_attendance(cls, student, threshold=0.75):
-        total_days = cls.objects.filter(student=student).count()
-        days_present = cls.objects.filter(student=student, is_present=True).count()
-
-        if total_days > 0 and days_present / total_days < threshold:
-            send_mail(
-                'Low Attendance Alert',
-                f'Your attendance is below {threshold * 100}%. Please improve your attendance.',
-                'from@example.com',
-                [student.email],
-                fail_silently=False,
+        cls.check_low_attendance_batch([student.pk], threshold)
+
+    @classmethod
+    def check_low_attendance_batch(cls, student_ids, threshold=0.75, window_days=LOW_ATTENDANCE_ALERT_WINDOW_DAYS):
+        """
+        Evaluate low attendance for several students with one grouped query
+        and queue the alert emails in the outbox. A student is emailed at
+        most once per fixed ``window_days``-day window, so two alerts can be
+        a day apart across a window boundary.
+        Returns the ids of the students below the threshold.
+        """
+        rates = cls.objects.filter(student_id__in=student_ids).values('student', 'student__email').annotate(
+            total_days=Count('id'),
+            days_present=Count('id', filter=Q(is_present=True))
+        )
+
+        flagged = [
+            row for row in rates
+            if row['total_days'] > 0 and row['days_present'] / row['total_days'] < threshold
+        ]
+
+        queue_emails(
+            OutgoingEmail(
+                to_email=row['student__email'],
+                subject='Low Attendance Alert',
+                body=f'Your attendance is below {threshold * 100}%. Please improve your attendance.',
+                category='low_attendance',
+                dedup_key=dedup_window_key('low-attendance', row['student'], window_days),
             )
+            for row in flagged if row['student__email']
+        )
+
+        return [row['student'] for row in flagged]
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def attendance_streaks(marks):
+    """
+    Longest and trailing runs of consecutive present marks in a
+    date-ordered sequence of is_present values.
+    """
+    longest = current = 0
+    for is_present in marks:
+        current = current + 1 if is_present else 0
+        longest = max(longest, current)
+    return longest, current
+
+
+class AttendanceRollup(models.Model):
+    """
+    Per student, per month attendance totals maintained incrementally from
+    Attendance writes, so statistics never have to recount raw rows.
+    Streaks count consecutive recorded days marked present.
+    """
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='attendance_rollups')
+    month = models.DateField(help_text="First day of the month")
+    total_days = models.PositiveIntegerField(default=0)
+    days_present = models.PositiveIntegerField(default=0)
+    longest_streak = models.PositiveIntegerField(default=0)
+    current_streak = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['student', 'month']
+        ordering = ['student', 'month']
+
+    def __str__(self):
+        return f"{self.student.username} - {self.month:%Y-%m} - {self.days_present}/{self.total_days}"
+
+    @classmethod
+    def refresh_cells(cls, cells):
+        """
+        Recompute the rollup rows for the given (student_id, date) pairs.
+        Costs one read per distinct month plus one upsert and one delete.
+        """
+        students_by_month = defaultdict(set)
+        for student_id, day in cells:
+            students_by_month[month_start(day)].add(student_id)
+
+        rollups = []
+        emptied = Q()
+        for month, student_ids in students_by_month.items():
+            marks = defaultdict(list)
+            for student_id, is_present in Attendance.objects.filter(
+                student_id__in=student_ids,
+                date__gte=month,
+                date__lt=next_month(month)
+            ).order_by('student_id', 'date').values_list('student_id', 'is_present'):
+                marks[student_id].append(is_present)
+
+            for student_id in student_ids:
+                if student_id in marks:
+                    rollups.append(cls.from_marks(student_id, month, marks[student_id]))
+                else:
+                    emptied |= Q(student_id=student_id, month=month)
+
+        if rollups:
+            cls.objects.bulk_create(
+                rollups,
+                update_conflicts=True,
+                unique_fields=['student', 'month'],
+                update_fields=['total_days', 'days_present', 'longest_streak', 'current_streak', 'updated_at'],
+            )
+        if emptied:
+            cls.objects.filter(emptied).delete()
+
+    @classmethod
+    def from_marks(cls, student_id, month, marks):
+        longest, current = attendance_streaks(marks)
+        return cls(
+            student_id=student_id,
+            month=month,
+            total_days=len(marks),
+            days_present=sum(1 for is_present in marks if is_present),
+            longest_streak=longest,
+            current_streak=current,
+            updated_at=timezone.now(),
+        )
+
+    @classmethod
+    def rebuild(cls, batch_size=5000):
+        """
+        Drop and rebuild every rollup row from raw attendance in one streaming
+        pass. Runs in a transaction, so readers see the old rows until it
+        commits and a failure leaves them untouched.
+        """
+        with transaction.atomic():
+            cls.objects.all().delete()
+
+            rollups = []
+            created = 0
+            cell, marks = None, []
+            rows = Attendance.objects.order_by('student_id', 'date').values_list(
+                'student_id', 'date', 'is_present'
+            ).iterator(chunk_size=batch_size)
+
+            for student_id, day, is_present in rows:
+                row_cell = (student_id, month_start(day))
+                if row_cell != cell:
+                    if cell is not None:
+                        rollups.append(cls.from_marks(cell[0], cell[1], marks))
+                    cell, marks = row_cell, []
+                marks.append(is_present)
+
+                if len(rollups) >= batch_size:
+                    cls.objects.bulk_create(rollups)
+                    created += len(rollups)
+                    rollups = []
+
+            if cell is not None:
+                rollups.append(cls.from_marks(cell[0], cell[1], marks))
+            cls.objects.bulk_create(rollups)
+        return created + len(rollups)
 
 
 class AttendanceReport(models.Model):
@@ -0,0 +1,38 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Attendance, AttendanceRollup, SchoolCalendar
+from .working_days import invalidate_working_day_index
+
+
+@receiver(post_save, sender=Attendance)
+def refresh_rollup_on_save(sender, instance, raw=False, **kwargs):
+    """Keep the monthly rollup in step with single-row attendance writes"""
+    if raw:
+        return
+
+    cells = {(instance.student_id, instance.date)}
+    loaded_student_id, loaded_date = getattr(instance, '_loaded_rollup_cell', (None, None))
+    if loaded_student_id is not None and loaded_date is not None:
+        cells.add((loaded_student_id, loaded_date))
+    instance._loaded_rollup_cell = (instance.student_id, instance.date)
+
+    AttendanceRollup.refresh_cells(cells)
+
+
+@receiver(post_delete, sender=Attendance)
+def refresh_rollup_on_delete(sender, instance, **kwargs):
+    AttendanceRollup.refresh_cells([(instance.student_id, instance.date)])
+
+
+@receiver(post_save, sender=SchoolCalendar)
+@receiver(post_delete, sender=SchoolCalendar)
+def invalidate_working_days(sender, **kwargs):
+    # The version bump commits or rolls back with the calendar change itself
+    invalidate_working_day_index()
+
+
+if apps.is_installed('schedules'):
+    post_save.connect(invalidate_working_days, sender='schedules.DayOfWeek')
+    post_delete.connect(invalidate_working_days, sender='schedules.DayOfWeek')
@@ -1,3 +1,590 @@
-from django.test import TestCase
+import base64
+import json
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import UserProfile
+from communication.models import OutgoingEmail
+from schedules.models import DayOfWeek
+from students.models import Student
+from teachers.models import Class
+
+from . import charts
+from .analytics import attendance_totals
+from .models import Attendance, AttendanceRollup, CalendarVersion, SchoolCalendar
+from .working_days import WorkingDayIndex, get_working_day_index, invalidate_working_day_index
+
+User = get_user_model()
+
+
+class LowAttendanceAlertsTests(TestCase):
+    url = '/api/attendance/attendance/low_attendance_alerts/'
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        # Teach every day of the week so rates don't depend on today's weekday
+        DayOfWeek.objects.bulk_create([DayOfWeek(day=day) for day in range(7)])
+        invalidate_working_day_index()
+
+    def make_student(self, name, present, absent):
+        student = User.objects.create_user(username=name, email=f'{name}@example.com')
+        today = timezone.now().date()
+        Attendance.objects.bulk_create([
+            Attendance(student=student, date=today - timedelta(days=i), is_present=i < present)
+            for i in range(present + absent)
+        ])
+        return student
+
+    def test_flags_students_below_threshold_worst_first(self):
+        critical = self.make_student('critical', present=2, absent=8)
+        warning = self.make_student('warning', present=7, absent=3)
+        self.make_student('fine', present=9, absent=1)
+
+        # Today and the nine days before it, each student's ten records
+        response = self.client.get(self.url, {'threshold': 0.75, 'days': 9})
+
+        self.assertEqual(response.status_code, 200)
+        rows = response.data['low_attendance_students']
+        self.assertEqual([row['student_id'] for row in rows], [critical.id, warning.id])
+        self.assertEqual([row['severity'] for row in rows], ['critical', 'warning'])
+        self.assertEqual(rows[0]['attendance_rate'], 20.0)
+        self.assertEqual(response.data['total_flagged'], 2)
+
+    def test_severity_filter_and_custom_bands(self):
+        self.make_student('low', present=4, absent=6)
+        self.make_student('lower', present=1, absent=9)
+
+        response = self.client.get(self.url, {'days': 9, 'bands': 'critical:0.2,severe:0.5', 'severity': 'severe'})
+
+        rows = response.data['low_attendance_students']
+        self.assertEqual([row['student_name'] for row in rows], ['low'])
+
+    def test_invalid_bands_rejected(self):
+        response = self.client.get(self.url, {'bands': 'critical'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_count_constant_as_roster_grows(self):
+        call_command('seed_attendance_benchmark', students=5, days=10, stdout=StringIO())
+        get_working_day_index()
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(self.url, {'days': 30})
+
+        call_command('seed_attendance_benchmark', students=60, days=10, stdout=StringIO())
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(self.url, {'days': 30})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_seeded_attendance_is_rolled_up(self):
+        call_command('seed_attendance_benchmark', students=3, days=40, measure=True, stdout=StringIO())
+
+        # No date range, so every total comes from the rollups
+        self.assertEqual(attendance_totals(), {
+            'total_days': Attendance.objects.count(),
+            'days_present': Attendance.objects.filter(is_present=True).count(),
+        })
+        self.assertEqual(attendance_totals()['total_days'], 120)
+
+
+class AttendanceTrendsTests(TestCase):
+    url = '/api/attendance/attendance/trends/'
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.today = timezone.now().date()
+        self.student = User.objects.create_user(username='s1', email='s1@example.com')
+        # Teach every day of the week so the series doesn't depend on today's weekday
+        DayOfWeek.objects.bulk_create([DayOfWeek(day=day) for day in range(7)])
+        invalidate_working_day_index()
+
+    def test_series_is_contiguous_and_marks_holidays(self):
+        holiday = self.today - timedelta(days=2)
+        SchoolCalendar.objects.create(date=holiday, is_holiday=True, event_name='Break')
+        Attendance.objects.create(student=self.student, date=self.today, is_present=True)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, {'days': 365})
+
+        series = response.data['daily_trends']
+        self.assertEqual(len(series), 366)
+        # Includes the calendar version check
+        self.assertLessEqual(len(ctx.captured_queries), 4)
+
+        by_date = {day['date']: day for day in series}
+        self.assertFalse(by_date[holiday.isoformat()]['is_school_day'])
+        self.assertIsNone(by_date[holiday.isoformat()]['attendance_rate'])
+        self.assertEqual(by_date[self.today.isoformat()]['attendance_rate'], 100.0)
+
+    def test_moving_average_and_week_over_week(self):
+        for offset in range(8):
+            Attendance.objects.create(
+                student=self.student, date=self.today - timedelta(days=offset), is_present=offset == 0
+            )
+
+        response = self.client.get(self.url, {'days': 7, 'moving_average': 2, 'week_over_week': 'true'})
+
+        series = response.data['daily_trends']
+        self.assertEqual(series[-1]['moving_average'], 50.0)
+        self.assertEqual(series[-1]['week_over_week_change'], 100.0)
+        self.assertIsNone(series[0]['week_over_week_change'])
+
+
+class BulkMarkTests(TestCase):
+    url = '/api/attendance/attendance/bulk_mark/'
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.students = [
+            User.objects.create_user(username=f's{i}', email=f's{i}@example.com')
+            for i in range(40)
+        ]
+
+    def test_bulk_upsert_uses_constant_queries(self):
+        day = timezone.now().date()
+        Attendance.objects.create(student=self.students[0], date=day, is_present=False)
+        payload = {
+            'date': day.isoformat(),
+            'students': [{'student_id': s.id, 'is_present': True} for s in self.students] + [{'student_id': 999999}],
+        }
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_created'], 39)
+        self.assertEqual(response.data['total_updated'], 1)
+        self.assertEqual(len(response.data['errors']), 1)
+        self.assertLess(len(ctx.captured_queries), 10)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(Attendance.objects.filter(date=day, is_present=True).count(), 40)
+
+    def test_is_present_parsed_as_boolean(self):
+        day = timezone.now().date()
+        payload = {'date': day.isoformat(), 'students': [
+            {'student_id': self.students[0].id, 'is_present': 'false'},
+            {'student_id': self.students[1].id, 'is_present': 0},
+            {'student_id': self.students[2].id, 'is_present': 'true'},
+        ]}
+
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        marks = dict(Attendance.objects.filter(date=day).values_list('student_id', 'is_present'))
+        self.assertEqual(marks, {self.students[0].id: False, self.students[1].id: False, self.students[2].id: True})
+
+        payload['students'].append({'student_id': self.students[3].id, 'is_present': 'maybe'})
+        response = self.client.post(self.url, {**payload, 'date': (day - timedelta(days=1)).isoformat()}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['errors']), 1)
+        self.assertFalse(Attendance.objects.filter(date=day - timedelta(days=1)).exists())
+
+    def test_batch_check_alerts_only_low_students(self):
+        day = timezone.now().date()
+        Attendance.objects.create(student=self.students[0], date=day, is_present=False)
+        Attendance.objects.create(student=self.students[1], date=day, is_present=True)
+
+        flagged = Attendance.check_low_attendance_batch([self.students[0].id, self.students[1].id])
+        # Re-checking inside the same window doesn't queue a second email
+        Attendance.check_low_attendance_batch([self.students[0].id])
+
+        self.assertEqual(flagged, [self.students[0].id])
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(list(OutgoingEmail.objects.values_list('to_email', flat=True)), [self.students[0].email])
+
+        call_command('send_queued_email', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.students[0].email])
+
+
+class AttendanceRollupTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username='s1', email='s1@example.com')
+
+    def rollup(self, month):
+        return AttendanceRollup.objects.get(student=self.student, month=month)
+
+    def test_rollup_follows_save_and_delete(self):
+        first = Attendance.objects.create(student=self.student, date=date(2024, 3, 4), is_present=True)
+        Attendance.objects.create(student=self.student, date=date(2024, 3, 5), is_present=True)
+        Attendance.objects.create(student=self.student, date=date(2024, 3, 6), is_present=False)
+
+        rollup = self.rollup(date(2024, 3, 1))
+        self.assertEqual((rollup.total_days, rollup.days_present), (3, 2))
+        self.assertEqual((rollup.longest_streak, rollup.current_streak), (2, 0))
+
+        # Moving a record to another month updates both cells
+        first.date = date(2024, 4, 1)
+        first.save()
+        self.assertEqual(self.rollup(date(2024, 3, 1)).total_days, 2)
+        self.assertEqual(self.rollup(date(2024, 4, 1)).days_present, 1)
+
+        first.delete()
+        self.assertFalse(AttendanceRollup.objects.filter(month=date(2024, 4, 1)).exists())
+
+    def test_upsert_refreshes_rollup(self):
+        Attendance.upsert_for_date(date(2024, 3, 4), {self.student.id: False})
+        Attendance.upsert_for_date(date(2024, 3, 4), {self.student.id: True})
+
+        rollup = self.rollup(date(2024, 3, 1))
+        self.assertEqual((rollup.total_days, rollup.days_present), (1, 1))
+
+    def test_totals_combine_rollup_and_partial_months(self):
+        for day in [date(2024, 1, 31), date(2024, 2, 10), date(2024, 3, 1), date(2024, 3, 20)]:
+            Attendance.objects.create(student=self.student, date=day, is_present=day.day != 10)
+
+        totals = attendance_totals(date(2024, 1, 15), date(2024, 3, 10))
+        self.assertEqual(totals, {'total_days': 3, 'days_present': 2})
+
+        by_month = attendance_totals(date(2024, 1, 15), date(2024, 3, 10), group_by='month')
+        self.assertEqual(sorted(by_month), [date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1)])
+
+        inside_month = attendance_totals(date(2024, 3, 2), date(2024, 3, 25), student_ids=[self.student.id])
+        self.assertEqual(inside_month, {'total_days': 1, 'days_present': 1})
+
+    def test_rebuild_command_repairs_drift(self):
+        Attendance.objects.create(student=self.student, date=date(2024, 3, 4), is_present=True)
+        # Queryset updates bypass the signals
+        Attendance.objects.update(is_present=False)
+
+        call_command('rebuild_attendance_rollups', stdout=StringIO())
+
+        self.assertEqual(self.rollup(date(2024, 3, 1)).days_present, 0)
+
+    def test_statistics_daily_series_is_bounded(self):
+        admin = User.objects.create_user(username='admin', email='admin@example.com', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        for day in [date(2024, 1, 10), date(2024, 3, 20)]:
+            Attendance.objects.create(student=self.student, date=day, is_present=True)
+
+        response = client.get('/api/attendance/attendance/statistics/', {
+            'start_date': '2024-01-01', 'end_date': '2024-03-31'
+        })
+
+        self.assertEqual(response.data['overall_statistics']['total_records'], 2)
+        self.assertEqual(response.data['daily_period'], {'start_date': '2024-03-01', 'end_date': '2024-03-31'})
+        self.assertEqual([day['date'] for day in response.data['daily_statistics']], ['2024-03-20'])
+
+    def test_failed_rebuild_keeps_existing_rollups(self):
+        Attendance.objects.create(student=self.student, date=date(2024, 3, 4), is_present=True)
+
+        with mock.patch.object(AttendanceRollup, 'from_marks', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                AttendanceRollup.rebuild()
+
+        self.assertEqual(self.rollup(date(2024, 3, 1)).days_present, 1)
+
+
+class ClassSummaryTests(TestCase):
+    url = '/api/attendance/reports/class_summary/'
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.class_group = Class.objects.create(name='7A')
+        other_class = Class.objects.create(name='7B')
+        self.students = [self.make_student(f's{i}', self.class_group) for i in range(3)]
+        self.outsider = self.make_student('outsider', other_class)
+
+        for student in self.students[:2] + [self.outsider]:
+            Attendance.objects.create(student=student, date=date(2024, 3, 4), is_present=True)
+        Attendance.objects.create(student=self.students[0], date=date(2024, 3, 5), is_present=True)
+        self.params = {'class_id': self.class_group.id, 'start_date': '2024-03-04', 'end_date': '2024-03-05'}
+        invalidate_working_day_index()
+
+    def make_student(self, name, class_group):
+        user = User.objects.create_user(username=name, email=f'{name}@example.com')
+        Student.objects.create(
+            user=user, student_id=name, grade='7', address='-', parent_name='-',
+            parent_contact='-', class_group=class_group
+        )
+        return user
+
+    def test_scoped_to_class_in_constant_queries(self):
+        get_working_day_index()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, self.params)
+
+        self.assertEqual(response.status_code, 200)
+        rows = response.data['student_summaries']
+        self.assertEqual([row['student_id'] for row in rows], [s.id for s in reversed(self.students)])
+        self.assertEqual([row['days_present'] for row in rows], [0, 1, 2])
+        self.assertEqual(response.data['class_statistics']['total_students'], 3)
+        # Includes the calendar version check
+        self.assertLessEqual(len(ctx.captured_queries), 3)
+
+    def test_streams_csv_and_json(self):
+        response = self.client.get(self.url, {**self.params, 'export': 'csv'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'student_id,student_name,total_days,days_present,attendance_rate')
+        self.assertEqual(len(lines), 4)
+
+        response = self.client.get(self.url, {**self.params, 'export': 'json'})
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(data['student_summaries']), 3)
+        self.assertEqual(data['class_statistics']['average_attendance_rate'], 50.0)
+
+    def test_present_days_count_school_days_only(self):
+        student = self.students[0]
+        SchoolCalendar.objects.create(date=date(2024, 3, 6), is_holiday=True)
+        for day in [date(2024, 3, 6), date(2024, 3, 9), date(2024, 3, 10)]:
+            Attendance.objects.create(student=student, date=day, is_present=True)
+
+        response = self.client.get(self.url, {**self.params, 'end_date': '2024-03-10'})
+
+        row = next(row for row in response.data['student_summaries'] if row['student_id'] == student.id)
+        # Mon 4th and Tue 5th are school days; Wed 6th is a holiday, 9th-10th a weekend
+        self.assertEqual((row['total_days'], row['days_present']), (4, 2))
+        self.assertEqual(row['attendance_rate'], 50.0)
+
+    def test_unknown_class(self):
+        response = self.client.get(self.url, {**self.params, 'class_id': 999})
+        self.assertEqual(response.status_code, 404)
+
+
+class WorkingDayIndexTests(TestCase):
+    def setUp(self):
+        invalidate_working_day_index()
+
+    def test_counts_match_day_by_day_walk(self):
+        holidays = [date(2024, 3, 6), date(2024, 3, 9), date(2024, 12, 25)]
+        index = WorkingDayIndex(holidays)
+        start = date(2024, 2, 20)
+        for length in range(0, 400, 13):
+            end = start + timedelta(days=length)
+            expected = sum(
+                1 for offset in range(length + 1)
+                if (start + timedelta(days=offset)).weekday() < 5
+                and start + timedelta(days=offset) not in holidays
+            )
+            self.assertEqual(index.count_school_days(start, end), expected)
+        self.assertEqual(index.count_school_days(date(2024, 3, 5), date(2024, 3, 4)), 0)
+
+    def test_calendar_changes_invalidate_index(self):
+        week = (date(2024, 3, 4), date(2024, 3, 10))
+        self.assertEqual(get_working_day_index().count_school_days(*week), 5)
+
+        SchoolCalendar.objects.create(date=date(2024, 3, 6), is_holiday=True)
+        self.assertEqual(get_working_day_index().count_school_days(*week), 4)
+
+        DayOfWeek.objects.create(day=5)
+        self.assertEqual(get_working_day_index().school_weekdays, (5,))
+        self.assertEqual(get_working_day_index().count_school_days(*week), 1)
+
+    def test_version_bumped_elsewhere_rebuilds_index(self):
+        week = (date(2024, 3, 4), date(2024, 3, 10))
+        self.assertEqual(get_working_day_index().count_school_days(*week), 5)
+
+        # Another process's change: no signal reaches this one, only the row
+        SchoolCalendar.objects.bulk_create([SchoolCalendar(date=date(2024, 3, 6), is_holiday=True)])
+        self.assertEqual(get_working_day_index().count_school_days(*week), 5)
+        CalendarVersion.objects.update(version=F('version') + 1)
+        self.assertEqual(get_working_day_index().count_school_days(*week), 4)
+
+    def test_report_and_working_days_endpoint_use_school_days(self):
+        admin = User.objects.create_user(username='admin', email='admin@example.com', is_staff=True)
+        student = User.objects.create_user(username='s1', email='s1@example.com')
+        client = APIClient()
+        client.force_authenticate(admin)
+        SchoolCalendar.objects.create(date=date(2024, 3, 6), is_holiday=True)
+        SchoolCalendar.objects.create(date=date(2024, 3, 9), is_holiday=True)
+        Attendance.objects.create(student=student, date=date(2024, 3, 4), is_present=True)
+
+        response = client.post('/api/attendance/reports/generate_report/', {
+            'student_id': student.id, 'start_date': '2024-03-04', 'end_date': '2024-03-10'
+        })
+        self.assertEqual(response.data['report']['total_days'], 4)
+        self.assertEqual(response.data['attendance_percentage'], 25.0)
+
+        response = client.get('/api/attendance/calendar/working_days/', {
+            'start_date': '2024-03-04', 'end_date': '2024-03-10'
+        })
+        self.assertEqual(response.data['working_days'], 4)
+        self.assertEqual(response.data['holidays'], 2)
+        self.assertEqual(response.data['total_days'], 7)
+
+
+    def test_by_student_rates_against_school_days(self):
+        admin = User.objects.create_user(username='admin', email='admin@example.com', is_staff=True)
+        student = User.objects.create_user(username='s1', email='s1@example.com')
+        client = APIClient()
+        client.force_authenticate(admin)
+        SchoolCalendar.objects.create(date=date(2024, 3, 6), is_holiday=True)
+        for day, is_present in [(date(2024, 3, 4), True), (date(2024, 3, 5), False),
+                                (date(2024, 3, 6), True), (date(2024, 3, 9), True)]:
+            Attendance.objects.create(student=student, date=day, is_present=is_present)
+
+        url = '/api/attendance/attendance/by_student/'
+        # The open range runs from the first record to the last: the same four school days
+        for params in ({'start_date': '2024-03-04', 'end_date': '2024-03-10'}, {}):
+            response = client.get(url, {'student_id': student.id, **params})
+            self.assertEqual(response.data['statistics'], {
+                'total_days': 4, 'present_days': 1, 'absent_days': 3, 'attendance_percentage': 25.0
+            })
+
+
+class AttendanceChartTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username='s1', email='s1@example.com')
+        self.period = (date(2024, 3, 4), date(2024, 3, 8))
+
+    def test_png_rendered_once_per_data(self):
+        data = charts.attendance_chart_data(total_days=5, days_present=3)
+        self.assertEqual(data['values'], [3, 2])
+
+        with mock.patch.object(charts, 'render_bar_chart', wraps=charts.render_bar_chart) as render:
+            first = charts.attendance_chart_png(self.student.id, *self.period, data)
+            second = charts.attendance_chart_png(self.student.id, *self.period, data)
+            charts.attendance_chart_png(self.student.id, *self.period, charts.attendance_chart_data(5, 4))
+
+        self.assertEqual(first, second)
+        self.assertEqual(render.call_count, 2)
+        self.assertTrue(base64.b64decode(first).startswith(b'\x89PNG'))
+
+    def test_report_view_json_mode(self):
+        invalidate_working_day_index()
+        Attendance.objects.create(student=self.student, date=date(2024, 3, 4), is_present=True)
+        self.client.force_login(self.student)
+
+        response = self.client.post('/attendance/report/?format=json', {
+            'student': self.student.id, 'start_date': '2024-03-04', 'end_date': '2024-03-08'
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['chart']['values'], [1, 4])
+
+
+class AttendanceExportTests(TestCase):
+    url = '/api/attendance/attendance/export/'
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.students = [
+            User.objects.create_user(username=f's{i}', email=f's{i}@example.com') for i in range(3)
+        ]
+        Attendance.objects.bulk_create([
+            Attendance(student=student, date=date(2024, 3, day), is_present=day % 2 == 0)
+            for student in self.students for day in range(1, 11)
+        ])
+
+    def test_csv_export_streams_filtered_rows(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, {'start_date': '2024-03-05', 'end_date': '2024-03-06'})
+            lines = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(lines[0], 'id,student_id,student_username,student_name,date,is_present')
+        self.assertEqual(len(lines), 1 + 2 * 3)
+        self.assertTrue(lines[1].endswith(',2024-03-05,False'))
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_ndjson_export_scoped_to_student(self):
+        student = self.students[1]
+        UserProfile.objects.create(user=student, user_type='student')
+        self.client.force_authenticate(student)
+
+        response = self.client.get(self.url, {'output': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        self.assertEqual(len(rows), 10)
+        self.assertEqual({row['student_id'] for row in rows}, {student.id})
+
+    def test_invalid_output(self):
+        self.assertEqual(self.client.get(self.url, {'output': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start_date': 'soon'}).status_code, 400)
+
+
+class AttendanceImportTests(TestCase):
+    url = '/api/attendance/attendance/import/'
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.by_email = User.objects.create_user(username='a', email='a@example.com')
+        self.by_id = User.objects.create_user(username='b', email='b@example.com')
+        self.by_student_id = User.objects.create_user(username='c', email='c@example.com')
+        Student.objects.create(
+            user=self.by_student_id, student_id='STU-1', grade='7', address='-',
+            parent_name='-', parent_contact='-'
+        )
+        Attendance.objects.create(student=self.by_email, date=date(2024, 3, 4), is_present=False)
+
+    def upload(self, content):
+        return SimpleUploadedFile('attendance.csv', content.encode(), content_type='text/csv')
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0)
+    def test_imports_rows_and_reports_errors(self):
+        content = (
+            'student,date,is_present\n'
+            'a@example.com,2024-03-04,present\n'
+            f'{self.by_id.id},2024-03-04,0\n'
+            'STU-1,2024-03-05,yes\n'
+            'nobody@example.com,2024-03-05,yes\n'
+            'STU-1,05/03/2024,yes\n'
+            'STU-1,2024-03-06,maybe\n'
+        )
+
+        response = self.client.post(self.url, {'file': self.upload(content)}, format='multipart')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['rows'], 6)
+        self.assertEqual((response.data['created'], response.data['updated']), (2, 1))
+        self.assertEqual([error['row'] for error in response.data['errors']], [5, 6, 7])
+        self.assertTrue(Attendance.objects.get(student=self.by_email).is_present)
+        self.assertTrue(Attendance.objects.get(student=self.by_student_id, date=date(2024, 3, 5)).is_present)
+        self.assertEqual(AttendanceRollup.objects.get(student=self.by_email).days_present, 1)
+
+    def test_missing_columns_rejected(self):
+        response = self.client.post(self.url, {'file': self.upload('student,date\n')}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+
+    def test_command_resolves_each_batch_with_one_lookup(self):
+        path = self.enterContext(tempfile.TemporaryDirectory()) + '/attendance.csv'
+        with open(path, 'w') as csv_file:
+            csv_file.write('student,date,is_present\n')
+            for day in range(1, 29):
+                csv_file.write(f'c@example.com,2024-02-{day:02d},1\n')
+
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('import_attendance', path, batch_size=10, stdout=StringIO(), stderr=StringIO())
+
+        lookups = [q for q in ctx.captured_queries if 'accounts_customuser' in q['sql']]
+        self.assertEqual(len(lookups), 3)
+        self.assertEqual(Attendance.objects.filter(student=self.by_student_id).count(), 28)
@@ -1,14 +1,14 @@
-import base64
-import io
-
-import matplotlib.pyplot as plt
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 from django.shortcuts import render, redirect
 
+from .alerts import queue_low_attendance_check
+from .charts import attendance_chart_data, attendance_chart_png
 from .forms import AttendanceForm, AttendanceReportForm, BulkAttendanceForm, SchoolCalendarForm
 from .models import Attendance, AttendanceReport, SchoolCalendar
+from .working_days import get_working_day_index
 
 User = get_user_model()
 
@@ -19,7 +19,7 @@ def mark_attendance(request):
         form = AttendanceForm(request.POST)
         if form.is_valid():
             attendance = form.save()
-            Attendance.check_low_attendance(attendance.student)
+            queue_low_attendance_check([attendance.student_id])
             messages.success(request, 'Attendance marked successfully.')
             return redirect('mark_attendance')
     else:
@@ -39,6 +39,7 @@ def bulk_mark_attendance(request):
                 if key.startswith('student_')
             }
             Attendance.mark_bulk_attendance(date, student_data)
+            queue_low_attendance_check(student_data.keys())
             messages.success(request, 'Bulk attendance marked successfully.')
             return redirect('bulk_mark_attendance')
     else:
@@ -60,7 +61,7 @@ def attendance_report(request):
                 date__range=[start_date, end_date]
             )
 
-            total_days = (end_date - start_date).days + 1
+            total_days = get_working_day_index().count_school_days(start_date, end_date)
             days_present = attendances.filter(is_present=True).count()
 
             report = AttendanceReport.create_report(
@@ -71,20 +72,23 @@ def attendance_report(request):
                 days_present=days_present
             )
 
-            # Create graph
-            plt.figure(figsize=(10, 5))
-            plt.bar(['Present', 'Absent'], [days_present, total_days - days_present])
-            plt.title('Attendance Report')
-            plt.ylabel('Number of Days')
-
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format='png')
-            buffer.seek(0)
-            image_png = buffer.getvalue()
-            buffer.close()
-
-            graph = base64.b64encode(image_png)
-            graph = graph.decode('utf-8')
+            chart = attendance_chart_data(total_days, days_present)
+
+            # ?format=json returns the chart data for client-side drawing instead of a PNG
+            if request.GET.get('format') == 'json':
+                return JsonResponse({
+                    'report': {
+                        'id': report.id,
+                        'student': student.id,
+                        'start_date': start_date.isoformat(),
+                        'end_date': end_date.isoformat(),
+                        'total_days': total_days,
+                        'days_present': days_present,
+                    },
+                    'chart': chart,
+                })
+
+            graph = attendance_chart_png(student.id, start_date, end_date, chart)
 
             return render(request, 'attendance/report_result.html', {'report': report, 'graph': graph})
     else:
@@ -0,0 +1,139 @@
+"""
+In-process index of school days.
+
+A day is a school day when its weekday is one of the school weekdays
+(the ``schedules.DayOfWeek`` rows when that app is installed and has any,
+otherwise Monday to Friday) and it is not a ``SchoolCalendar`` holiday.
+
+Counting school days between two dates is O(log n) in the number of
+holidays: school weekdays come from a seven-entry prefix sum over the
+week, and the holidays that fall on school weekdays are kept sorted so
+their position in the list is their prefix count.
+
+The index is built once per process and rebuilt after a calendar change.
+Saves and deletes through the ORM bump the ``CalendarVersion`` row in the
+same transaction, and each lookup reads that row, so every process
+rebuilds once the change is committed. QuerySet.update()/bulk_create()
+bypass the signals; call ``invalidate_working_day_index()`` after those.
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
+from django.apps import apps
+from django.db.models import F, Q
+
+DEFAULT_SCHOOL_WEEKDAYS = (0, 1, 2, 3, 4)
+CALENDAR_VERSION_ID = 1
+
+
+class WorkingDayIndex:
+    def __init__(self, holiday_dates, school_weekdays=DEFAULT_SCHOOL_WEEKDAYS):
+        self.school_weekdays = tuple(sorted(set(school_weekdays)))
+
+        # weekday_prefix[i] = school weekdays among Monday..weekday i-1
+        self._weekday_prefix = [0]
+        for weekday in range(7):
+            self._weekday_prefix.append(self._weekday_prefix[-1] + (weekday in self.school_weekdays))
+
+        self.holidays = sorted(set(holiday_dates))
+        # Holidays that would otherwise have been school days
+        self._closures = [day for day in self.holidays if day.weekday() in self.school_weekdays]
+
+    def _school_weekdays_before(self, day):
+        # Ordinal 1 (0001-01-01) is a Monday, so whole weeks line up with the prefix table
+        weeks, remainder = divmod(day.toordinal() - 1, 7)
+        return weeks * self._weekday_prefix[7] + self._weekday_prefix[remainder]
+
+    def count_school_days(self, start_date, end_date):
+        """Number of school days in the inclusive range"""
+        if end_date < start_date:
+            return 0
+        weekdays = (
+            self._school_weekdays_before(end_date + timedelta(days=1))
+            - self._school_weekdays_before(start_date)
+        )
+        closures = bisect_right(self._closures, end_date) - bisect_left(self._closures, start_date)
+        return weekdays - closures
+
+    def is_school_day(self, day):
+        if day.weekday() not in self.school_weekdays:
+            return False
+        position = bisect_left(self._closures, day)
+        return position == len(self._closures) or self._closures[position] != day
+
+    def school_days_q(self, start_date, end_date, field='date'):
+        """A Q matching dates in ``field`` that are school days in the inclusive range"""
+        condition = Q(**{f'{field}__range': [start_date, end_date]})
+        if len(self.school_weekdays) < 7:
+            # iso_week_day counts Monday as 1
+            condition &= Q(**{f'{field}__iso_week_day__in': [weekday + 1 for weekday in self.school_weekdays]})
+        closures = self._closures[bisect_left(self._closures, start_date):bisect_right(self._closures, end_date)]
+        if closures:
+            condition &= ~Q(**{f'{field}__in': closures})
+        return condition
+
+    def holidays_between(self, start_date, end_date):
+        """Calendar holidays in the inclusive range, including those on weekends"""
+        return self.holidays[bisect_left(self.holidays, start_date):bisect_right(self.holidays, end_date)]
+
+    def non_school_days(self, start_date, end_date):
+        """Every day in the inclusive range that is not a school day"""
+        day = start_date
+        while day <= end_date:
+            if not self.is_school_day(day):
+                yield day
+            day += timedelta(days=1)
+
+
+_lock = threading.Lock()
+_index = None
+_index_version = None
+
+
+def build_working_day_index():
+    """Read the calendar and school weekdays from the database"""
+    from .models import SchoolCalendar
+
+    holidays = SchoolCalendar.objects.filter(is_holiday=True).values_list('date', flat=True)
+
+    school_weekdays = ()
+    if apps.is_installed('schedules'):
+        DayOfWeek = apps.get_model('schedules', 'DayOfWeek')
+        school_weekdays = tuple(DayOfWeek.objects.values_list('day', flat=True))
+
+    return WorkingDayIndex(holidays, school_weekdays or DEFAULT_SCHOOL_WEEKDAYS)
+
+
+def calendar_version():
+    from .models import CalendarVersion
+
+    return CalendarVersion.objects.filter(pk=CALENDAR_VERSION_ID).values_list('version', flat=True).first()
+
+
+def get_working_day_index():
+    """The current process-wide index, rebuilt if the calendar changed"""
+    global _index, _index_version
+
+    # Read before the calendar so a concurrent change can only cause an extra rebuild
+    version = calendar_version()
+    index = _index
+    if index is not None and _index_version == version:
+        return index
+
+    with _lock:
+        if _index is None or _index_version != version:
+            _index = build_working_day_index()
+            _index_version = version
+        return _index
+
+
+def invalidate_working_day_index():
+    """Drop this process's index and bump the calendar version so every process rebuilds"""
+    global _index
+    from .models import CalendarVersion
+
+    _index = None
+    if not CalendarVersion.objects.filter(pk=CALENDAR_VERSION_ID).update(version=F('version') + 1):
+        CalendarVersion.objects.get_or_create(pk=CALENDAR_VERSION_ID, defaults={'version': 1})
@@ -1,7 +1,14 @@
 from django.contrib import admin
-from .models import Message, Notification
+from .models import Message, Notification, OutgoingEmail
 
 admin.site.register(Message)
 admin.site.register(Notification)
 
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'to_email', 'category', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status', 'category']
+    search_fields = ['to_email', 'subject', 'dedup_key']
+
 # Register your models here.
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from communication.outbox import (
+    DEFAULT_BACKOFF_SECONDS, DEFAULT_BATCH_SIZE, DEFAULT_MAX_ATTEMPTS, drain_outbox
+)
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbox emails in batches, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Emails per connection')
+        parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS, help='Give up after this many tries')
+        parser.add_argument('--backoff', type=int, default=DEFAULT_BACKOFF_SECONDS, help='Seconds before the first retry; doubles each attempt')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting once it is drained')
+        parser.add_argument('--interval', type=float, default=10, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = drain_outbox(options['batch_size'], options['max_attempts'], options['backoff'])
+            if sent or failed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Sent {sent} emails, {failed} failed'))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,173 @@
+"""
+Database-backed email outbox.
+
+Callers queue mail with ``queue_email``/``queue_emails``, which only insert
+rows, so a slow or unreachable mail server never holds up a request. The
+``send_queued_email`` management command drains the queue in batches over
+a single backend connection, retrying failures with exponential backoff.
+No database transaction is held open while talking to the mail server.
+Any Django email backend works, including locmem and file for offline use.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection as db_connection, transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF_SECONDS = 60
+DEFAULT_LEASE_SECONDS = 10 * 60
+
+
+def dedup_window_key(prefix, object_id, window_days, now=None):
+    """
+    Key shared by every message about ``object_id`` within the same
+    ``window_days``-long window, for use as ``dedup_key``.
+
+    Windows are fixed buckets of consecutive days, not a sliding period
+    since the last message: day ordinals are divided by ``window_days``, so
+    with 7 the buckets are Sunday-to-Saturday weeks. At most one message is
+    queued per bucket, but messages in neighbouring buckets can be as little
+    as a day apart (Saturday, then Sunday).
+    """
+    day = (now or timezone.now()).date()
+    window = day.toordinal() // window_days
+    return f'{prefix}:{object_id}:{window_days}d:{window}'
+
+
+def queue_emails(messages):
+    """
+    Queue unsaved ``OutgoingEmail`` instances in one insert. Messages whose
+    ``dedup_key`` is already queued (or was already sent) are dropped.
+    Returns the number of messages passed in.
+    """
+    messages = list(messages)
+    for message in messages:
+        if not message.from_email:
+            message.from_email = settings.DEFAULT_FROM_EMAIL
+    OutgoingEmail.objects.bulk_create(messages, ignore_conflicts=True)
+    return len(messages)
+
+
+def queue_email(to_email, subject, body, from_email='', category='', dedup_key=None):
+    """Queue a single email"""
+    return queue_emails([OutgoingEmail(
+        to_email=to_email,
+        from_email=from_email,
+        subject=subject,
+        body=body,
+        category=category,
+        dedup_key=dedup_key,
+    )])
+
+
+def retry_delay(attempts, backoff_seconds=DEFAULT_BACKOFF_SECONDS):
+    """Exponential backoff: backoff, 2x backoff, 4x backoff, ..."""
+    return timedelta(seconds=backoff_seconds * 2 ** max(attempts - 1, 0))
+
+
+def claim_due_emails(batch_size, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Take up to ``batch_size`` due emails for this worker. Their
+    ``next_attempt_at`` is pushed ``lease_seconds`` ahead and committed, so
+    no other worker picks them up while they are being sent, and a worker
+    that dies mid-batch only delays them until the lease runs out.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = OutgoingEmail.objects.filter(status='pending', next_attempt_at__lte=now).order_by('next_attempt_at', 'id')
+        if db_connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        batch = list(due[:batch_size])
+        if batch:
+            OutgoingEmail.objects.filter(pk__in=[message.pk for message in batch]).update(
+                next_attempt_at=now + timedelta(seconds=lease_seconds)
+            )
+    return batch
+
+
+def send_queued_emails(batch_size=DEFAULT_BATCH_SIZE, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                       backoff_seconds=DEFAULT_BACKOFF_SECONDS):
+    """
+    Send one batch of due emails over a single backend connection.
+
+    The batch is claimed in one short transaction (skipping rows another
+    worker is claiming, where the database supports it), sent with no
+    transaction open, and the outcomes are saved in a second one. Returns a
+    ``(sent, failed)`` tuple; failed messages are rescheduled until they
+    reach ``max_attempts``.
+    """
+    sent, failed = 0, 0
+    batch = claim_due_emails(batch_size)
+    if not batch:
+        return sent, failed
+
+    mail_connection = get_connection(fail_silently=False)
+    open_error = None
+    try:
+        mail_connection.open()
+    except Exception as exc:
+        logger.warning('Could not open mail connection: %s', exc)
+        open_error = exc
+
+    try:
+        for message in batch:
+            error = open_error
+            if error is None:
+                try:
+                    EmailMessage(
+                        subject=message.subject,
+                        body=message.body,
+                        from_email=message.from_email or None,
+                        to=[message.to_email],
+                        connection=mail_connection,
+                    ).send()
+                except Exception as exc:
+                    error = exc
+
+            message.attempts += 1
+            if error is None:
+                message.status = 'sent'
+                message.sent_at = timezone.now()
+                message.last_error = ''
+                sent += 1
+            else:
+                message.last_error = f'{type(error).__name__}: {error}'
+                if message.attempts >= max_attempts:
+                    message.status = 'failed'
+                else:
+                    message.next_attempt_at = timezone.now() + retry_delay(message.attempts, backoff_seconds)
+                failed += 1
+    finally:
+        if open_error is None:
+            try:
+                mail_connection.close()
+            except Exception:
+                logger.exception('Error closing mail connection')
+
+    with transaction.atomic():
+        OutgoingEmail.objects.bulk_update(
+            batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+        )
+
+    return sent, failed
+
+
+def drain_outbox(batch_size=DEFAULT_BATCH_SIZE, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 backoff_seconds=DEFAULT_BACKOFF_SECONDS):
+    """Send batches until nothing is due; returns total ``(sent, failed)``"""
+    total_sent, total_failed = 0, 0
+    while True:
+        sent, failed = send_queued_emails(batch_size, max_attempts, backoff_seconds)
+        total_sent += sent
+        total_failed += failed
+        if sent + failed < batch_size:
+            return total_sent, total_failed
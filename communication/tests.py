@@ -1,3 +1,93 @@
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.utils import timezone
+
+from .models import OutgoingEmail
+from .outbox import dedup_window_key, queue_email, send_queued_emails
+
+
+class OutboxTests(TestCase):
+    def test_batch_sent_over_one_connection(self):
+        for i in range(5):
+            queue_email(f'user{i}@example.com', 'Hello', 'Body')
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open') as open_connection:
+            sent, failed = send_queued_emails(batch_size=3)
+
+        self.assertEqual((sent, failed), (3, 0))
+        self.assertEqual(open_connection.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(OutgoingEmail.objects.filter(status='pending').count(), 2)
+
+        call_command('send_queued_email', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(OutgoingEmail.objects.exclude(status='sent').exists())
+
+    def test_sends_outside_a_transaction_with_the_batch_claimed(self):
+        queue_email('a@example.com', 'Hello', 'Body')
+        depth = len(connection.savepoint_ids)
+        seen = []
+
+        def send_messages(messages):
+            seen.append((
+                len(connection.savepoint_ids),
+                OutgoingEmail.objects.filter(next_attempt_at__lte=timezone.now()).exists(),
+            ))
+            return len(messages)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=send_messages):
+            self.assertEqual(send_queued_emails(), (1, 0))
+
+        # No savepoint beyond the test's own, and no longer due for other workers
+        self.assertEqual(seen, [(depth, False)])
+        self.assertEqual(OutgoingEmail.objects.get().status, 'sent')
+
+    def test_dedup_key_queues_once_per_window(self):
+        now = timezone.now()
+        key = dedup_window_key('alert', 1, 7, now)
+        queue_email('a@example.com', 'Alert', 'Body', dedup_key=key)
+        queue_email('a@example.com', 'Alert', 'Body', dedup_key=key)
+        queue_email('a@example.com', 'Alert', 'Body', dedup_key=dedup_window_key('alert', 1, 7, now + timedelta(days=7)))
+
+        self.assertEqual(OutgoingEmail.objects.count(), 2)
+
+    def test_dedup_windows_are_fixed_weeks(self):
+        saturday = timezone.make_aware(timezone.datetime(2024, 3, 9, 12))
+        self.assertEqual(dedup_window_key('alert', 1, 7, saturday), dedup_window_key('alert', 1, 7, saturday - timedelta(days=6)))
+        # Sunday starts the next window, only a day later
+        self.assertNotEqual(dedup_window_key('alert', 1, 7, saturday), dedup_window_key('alert', 1, 7, saturday + timedelta(days=1)))
+
+    def test_failures_back_off_then_give_up(self):
+        queue_email('a@example.com', 'Hello', 'Body')
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            self.assertEqual(send_queued_emails(max_attempts=2, backoff_seconds=30), (0, 1))
+            email = OutgoingEmail.objects.get()
+            self.assertEqual((email.status, email.attempts), ('pending', 1))
+            self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=20))
+            self.assertIn('down', email.last_error)
+
+            # Not due yet
+            self.assertEqual(send_queued_emails(max_attempts=2), (0, 0))
+
+            OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+            send_queued_emails(max_attempts=2)
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('failed', 2))
 
-# Create your tests here.
+    def test_file_backend(self):
+        with tempfile.TemporaryDirectory() as path, self.settings(
+            EMAIL_BACKEND='django.core.mail.backends.filebased.EmailBackend', EMAIL_FILE_PATH=path
+        ):
+            queue_email('a@example.com', 'Hello', 'Body')
+            self.assertEqual(send_queued_emails(), (1, 0))
+            self.assertEqual(len(os.listdir(path)), 1)
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     Course, CourseEnrollment, CourseContent, Assignment,
-    AssignmentSubmission, CourseAnnouncement
+    AssignmentSubmission, CourseAnnouncement, CourseWaitlistEntry, StoredFile, UploadSession
 )
 
 
@@ -10,7 +10,7 @@ class CourseAdmin(admin.ModelAdmin):
     list_display = ['title', 'subject', 'instructor', 'difficulty_level', 'status', 'start_date', 'enrollment_count']
     list_filter = ['subject', 'difficulty_level', 'status', 'start_date']
     search_fields = ['title', 'description', 'subject__name', 'instructor__user__first_name']
-    readonly_fields = ['enrollment_count', 'completion_rate', 'created_at', 'updated_at']
+    readonly_fields = ['enrollment_count', 'active_seat_count', 'completion_rate', 'created_at', 'updated_at']
     filter_horizontal = ['prerequisites']
     date_hierarchy = 'start_date'
     ordering = ['-created_at']
@@ -26,6 +26,14 @@ class CourseEnrollmentAdmin(admin.ModelAdmin):
     ordering = ['-date_enrolled']
 
 
+@admin.register(CourseWaitlistEntry)
+class CourseWaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ['student', 'course', 'created_at']
+    list_filter = ['course__subject']
+    search_fields = ['student__user__first_name', 'student__user__last_name', 'course__title']
+    ordering = ['course', 'created_at']
+
+
 @admin.register(CourseContent)
 class CourseContentAdmin(admin.ModelAdmin):
     list_display = ['title', 'course', 'content_type', 'order', 'is_required', 'created_at']
@@ -60,3 +68,20 @@ class CourseAnnouncementAdmin(admin.ModelAdmin):
     list_filter = ['is_pinned', 'created_at', 'course__subject']
     search_fields = ['title', 'content', 'course__title']
     ordering = ['-is_pinned', '-created_at']
+
+
+@admin.register(StoredFile)
+class StoredFileAdmin(admin.ModelAdmin):
+    list_display = ['file', 'size', 'sha256', 'created_at']
+    search_fields = ['sha256', 'file']
+    readonly_fields = ['sha256', 'size', 'created_at']
+    ordering = ['-created_at']
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'owner', 'size', 'status', 'created_at', 'completed_at']
+    list_filter = ['status']
+    search_fields = ['filename', 'owner__email']
+    readonly_fields = ['stored_file', 'created_at', 'completed_at']
+    ordering = ['-created_at']
@@ -0,0 +1,154 @@
+"""
+Per-course analytics computed with database aggregates.
+
+Each section is one conditional-aggregate query (plus one ordered lookup
+per percentile), however many enrollments or submissions a course has.
+Results are cached per course and dropped by the signals in
+``courses.signals`` whenever enrollments, content, assignments or
+submissions change; code that writes with QuerySet.update() or
+bulk_update() should call ``invalidate_course_analytics`` itself.
+"""
+
+import math
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, ExpressionWrapper, F, FloatField, Max, Min, Q
+from django.utils import timezone
+
+from .models import Assignment, AssignmentSubmission, CourseContent, CourseEnrollment
+
+ANALYTICS_CACHE_TIMEOUT = 60 * 15
+HISTOGRAM_BUCKET_WIDTH = 10
+PERCENTILES = (25, 50, 75, 90)
+RECENT_ACTIVITY_DAYS = 7
+
+
+def analytics_cache_key(course_id):
+    return f'courses:analytics:{course_id}'
+
+
+def invalidate_course_analytics(course_id):
+    cache.delete(analytics_cache_key(course_id))
+
+
+def get_course_analytics(course):
+    """Cached analytics for ``course``, computed on a miss"""
+    key = analytics_cache_key(course.pk)
+    data = cache.get(key)
+    if data is None:
+        data = compute_course_analytics(course)
+        cache.set(key, data, ANALYTICS_CACHE_TIMEOUT)
+    return data
+
+
+def as_float(value):
+    return float(value) if value is not None else None
+
+
+def enrollment_stats(course, since):
+    counts = CourseEnrollment.objects.filter(course=course).aggregate(
+        total_enrolled=Count('id', filter=Q(is_active=True)),
+        completed=Count('id', filter=Q(completion_date__isnull=False)),
+        active=Count('id', filter=Q(is_active=True, completion_date__isnull=True)),
+        completed_active=Count('id', filter=Q(is_active=True, completion_date__isnull=False)),
+        recent=Count('id', filter=Q(date_enrolled__gte=since)),
+    )
+    total = counts['total_enrolled']
+    counts['completion_rate'] = round(counts.pop('completed_active') / total * 100, 2) if total else 0
+    return counts
+
+
+def content_stats(course):
+    by_type = list(
+        CourseContent.objects.filter(course=course).values('content_type').annotate(count=Count('id')).order_by('content_type')
+    )
+    return {
+        'total_content': sum(row['count'] for row in by_type),
+        'by_type': by_type,
+    }
+
+
+def grade_stats(course, since):
+    """Submission counts, raw grade summary, and a histogram/percentiles of scores as % of total points"""
+    submissions = AssignmentSubmission.objects.filter(assignment__content__course=course)
+
+    buckets = range(0, 100, HISTOGRAM_BUCKET_WIDTH)
+    scored = submissions.filter(grade__isnull=False, assignment__total_points__gt=0).annotate(
+        score=ExpressionWrapper(F('grade') * 100.0 / F('assignment__total_points'), output_field=FloatField())
+    )
+
+    bucket_filters = {}
+    for low in buckets:
+        high = low + HISTOGRAM_BUCKET_WIDTH
+        # The top bucket also holds 100% and any bonus points above it
+        score_range = Q(score__gte=low) if high >= 100 else Q(score__gte=low, score__lt=high)
+        bucket_filters[f'bucket_{low}'] = Count('id', filter=score_range)
+
+    totals = submissions.aggregate(
+        total_submissions=Count('id'),
+        graded_submissions=Count('id', filter=Q(grade__isnull=False)),
+        recent_submissions=Count('id', filter=Q(submitted_at__gte=since)),
+        average=Avg('grade'),
+        highest=Max('grade'),
+        lowest=Min('grade'),
+    )
+    scores = scored.aggregate(average_percentage=Avg('score'), scored=Count('id'), **bucket_filters)
+
+    distribution = {}
+    if totals['graded_submissions']:
+        distribution = {
+            'average': as_float(totals['average']),
+            'highest': as_float(totals['highest']),
+            'lowest': as_float(totals['lowest']),
+            'total_graded': totals['graded_submissions'],
+            'average_percentage': round(scores['average_percentage'], 2) if scores['scored'] else None,
+            'histogram': [
+                {
+                    'range': f'{low}-{low + HISTOGRAM_BUCKET_WIDTH}',
+                    'count': scores[f'bucket_{low}'],
+                }
+                for low in buckets
+            ],
+            'percentiles': score_percentiles(scored, scores['scored']),
+        }
+
+    return totals, distribution
+
+
+def score_percentiles(scored, count):
+    """Nearest-rank percentiles, one indexed lookup each rather than loading every score"""
+    if not count:
+        return {}
+    ordered = scored.order_by('score').values_list('score', flat=True)
+    return {
+        f'p{percentile}': round(ordered[max(math.ceil(percentile * count / 100) - 1, 0)], 2)
+        for percentile in PERCENTILES
+    }
+
+
+def compute_course_analytics(course):
+    since = timezone.now() - timedelta(days=RECENT_ACTIVITY_DAYS)
+    enrollments = enrollment_stats(course, since)
+    submissions, distribution = grade_stats(course, since)
+
+    return {
+        'enrollment_stats': {
+            'total_enrolled': enrollments['total_enrolled'],
+            'completed': enrollments['completed'],
+            'active': enrollments['active'],
+            'completion_rate': enrollments['completion_rate'],
+        },
+        'content_stats': content_stats(course),
+        'assignment_stats': {
+            'total_assignments': Assignment.objects.filter(content__course=course).count(),
+            'total_submissions': submissions['total_submissions'],
+            'graded_submissions': submissions['graded_submissions'],
+        },
+        'grade_distribution': distribution,
+        'recent_activity': {
+            'recent_enrollments': enrollments['recent'],
+            'recent_submissions': submissions['recent_submissions'],
+        },
+        'generated_at': timezone.now().isoformat(),
+    }
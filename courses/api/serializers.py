@@ -2,8 +2,10 @@ from rest_framework import serializers
 from django.utils import timezone
 from ..models import (
     Course, CourseEnrollment, CourseContent, Assignment, 
-    AssignmentSubmission, CourseAnnouncement
+    AssignmentSubmission, CourseAnnouncement, CourseWaitlistEntry, StoredFile, UploadSession
 )
+from ..prerequisites import PrerequisiteCycleError, check_new_prerequisites
+from ..uploads import missing_parts
 from students.models import Student
 from teachers.models import Teacher, Subject
 
@@ -90,6 +92,17 @@ class CourseCreateUpdateSerializer(serializers.ModelSerializer):
             'max_students', 'credits', 'prerequisites', 'thumbnail'
         ]
     
+    def validate_prerequisites(self, value):
+        # A new course can't be anyone's prerequisite yet, so only updates can close a cycle
+        if self.instance is not None:
+            try:
+                check_new_prerequisites(
+                    ((self.instance.pk, course.pk) for course in value), replacing=self.instance.pk
+                )
+            except PrerequisiteCycleError as exc:
+                raise serializers.ValidationError(exc.messages)
+        return value
+    
     def validate(self, data):
         if data.get('end_date') and data.get('start_date'):
             if data['end_date'] <= data['start_date']:
@@ -118,6 +131,15 @@ class CourseEnrollmentSerializer(serializers.ModelSerializer):
         return (timezone.now().date() - obj.date_enrolled.date()).days
 
 
+class CourseWaitlistEntrySerializer(serializers.ModelSerializer):
+    """Serializer for students waiting for a seat in a full course"""
+    student = StudentSimpleSerializer(read_only=True)
+    
+    class Meta:
+        model = CourseWaitlistEntry
+        fields = ['id', 'student', 'created_at']
+
+
 class CourseEnrollmentCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating enrollments"""
     
@@ -168,6 +190,17 @@ class CourseContentSerializer(serializers.ModelSerializer):
         return hasattr(obj, 'assignment')
 
 
+class CourseContentBulkItemSerializer(serializers.ModelSerializer):
+    """One item of a bulk content insert; course and order are assigned by the insert"""
+    
+    class Meta:
+        model = CourseContent
+        fields = [
+            'title', 'content_type', 'description', 'content_url',
+            'is_required', 'estimated_duration'
+        ]
+
+
 class AssignmentSerializer(serializers.ModelSerializer):
     """Serializer for assignments"""
     content = CourseContentSerializer(read_only=True)
@@ -308,3 +341,30 @@ class CourseStatsSerializer(serializers.Serializer):
     average_completion_rate = serializers.FloatField()
     most_popular_courses = CourseListSerializer(many=True)
     recent_enrollments = CourseEnrollmentSerializer(many=True)
+
+
+class StoredFileSerializer(serializers.ModelSerializer):
+    """Serializer for deduplicated uploaded files"""
+    
+    class Meta:
+        model = StoredFile
+        fields = ['id', 'sha256', 'file', 'size', 'created_at']
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """Serializer for chunked upload sessions, with what is left to send"""
+    part_count = serializers.ReadOnlyField()
+    missing_parts = serializers.SerializerMethodField()
+    stored_file = StoredFileSerializer(read_only=True)
+    
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'filename', 'size', 'chunk_size', 'part_count', 'missing_parts',
+            'status', 'stored_file', 'created_at', 'completed_at'
+        ]
+    
+    def get_missing_parts(self, obj):
+        if obj.status == 'complete':
+            return []
+        return missing_parts(obj)
@@ -10,6 +10,7 @@ router.register(r'content', views.CourseContentViewSet, basename='content')
 router.register(r'assignments', views.AssignmentViewSet, basename='assignment')
 router.register(r'submissions', views.AssignmentSubmissionViewSet, basename='submission')
 router.register(r'announcements', views.CourseAnnouncementViewSet, basename='announcement')
+router.register(r'uploads', views.UploadSessionViewSet, basename='upload')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -27,6 +28,8 @@ urlpatterns = [
 # GET /api/courses/{id}/content/ - Get course content
 # GET /api/courses/{id}/assignments/ - Get course assignments
 # GET /api/courses/{id}/enrollments/ - Get course enrollments
+# GET /api/courses/{id}/waitlist/ - Get students waiting for a seat
+# GET /api/courses/eligible_courses/ - Courses the student has the prerequisites for
 # GET /api/courses/{id}/analytics/ - Get course analytics
 # GET /api/courses/statistics/ - Get overall course statistics
 
@@ -38,6 +41,9 @@ urlpatterns = [
 # GET /api/content/ - List course content
 # POST /api/content/ - Create content
 # POST /api/content/bulk_create/ - Create multiple contents
+# POST /api/content/{id}/move/ - Move content to another order
+# POST /api/content/{id}/complete/ - Mark content completed by the student
+# GET /api/content/{id}/download/ - Stream the content file (Range/ETag aware)
 
 # GET /api/assignments/ - List assignments
 # POST /api/assignments/ - Create assignment
@@ -47,7 +53,13 @@ urlpatterns = [
 # GET /api/submissions/ - List submissions
 # POST /api/submissions/ - Create submission
 # POST /api/submissions/{id}/grade/ - Grade submission
+# GET /api/submissions/{id}/download/ - Download the submitted file
 
 # GET /api/announcements/ - List announcements
 # POST /api/announcements/ - Create announcement
 # POST /api/announcements/{id}/toggle_pin/ - Toggle pin status
+
+# POST /api/uploads/ - Start a chunked upload
+# GET /api/uploads/{id}/ - Upload status and missing parts
+# PUT /api/uploads/{id}/parts/{index}/ - Upload one part
+# POST /api/uploads/{id}/complete/ - Assemble and optionally attach the file
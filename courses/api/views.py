@@ -1,27 +1,41 @@
-from rest_framework import viewsets, status, filters
+import io
+
+from rest_framework import mixins, viewsets, status, filters
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Count, Avg, Sum
+from django.db.models import Q, Prefetch
 from django.utils import timezone
-from datetime import timedelta
 from accounts.permissions import (
     IsOwnerOrAdmin, IsStaffOrAdmin, IsTeacherOrAdmin,
     ReadOnlyForStudents, IsStudentOrTeacherOrAdmin
 )
 from rest_framework.permissions import BasePermission
+from accounts.snapshots import snapshot_response
 
+from ..analytics import get_course_analytics
+from ..enrollment import (
+    ALREADY_ENROLLED, WAITLISTED, enroll_student, promote_from_waitlist,
+    recount_active_seats, unenroll_student, waitlist_position
+)
+from ..grading import bulk_grade_submissions
+from ..media import serve_field_file
+from ..ordering import insert_contents, move_content
+from ..prerequisites import eligible_course_ids, missing_prerequisites
+from ..progress import complete_content
+from ..uploads import UploadError, attach_stored_file, complete_upload, save_part, start_upload
 from ..models import (
     Course, CourseEnrollment, CourseContent, Assignment,
-    AssignmentSubmission, CourseAnnouncement
+    AssignmentSubmission, CourseAnnouncement, UploadSession
 )
 from .serializers import (
     CourseListSerializer, CourseDetailSerializer, CourseCreateUpdateSerializer,
     CourseEnrollmentSerializer, CourseEnrollmentCreateSerializer,
     CourseContentSerializer, AssignmentSerializer, AssignmentCreateUpdateSerializer,
     AssignmentSubmissionSerializer, AssignmentSubmissionCreateSerializer,
-    AssignmentGradingSerializer, CourseAnnouncementSerializer, CourseStatsSerializer
+    AssignmentGradingSerializer, CourseAnnouncementSerializer,
+    CourseWaitlistEntrySerializer, CourseContentBulkItemSerializer, UploadSessionSerializer
 )
 
 
@@ -106,7 +120,7 @@ class CourseViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['subject', 'instructor', 'difficulty_level', 'status']
     search_fields = ['title', 'description', 'subject__name', 'instructor__user__first_name', 'instructor__user__last_name']
-    ordering_fields = ['title', 'start_date', 'end_date', 'created_at', 'enrollment_count']
+    ordering_fields = ['title', 'start_date', 'end_date', 'created_at', 'active_enrollment_count']
     ordering = ['-created_at']
     
     def get_permissions(self):
@@ -116,7 +130,7 @@ class CourseViewSet(viewsets.ModelViewSet):
         if self.action in ['create']:
             # Teachers and staff/admins can create courses
             permission_classes = [IsTeacherOrAdmin]
-        elif self.action in ['update', 'partial_update', 'destroy']:
+        elif self.action in ['update', 'partial_update', 'destroy', 'waitlist']:
             # Course instructors can update their courses, staff/admins can update any
             permission_classes = [CanManageCourse]
         elif self.action in ['enroll', 'unenroll']:
@@ -132,7 +146,14 @@ class CourseViewSet(viewsets.ModelViewSet):
         """
         Filter queryset based on user role and permissions
         """
-        queryset = Course.objects.select_related('subject', 'instructor__user').prefetch_related('prerequisites')
+        queryset = Course.objects.with_enrollment_stats().select_related(
+            'subject', 'instructor__user'
+        ).prefetch_related(
+            Prefetch(
+                'prerequisites',
+                queryset=Course.objects.with_enrollment_stats().select_related('subject', 'instructor__user')
+            )
+        )
         user = self.request.user
         
         # Admin users and staff can see all courses
@@ -192,6 +213,11 @@ class CourseViewSet(viewsets.ModelViewSet):
             return CourseCreateUpdateSerializer
         return CourseDetailSerializer
     
+    def perform_update(self, serializer):
+        course = serializer.save()
+        # Raising max_students frees seats for students on the waitlist
+        promote_from_waitlist(course.pk)
+    
     @action(detail=True, methods=['post'])
     def enroll(self, request, pk=None):
         """Enroll a student in the course"""
@@ -205,28 +231,40 @@ class CourseViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Check if already enrolled
-        if CourseEnrollment.objects.filter(student=student, course=course, is_active=True).exists():
+        missing = missing_prerequisites(course, student)
+        if missing:
+            titles = dict(Course.objects.filter(pk__in=missing).values_list('pk', 'title'))
             return Response(
-                {'error': 'Already enrolled in this course'},
+                {
+                    'error': 'Prerequisites not completed',
+                    'missing_prerequisites': [{'id': pk, 'title': titles.get(pk)} for pk in missing],
+                },
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check if course is full
-        if course.is_full:
+        # Seats are claimed atomically; when the course is full the student is waitlisted
+        result, obj = enroll_student(course, student)
+        if result == ALREADY_ENROLLED:
             return Response(
-                {'error': 'Course is full'},
+                {'error': 'Already enrolled in this course'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if result == WAITLISTED:
+            return Response(
+                {
+                    'status': WAITLISTED,
+                    'message': 'Course is full; you have been added to the waitlist',
+                    'waitlist_position': waitlist_position(course.pk, obj),
+                },
+                status=status.HTTP_202_ACCEPTED
+            )
         
-        # Create enrollment
-        enrollment = CourseEnrollment.objects.create(student=student, course=course)
-        serializer = CourseEnrollmentSerializer(enrollment)
+        serializer = CourseEnrollmentSerializer(obj)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
     @action(detail=True, methods=['post'])
     def unenroll(self, request, pk=None):
-        """Unenroll a student from the course"""
+        """Unenroll a student from the course (or leave its waitlist)"""
         course = self.get_object()
         
         try:
@@ -237,16 +275,12 @@ class CourseViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        try:
-            enrollment = CourseEnrollment.objects.get(student=student, course=course, is_active=True)
-            enrollment.is_active = False
-            enrollment.save()
+        if unenroll_student(course, student):
             return Response({'message': 'Successfully unenrolled'}, status=status.HTTP_200_OK)
-        except CourseEnrollment.DoesNotExist:
-            return Response(
-                {'error': 'Not enrolled in this course'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        return Response(
+            {'error': 'Not enrolled in this course'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
     @action(detail=True, methods=['get'])
     def content(self, request, pk=None):
@@ -273,92 +307,55 @@ class CourseViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
-    def analytics(self, request, pk=None):
-        """Get detailed analytics for a specific course"""
+    def waitlist(self, request, pk=None):
+        """Get the students waiting for a seat, in the order they will be enrolled"""
         course = self.get_object()
-        
-        analytics_data = {
-            'enrollment_stats': {
-                'total_enrolled': course.enrollment_count,
-                'completed': course.enrollments.filter(completion_date__isnull=False).count(),
-                'active': course.enrollments.filter(is_active=True, completion_date__isnull=True).count(),
-                'completion_rate': course.completion_rate
-            },
-            'content_stats': {
-                'total_content': course.contents.count(),
-                'by_type': course.contents.values('content_type').annotate(count=Count('id'))
-            },
-            'assignment_stats': {
-                'total_assignments': Assignment.objects.filter(content__course=course).count(),
-                'total_submissions': AssignmentSubmission.objects.filter(assignment__content__course=course).count(),
-                'graded_submissions': AssignmentSubmission.objects.filter(
-                    assignment__content__course=course,
-                    grade__isnull=False
-                ).count()
-            },
-            'grade_distribution': self._get_grade_distribution(course),
-            'recent_activity': self._get_recent_activity(course)
-        }
-        
-        return Response(analytics_data)
+        entries = course.waitlist.select_related('student__user')
+        serializer = CourseWaitlistEntrySerializer(entries, many=True)
+        return Response(serializer.data)
     
-    def _get_grade_distribution(self, course):
-        """Helper method to get grade distribution"""
-        submissions = AssignmentSubmission.objects.filter(
-            assignment__content__course=course,
-            grade__isnull=False
-        )
-        
-        if not submissions:
-            return {}
-        
-        grades = [float(sub.grade) for sub in submissions]
-        return {
-            'average': sum(grades) / len(grades),
-            'highest': max(grades),
-            'lowest': min(grades),
-            'total_graded': len(grades)
-        }
+    @action(detail=True, methods=['get'])
+    def analytics(self, request, pk=None):
+        """Get detailed analytics for a specific course (cached until its data changes)"""
+        course = self.get_object()
+        return Response(get_course_analytics(course))
     
-    def _get_recent_activity(self, course):
-        """Helper method to get recent course activity"""
-        recent_enrollments = course.enrollments.filter(
-            date_enrolled__gte=timezone.now() - timedelta(days=7)
-        ).count()
+    @action(detail=False, methods=['get'])
+    def eligible_courses(self, request):
+        """
+        Get the published courses the current student can enroll in: not
+        already enrolled or completed, with every prerequisite (direct or
+        indirect) completed.
+        """
+        try:
+            student = request.user.student
+        except:
+            return Response(
+                {'error': 'Only students have eligible courses'},
+                status=status.HTTP_403_FORBIDDEN
+            )
         
-        recent_submissions = AssignmentSubmission.objects.filter(
-            assignment__content__course=course,
-            submitted_at__gte=timezone.now() - timedelta(days=7)
-        ).count()
+        taken = CourseEnrollment.objects.filter(
+            Q(is_active=True) | Q(completion_date__isnull=False), student=student
+        ).values('course_id')
+        candidates = self.filter_queryset(self.get_queryset()).filter(status='published').exclude(id__in=taken)
+        eligible = eligible_course_ids(candidates.values_list('id', flat=True), student)
+        queryset = candidates.filter(id__in=eligible)
         
-        return {
-            'recent_enrollments': recent_enrollments,
-            'recent_submissions': recent_submissions
-        }
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = CourseListSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = CourseListSerializer(queryset, many=True)
+        return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def statistics(self, request):
-        """Get overall course statistics"""
-        stats = {
-            'total_courses': Course.objects.count(),
-            'active_courses': Course.objects.filter(status='published').count(),
-            'draft_courses': Course.objects.filter(status='draft').count(),
-            'archived_courses': Course.objects.filter(status='archived').count(),
-            'total_enrollments': CourseEnrollment.objects.filter(is_active=True).count(),
-            'total_students': CourseEnrollment.objects.filter(is_active=True).values('student').distinct().count(),
-            'average_completion_rate': Course.objects.aggregate(
-                avg_rate=Avg('enrollments__progress_percentage')
-            )['avg_rate'] or 0,
-            'most_popular_courses': Course.objects.annotate(
-                enrollment_count=Count('enrollments', filter=Q(enrollments__is_active=True))
-            ).order_by('-enrollment_count')[:5],
-            'recent_enrollments': CourseEnrollment.objects.filter(
-                date_enrolled__gte=timezone.now() - timedelta(days=7)
-            ).select_related('student__user', 'course')[:10]
-        }
-        
-        serializer = CourseStatsSerializer(stats)
-        return Response(serializer.data)
+        """
+        Get overall course statistics from the periodically refreshed
+        snapshot (see courses/snapshots.py); admins can pass ?fresh=1.
+        """
+        return snapshot_response(request, 'courses')
 
 
 class CourseEnrollmentViewSet(viewsets.ModelViewSet):
@@ -437,6 +434,22 @@ class CourseEnrollmentViewSet(viewsets.ModelViewSet):
             return CourseEnrollmentCreateSerializer
         return CourseEnrollmentSerializer
     
+    # Enrollments edited here bypass courses.enrollment, so resync the seat counter
+    def perform_create(self, serializer):
+        enrollment = serializer.save()
+        recount_active_seats([enrollment.course_id])
+    
+    def perform_update(self, serializer):
+        enrollment = serializer.save()
+        recount_active_seats([enrollment.course_id])
+        promote_from_waitlist(enrollment.course_id)
+    
+    def perform_destroy(self, instance):
+        course_id = instance.course_id
+        instance.delete()
+        recount_active_seats([course_id])
+        promote_from_waitlist(course_id)
+    
     @action(detail=True, methods=['post'])
     def update_progress(self, request, pk=None):
         """Update enrollment progress percentage"""
@@ -489,7 +502,7 @@ class CourseContentViewSet(viewsets.ModelViewSet):
         """
         Role-based permissions for course content management
         """
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'bulk_create', 'move']:
             # Course instructors can manage their content, staff/admins can manage any
             permission_classes = [CanManageCourse]
         else:
@@ -539,26 +552,124 @@ class CourseContentViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
-        """Create multiple course contents at once"""
+        """
+        Create multiple course contents at once, all or nothing.
+        
+        Body: ``{"course": id, "contents": [...], "position": n}``. Every item
+        is validated before anything is written; the items are inserted in
+        the order given starting at ``position`` (default: after the last
+        item), and existing items from there on move down.
+        """
         contents_data = request.data.get('contents', [])
         
-        if not contents_data:
+        if not contents_data or not isinstance(contents_data, list):
             return Response(
                 {'error': 'No content data provided'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        created_contents = []
-        for content_data in contents_data:
-            serializer = CourseContentSerializer(data=content_data)
-            if serializer.is_valid():
-                content = serializer.save()
-                created_contents.append(content)
-            else:
-                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        # Items may also carry their course, as this endpoint used to take them
+        course_ids = {request.data.get('course')} if request.data.get('course') else {
+            item.get('course') for item in contents_data if isinstance(item, dict)
+        }
+        if len(course_ids) != 1 or None in course_ids:
+            return Response(
+                {'error': 'Provide a single course for all contents'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        course = Course.objects.filter(pk=course_ids.pop()).first()
+        if course is None:
+            return Response({'error': 'Course not found'}, status=status.HTTP_404_NOT_FOUND)
+        if not CanManageCourse().has_object_permission(request, self, course):
+            return Response(
+                {'error': 'You can only add content to courses you manage'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        position = request.data.get('position')
+        if position is not None:
+            try:
+                position = int(position)
+                if position < 0:
+                    raise ValueError
+            except (TypeError, ValueError):
+                return Response(
+                    {'error': 'position must be a non-negative integer'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
         
+        serializer = CourseContentBulkItemSerializer(data=contents_data, many=True)
+        if not serializer.is_valid():
+            # One entry per item, empty for the valid ones
+            return Response({'contents': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        created = insert_contents(
+            course, [CourseContent(**item) for item in serializer.validated_data], position=position
+        )
+        created_contents = CourseContent.objects.filter(
+            pk__in=[content.pk for content in created]
+        ).select_related('assignment').order_by('order')
         response_serializer = CourseContentSerializer(created_contents, many=True)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'])
+    def move(self, request, pk=None):
+        """Move a content item to another order, shifting the items in between"""
+        content = self.get_object()
+        
+        try:
+            order = int(request.data.get('order'))
+            if order < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'order must be a non-negative integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        move_content(content, order)
+        contents = CourseContent.objects.filter(course_id=content.course_id).select_related('assignment').order_by('order')
+        serializer = CourseContentSerializer(contents, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        """Mark a content item as completed by the current student and return their progress"""
+        content = self.get_object()
+        
+        try:
+            student = request.user.student
+        except:
+            return Response(
+                {'error': 'Only students can complete course content'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        enrollment = CourseEnrollment.objects.filter(
+            student=student, course_id=content.course_id, is_active=True
+        ).first()
+        if enrollment is None:
+            return Response(
+                {'error': 'Not enrolled in this course'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        complete_content(content, [student.pk])
+        enrollment.refresh_from_db(fields=['progress_percentage', 'completion_date'])
+        return Response({
+            'content': content.id,
+            'progress_percentage': enrollment.progress_percentage,
+            'completion_date': enrollment.completion_date,
+        })
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """
+        Stream the item's file to users who can see the course content,
+        with Range and ETag support
+        """
+        content = self.get_object()
+        return serve_field_file(request, content.file_upload)
 
 
 class AssignmentViewSet(viewsets.ModelViewSet):
@@ -659,25 +770,25 @@ class AssignmentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        graded_submissions = []
-        for grade_info in grading_data:
-            submission_id = grade_info.get('submission_id')
-            grade = grade_info.get('grade')
-            feedback = grade_info.get('feedback', '')
-            
-            try:
-                submission = assignment.submissions.get(id=submission_id)
-                submission.grade = grade
-                submission.feedback = feedback
-                submission.graded_by = request.user.teacher
-                submission.graded_at = timezone.now()
-                submission.save()
-                graded_submissions.append(submission)
-            except AssignmentSubmission.DoesNotExist:
-                continue
-        
-        serializer = AssignmentSubmissionSerializer(graded_submissions, many=True)
-        return Response(serializer.data)
+        if not isinstance(grading_data, list):
+            return Response(
+                {'error': 'grades must be a list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        results = bulk_grade_submissions(
+            assignment, grading_data, grader=getattr(request.user, 'teacher', None)
+        )
+        graded = sum(1 for result in results if result['status'] == 'graded')
+        
+        return Response(
+            {
+                'results': results,
+                'total_graded': graded,
+                'total_errors': len(results) - graded
+            },
+            status=status.HTTP_200_OK if graded else status.HTTP_400_BAD_REQUEST
+        )
 
 
 class AssignmentSubmissionViewSet(viewsets.ModelViewSet):
@@ -783,6 +894,12 @@ class AssignmentSubmissionViewSet(viewsets.ModelViewSet):
             return Response(response_serializer.data)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Stream the submitted file to the student and their course's teachers"""
+        submission = self.get_object()
+        return serve_field_file(request, submission.submitted_file, as_attachment=True)
 
 
 class CourseAnnouncementViewSet(viewsets.ModelViewSet):
@@ -867,3 +984,77 @@ class CourseAnnouncementViewSet(viewsets.ModelViewSet):
         
         serializer = CourseAnnouncementSerializer(announcement)
         return Response(serializer.data)
+
+
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Chunked, resumable uploads (see courses/uploads.py)
+    - POST /uploads/ with filename, size and optional chunk_size opens a session
+    - PUT /uploads/{id}/parts/{index}/ with the raw bytes of one part
+    - GET /uploads/{id}/ lists the parts still missing, to resume
+    - POST /uploads/{id}/complete/ assembles the file, optionally attaching
+      it to a course content item (content) or a submission (submission)
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        # Sessions are private to whoever opened them
+        return UploadSession.objects.filter(owner=self.request.user).select_related('stored_file')
+    
+    def create(self, request, *args, **kwargs):
+        try:
+            size = int(request.data.get('size'))
+            chunk_size = int(request.data['chunk_size']) if request.data.get('chunk_size') else None
+            session = start_upload(request.user, request.data.get('filename'), size, chunk_size)
+        except (TypeError, ValueError) as exc:
+            message = str(exc) if isinstance(exc, UploadError) else 'size and chunk_size must be integers'
+            return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = self.get_serializer(session)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['put'], url_path=r'parts/(?P<index>\d+)')
+    def part(self, request, pk=None, index=None):
+        """Upload (or re-upload) one part; the body is the part's raw bytes"""
+        session = self.get_object()
+        try:
+            part = save_part(session, int(index), request.stream or io.BytesIO())
+        except UploadError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'index': part.index, 'size': part.size})
+    
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        """Assemble the uploaded parts and optionally attach the file"""
+        session = self.get_object()
+        
+        target = None
+        if request.data.get('content'):
+            target = CourseContent.objects.select_related('course__instructor').filter(
+                pk=request.data['content']
+            ).first()
+            field_name, permission = 'file_upload', CanManageCourse()
+        elif request.data.get('submission'):
+            target = AssignmentSubmission.objects.select_related(
+                'student', 'assignment__content__course__instructor'
+            ).filter(pk=request.data['submission']).first()
+            field_name, permission = 'submitted_file', CanManageOwnSubmission()
+        if target is None and (request.data.get('content') or request.data.get('submission')):
+            return Response({'error': 'Attachment target not found'}, status=status.HTTP_404_NOT_FOUND)
+        if target is not None and not permission.has_object_permission(request, self, target):
+            return Response(
+                {'error': 'You do not have permission to attach files to this item'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        try:
+            stored = complete_upload(session)
+        except UploadError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if target is not None:
+            attach_stored_file(target, field_name, stored)
+        
+        session.refresh_from_db()
+        return Response(self.get_serializer(session).data)
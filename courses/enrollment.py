@@ -0,0 +1,149 @@
+"""
+Concurrency-safe enrollment.
+
+``Course.active_seat_count`` is the source of truth for capacity. A seat
+is claimed with one conditional UPDATE::
+
+    UPDATE course SET active_seat_count = active_seat_count + 1
+    WHERE id = %s AND active_seat_count < max_students
+
+which the database serializes on the course row, so however many
+requests race for the last seat exactly one of them sees a row updated.
+``enroll_student`` locks the course row before checking for an existing
+enrollment, so the same student enrolling twice at once can't claim two
+seats. The enrollment row is written in the same transaction, so a
+failure after the claim gives the seat back. Students who find the course full
+join its waitlist and are promoted in order as seats free up.
+
+Code that changes enrollments without going through this module should
+call ``recount_active_seats`` afterwards.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .analytics import invalidate_course_analytics
+from .models import Course, CourseEnrollment, CourseWaitlistEntry
+
+ENROLLED = 'enrolled'
+WAITLISTED = 'waitlisted'
+ALREADY_ENROLLED = 'already_enrolled'
+
+
+def claim_seat(course_id):
+    """Take one seat if any is left; True on success"""
+    return bool(
+        Course.objects.filter(pk=course_id, active_seat_count__lt=F('max_students')).update(
+            active_seat_count=F('active_seat_count') + 1
+        )
+    )
+
+
+def release_seat(course_id):
+    Course.objects.filter(pk=course_id, active_seat_count__gt=0).update(
+        active_seat_count=F('active_seat_count') - 1
+    )
+
+
+def activate_enrollment(course_id, student_id):
+    """
+    Create or reactivate the enrollment row for a seat that's already been
+    claimed. If the row is active already the seat is given back.
+    """
+    enrollment = CourseEnrollment.objects.select_for_update().filter(
+        course_id=course_id, student_id=student_id
+    ).first()
+    if enrollment is None:
+        return CourseEnrollment.objects.create(course_id=course_id, student_id=student_id)
+    if enrollment.is_active:
+        release_seat(course_id)
+        return enrollment
+    enrollment.is_active = True
+    enrollment.date_enrolled = timezone.now()
+    enrollment.save(update_fields=['is_active', 'date_enrolled'])
+    return enrollment
+
+
+def waitlist_position(course_id, entry):
+    return CourseWaitlistEntry.objects.filter(
+        course_id=course_id, created_at__lte=entry.created_at
+    ).exclude(created_at=entry.created_at, id__gt=entry.id).count()
+
+
+def enroll_student(course, student):
+    """
+    Enroll ``student`` in ``course``, or put them on its waitlist if it's full.
+
+    Returns ``(status, obj)``: ``(ENROLLED, enrollment)``,
+    ``(WAITLISTED, waitlist_entry)`` or ``(ALREADY_ENROLLED, None)``.
+    """
+    with transaction.atomic():
+        # Serializes enrollments into this course, so a concurrent duplicate
+        # request sees the row this one writes
+        Course.objects.select_for_update().filter(pk=course.pk).values_list('pk', flat=True).first()
+        if CourseEnrollment.objects.filter(course=course, student=student, is_active=True).exists():
+            return ALREADY_ENROLLED, None
+
+        if not claim_seat(course.pk):
+            entry, _ = CourseWaitlistEntry.objects.get_or_create(course=course, student=student)
+            return WAITLISTED, entry
+
+        enrollment = activate_enrollment(course.pk, student.pk)
+        CourseWaitlistEntry.objects.filter(course=course, student=student).delete()
+
+    return ENROLLED, enrollment
+
+
+def unenroll_student(course, student):
+    """
+    Drop an active enrollment (or a waitlist entry) and hand any freed seat
+    to the waitlist. Returns False if the student was neither enrolled nor
+    waiting.
+    """
+    with transaction.atomic():
+        dropped = CourseEnrollment.objects.filter(course=course, student=student, is_active=True).update(
+            is_active=False
+        )
+        if dropped:
+            release_seat(course.pk)
+            promote_from_waitlist(course.pk)
+        else:
+            dropped, _ = CourseWaitlistEntry.objects.filter(course=course, student=student).delete()
+
+    if dropped:
+        invalidate_course_analytics(course.pk)
+    return bool(dropped)
+
+
+def promote_from_waitlist(course_id):
+    """Enroll waiting students, oldest first, into any free seats; returns the new enrollments"""
+    promoted = []
+    with transaction.atomic():
+        course = Course.objects.select_for_update().filter(pk=course_id).values(
+            'max_students', 'active_seat_count'
+        ).first()
+        if course is None:
+            return promoted
+        free_seats = course['max_students'] - course['active_seat_count']
+        if free_seats <= 0:
+            return promoted
+
+        waiting = list(CourseWaitlistEntry.objects.filter(course_id=course_id)[:free_seats])
+        for entry in waiting:
+            if not claim_seat(course_id):
+                break
+            promoted.append(activate_enrollment(course_id, entry.student_id))
+            entry.delete()
+
+    return promoted
+
+
+def recount_active_seats(course_ids=None):
+    """Rebuild ``active_seat_count`` from the enrollment rows in one UPDATE"""
+    active = CourseEnrollment.objects.filter(course=OuterRef('pk'), is_active=True).order_by().values('course')
+    courses = Course.objects.all() if course_ids is None else Course.objects.filter(pk__in=course_ids)
+    return courses.update(active_seat_count=Coalesce(
+        Subquery(active.annotate(count=Count('id')).values('count')), 0
+    ))
@@ -0,0 +1,130 @@
+"""
+Bulk grading for assignment submissions.
+
+All target submissions are fetched with one ``id__in`` query, every item
+is validated before anything is written, and the valid grades are saved
+with a single ``bulk_update`` inside one transaction.
+
+Late submissions lose ``Assignment.late_penalty_per_day`` points for each
+started day past the due date, never going below zero.
+"""
+
+import math
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import invalidate_course_analytics
+from .models import AssignmentSubmission
+from .progress import complete_content
+
+GRADED_FIELDS = ['grade', 'feedback', 'graded_by', 'graded_at']
+
+
+def days_late(assignment, submission):
+    """Started days between the due date and the submission, 0 if on time"""
+    if submission.submitted_at is None or submission.submitted_at <= assignment.due_date:
+        return 0
+    late_seconds = (submission.submitted_at - assignment.due_date).total_seconds()
+    return math.ceil(late_seconds / 86400)
+
+
+def late_penalty(assignment, submission):
+    # The field default is a float until the row is reloaded
+    return Decimal(str(assignment.late_penalty_per_day)) * days_late(assignment, submission)
+
+
+def parse_grade(value):
+    try:
+        grade = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Invalid grade '{value}'")
+    if not grade.is_finite():
+        raise ValueError(f"Invalid grade '{value}'")
+    return grade
+
+
+def bulk_grade_submissions(assignment, items, grader=None):
+    """
+    Grade ``items`` (dicts with ``submission_id``, ``grade`` and optional
+    ``feedback``) for ``assignment``.
+
+    Returns one result per item, in order: ``{'submission_id', 'status':
+    'graded', 'raw_grade', 'days_late', 'late_penalty', 'grade'}`` or
+    ``{'submission_id', 'status': 'error', 'error'}``. Items that fail
+    validation don't stop the others from being saved.
+    """
+    items = [item if isinstance(item, dict) else {'submission_id': item} for item in items]
+    requested_ids = set()
+    for item in items:
+        try:
+            requested_ids.add(int(item.get('submission_id')))
+        except (TypeError, ValueError):
+            pass
+
+    submissions = {
+        submission.id: submission
+        for submission in AssignmentSubmission.objects.filter(assignment=assignment, id__in=requested_ids)
+    }
+
+    now = timezone.now()
+    results = []
+    to_update = []
+    seen = set()
+
+    for item in items:
+        submission_id = item.get('submission_id')
+        result = {'submission_id': submission_id}
+        results.append(result)
+
+        try:
+            submission_id = int(submission_id)
+        except (TypeError, ValueError):
+            result.update(status='error', error='submission_id must be an integer')
+            continue
+
+        submission = submissions.get(submission_id)
+        if submission is None:
+            result.update(status='error', error='Submission not found for this assignment')
+            continue
+        if submission_id in seen:
+            result.update(status='error', error='Submission appears more than once')
+            continue
+
+        try:
+            raw_grade = parse_grade(item.get('grade'))
+        except ValueError as exc:
+            result.update(status='error', error=str(exc))
+            continue
+        if raw_grade < 0:
+            result.update(status='error', error='Grade cannot be negative.')
+            continue
+        if raw_grade > assignment.total_points:
+            result.update(status='error', error=f'Grade cannot exceed total points ({assignment.total_points}).')
+            continue
+
+        seen.add(submission_id)
+        penalty = late_penalty(assignment, submission)
+        submission.grade = max(raw_grade - penalty, Decimal('0'))
+        submission.feedback = item.get('feedback', '') or ''
+        submission.graded_by = grader
+        submission.graded_at = now
+        to_update.append(submission)
+
+        result.update(
+            status='graded',
+            raw_grade=raw_grade,
+            days_late=days_late(assignment, submission),
+            late_penalty=penalty,
+            grade=submission.grade,
+        )
+
+    if to_update:
+        with transaction.atomic():
+            AssignmentSubmission.objects.bulk_update(to_update, GRADED_FIELDS)
+            complete_content(assignment.content, [submission.student_id for submission in to_update])
+        # bulk_update skips the signals that normally drop cached analytics
+        invalidate_course_analytics(assignment.content.course_id)
+
+    return results
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from courses.models import Course
+from courses.progress import update_progress
+
+
+class Command(BaseCommand):
+    help = 'Recalculate enrollment progress from content completions (all courses, or the ids given)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='*', type=int, help='Course ids; defaults to every course')
+
+    def handle(self, *args, **options):
+        courses = Course.objects.order_by('pk')
+        if options['course_ids']:
+            courses = courses.filter(pk__in=options['course_ids'])
+
+        total = 0
+        for course_id in courses.values_list('pk', flat=True).iterator():
+            total += update_progress(course_id)
+
+        self.stdout.write(self.style.SUCCESS(f'Recalculated progress for {total} enrollments'))
@@ -0,0 +1,151 @@
+"""
+Serving stored course files after a permission check.
+
+``serve_field_file`` answers conditional GETs (ETag / If-None-Match) with
+304 and single byte ranges (Range, honouring If-Range) with 206, so a
+student scrubbing through a lecture video only fetches the parts they
+watch. The bytes are streamed with FileResponse, or handed to the web
+server with X-Accel-Redirect / X-Sendfile when ``settings.MEDIA_SENDFILE``
+is set. The caller does the permission check; these views are reached
+only through querysets already scoped to the user.
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, quote_etag
+
+from .models import StoredFile
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CACHE_CONTROL = 'private, max-age=3600'
+
+
+def file_etag(field_file):
+    """Content hash for deduplicated uploads, otherwise size and modification time"""
+    sha256 = StoredFile.objects.filter(file=field_file.name).values_list('sha256', flat=True).first()
+    if sha256:
+        return quote_etag(sha256)
+    storage = field_file.storage
+    modified = storage.get_modified_time(field_file.name)
+    return quote_etag(f'{storage.size(field_file.name):x}-{int(modified.timestamp()):x}')
+
+
+def etag_matches(header, etag):
+    return header is not None and ('*' in parse_etags(header) or etag in parse_etags(header))
+
+
+def parse_range(header, size):
+    """
+    ``(start, end)`` inclusive for a single satisfiable range, None to send
+    the whole file (no header, several ranges or syntax we don't handle),
+    or ``False`` when the range can't be satisfied.
+    """
+    match = RANGE_RE.match((header or '').strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+class RangeReader:
+    """Reads ``length`` bytes of ``file`` from ``start`` on"""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def sendfile_response(field_file):
+    response = HttpResponse()
+    if settings.MEDIA_SENDFILE == 'nginx':
+        response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + field_file.name)
+    else:
+        response['X-Sendfile'] = field_file.path
+    # Let the web server fill in the real type and handle Range itself
+    del response['Content-Type']
+    return response
+
+
+def serve_field_file(request, field_file, as_attachment=False):
+    """Response for ``field_file`` (a FieldFile) honouring the request's conditional and Range headers"""
+    if not field_file:
+        raise Http404('No file')
+    storage = field_file.storage
+    if not storage.exists(field_file.name):
+        raise Http404('File not found')
+
+    etag = file_etag(field_file)
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        response['Cache-Control'] = CACHE_CONTROL
+        return response
+
+    filename = os.path.basename(field_file.name)
+    if settings.MEDIA_SENDFILE in ('nginx', 'apache'):
+        response = sendfile_response(field_file)
+    else:
+        size = storage.size(field_file.name)
+        byte_range = None
+        if_range = request.headers.get('If-Range')
+        if if_range is None or if_range.strip() == etag:
+            byte_range = parse_range(request.headers.get('Range'), size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        if byte_range is None:
+            response = FileResponse(
+                storage.open(field_file.name, 'rb'), as_attachment=as_attachment,
+                filename=filename, content_type=content_type,
+            )
+            response['Content-Length'] = str(size)
+        else:
+            start, end = byte_range
+            response = FileResponse(
+                RangeReader(storage.open(field_file.name, 'rb'), start, end - start + 1),
+                status=206, as_attachment=as_attachment, filename=filename, content_type=content_type,
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Cache-Control'] = CACHE_CONTROL
+    try:
+        response['Last-Modified'] = http_date(storage.get_modified_time(field_file.name).timestamp())
+    except NotImplementedError:
+        pass
+    return response
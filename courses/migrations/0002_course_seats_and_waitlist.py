@@ -0,0 +1,46 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_active_seats(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    CourseEnrollment = apps.get_model('courses', 'CourseEnrollment')
+    active = CourseEnrollment.objects.filter(course=models.OuterRef('pk'), is_active=True).order_by().values('course')
+    Course.objects.update(active_seat_count=Coalesce(
+        models.Subquery(active.annotate(count=models.Count('id')).values('count')), 0
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0001_initial'),
+        ('students', '0002_student_class_group'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='active_seat_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='CourseWaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='courses.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='students.student')),
+            ],
+            options={
+                'verbose_name_plural': 'course waitlist entries',
+                'ordering': ['created_at', 'id'],
+                'unique_together': {('student', 'course')},
+            },
+        ),
+        migrations.RunPython(count_active_seats, migrations.RunPython.noop),
+    ]
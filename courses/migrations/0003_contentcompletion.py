@@ -0,0 +1,29 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:24
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_course_seats_and_waitlist'),
+        ('students', '0002_student_class_group'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentCompletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('content', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='completions', to='courses.coursecontent')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='content_completions', to='students.student')),
+            ],
+            options={
+                'ordering': ['-completed_at'],
+                'unique_together': {('student', 'content')},
+            },
+        ),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -7,6 +9,23 @@ from teachers.models import Teacher, Subject
 User = get_user_model()
 
 
+class CourseQuerySet(models.QuerySet):
+    def with_enrollment_stats(self):
+        """
+        Annotate active and completed enrollment counts so the
+        enrollment_count, is_full and completion_rate properties don't
+        query per course.
+        """
+        return self.annotate(
+            active_enrollment_count=models.Count(
+                'enrollments', filter=models.Q(enrollments__is_active=True)
+            ),
+            completed_enrollment_count=models.Count(
+                'enrollments', filter=models.Q(enrollments__is_active=True, enrollments__completion_date__isnull=False)
+            ),
+        )
+
+
 class Course(models.Model):
     """Represents a course offering"""
     DIFFICULTY_CHOICES = [
@@ -30,6 +49,9 @@ class Course(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
     max_students = models.PositiveIntegerField(default=30)
+    # Denormalized count of active enrollments, claimed and released atomically
+    # by courses.enrollment so concurrent enrollments can't exceed max_students
+    active_seat_count = models.PositiveIntegerField(default=0, editable=False)
     credits = models.PositiveIntegerField(default=3)
     prerequisites = models.ManyToManyField('self', blank=True, symmetrical=False, related_name='prerequisite_for')
     thumbnail = models.ImageField(upload_to='course_thumbnails/', blank=True, null=True)
@@ -39,6 +61,8 @@ class Course(models.Model):
     # Many-to-many relationship with students through enrollment
     students = models.ManyToManyField(Student, through='CourseEnrollment', related_name='enrolled_courses')
     
+    objects = CourseQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         unique_together = ['title', 'subject', 'instructor']
@@ -46,8 +70,13 @@ class Course(models.Model):
     def __str__(self):
         return f"{self.title} ({self.subject.code})"
     
+    # The properties below use the counts annotated by
+    # Course.objects.with_enrollment_stats() when present, and query otherwise.
+    
     @property
     def enrollment_count(self):
+        if 'active_enrollment_count' in self.__dict__:
+            return self.active_enrollment_count
         return self.enrollments.filter(is_active=True).count()
     
     @property
@@ -56,10 +85,17 @@ class Course(models.Model):
     
     @property
     def completion_rate(self):
-        total_enrolled = self.enrollment_count
+        if 'completed_enrollment_count' in self.__dict__:
+            total_enrolled = self.active_enrollment_count
+            completed = self.completed_enrollment_count
+        else:
+            counts = self.enrollments.filter(is_active=True).aggregate(
+                total=models.Count('id'),
+                completed=models.Count('id', filter=models.Q(completion_date__isnull=False))
+            )
+            total_enrolled, completed = counts['total'], counts['completed']
         if total_enrolled == 0:
             return 0
-        completed = self.enrollments.filter(is_active=True, completion_date__isnull=False).count()
         return round((completed / total_enrolled) * 100, 2)
 
 
@@ -85,6 +121,21 @@ class CourseEnrollment(models.Model):
         return self.completion_date is not None
 
 
+class CourseWaitlistEntry(models.Model):
+    """A student waiting for a seat in a full course, served first come first served"""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='waitlist')
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        unique_together = ['student', 'course']
+        ordering = ['created_at', 'id']
+        verbose_name_plural = 'course waitlist entries'
+    
+    def __str__(self):
+        return f"{self.student} waiting for {self.course}"
+
+
 class CourseContent(models.Model):
     """Represents content items within a course"""
     CONTENT_TYPES = [
@@ -116,6 +167,20 @@ class CourseContent(models.Model):
         return f"{self.course.title} - {self.title}"
 
 
+class ContentCompletion(models.Model):
+    """A student having finished a content item; drives CourseEnrollment.progress_percentage"""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='content_completions')
+    content = models.ForeignKey(CourseContent, on_delete=models.CASCADE, related_name='completions')
+    completed_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        unique_together = ['student', 'content']
+        ordering = ['-completed_at']
+    
+    def __str__(self):
+        return f"{self.student} completed {self.content}"
+
+
 class Assignment(models.Model):
     """Represents assignments within course content"""
     SUBMISSION_TYPES = [
@@ -184,3 +249,63 @@ class CourseAnnouncement(models.Model):
     
     def __str__(self):
         return f"{self.course.title} - {self.title}"
+
+
+class StoredFile(models.Model):
+    """An uploaded file's bytes, stored once per distinct content"""
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to='uploads/', max_length=255)
+    size = models.BigIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.file.name} ({self.sha256[:12]})"
+
+
+class UploadSession(models.Model):
+    """A chunked upload in progress; parts may arrive in any order and be retried"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('complete', 'Complete'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    stored_file = models.ForeignKey(StoredFile, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+    
+    @property
+    def part_count(self):
+        return max(-(-self.size // self.chunk_size), 1)
+    
+    def expected_part_size(self, index):
+        if index < self.part_count - 1:
+            return self.chunk_size
+        return self.size - self.chunk_size * (self.part_count - 1)
+
+
+class UploadPart(models.Model):
+    """One received chunk of an UploadSession, kept in storage until assembly"""
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='parts')
+    index = models.PositiveIntegerField()
+    name = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()
+    received_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        unique_together = ['session', 'index']
+        ordering = ['session', 'index']
+    
+    def __str__(self):
+        return f"{self.session_id} part {self.index}"
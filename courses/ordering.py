@@ -0,0 +1,87 @@
+"""
+Ordering of a course's content items.
+
+``CourseContent`` has ``unique_together = ['course', 'order']``, and both
+PostgreSQL and SQLite check that constraint row by row during an UPDATE,
+so ``SET order = order + 1`` can collide with the next row half way
+through. Renumbering therefore writes the new numbers shifted past
+``RENUMBER_OFFSET`` (a range no real item uses) in one UPDATE and then
+shifts them back in a second one: two statements however many items
+move. The course row is locked first so concurrent edits to the same
+course's ordering queue up instead of interleaving.
+"""
+
+from django.db import transaction
+from django.db.models import Case, F, Max, Q, Value, When
+
+from .analytics import invalidate_course_analytics
+from .models import Course, CourseContent
+from .progress import update_progress
+
+RENUMBER_OFFSET = 1_000_000_000
+
+
+def lock_course(course_id):
+    Course.objects.select_for_update().filter(pk=course_id).values_list('pk', flat=True).first()
+
+
+def next_order(course_id):
+    last = CourseContent.objects.filter(course_id=course_id).aggregate(last=Max('order'))['last']
+    return 1 if last is None else last + 1
+
+
+def renumber(course_id, rows, new_order):
+    """Give the ``rows`` of ``course_id`` (a Q) the order ``new_order`` (an expression)"""
+    CourseContent.objects.filter(rows, course_id=course_id).update(order=new_order + RENUMBER_OFFSET)
+    CourseContent.objects.filter(course_id=course_id, order__gte=RENUMBER_OFFSET).update(
+        order=F('order') - RENUMBER_OFFSET
+    )
+
+
+def insert_contents(course, contents, position=None):
+    """
+    Insert unsaved CourseContent ``contents``, in sequence, starting at
+    order ``position`` (default: after the last item). Existing items from
+    ``position`` on move down to make room. Returns the saved items.
+    """
+    with transaction.atomic():
+        lock_course(course.pk)
+        end = next_order(course.pk)
+        position = end if position is None else min(position, end)
+
+        if position < end:
+            renumber(course.pk, Q(order__gte=position), F('order') + len(contents))
+
+        for offset, content in enumerate(contents):
+            content.course = course
+            content.order = position + offset
+        created = CourseContent.objects.bulk_create(contents)
+        update_progress(course.pk)
+
+    # bulk_create skips the post_save signals that drop cached analytics
+    invalidate_course_analytics(course.pk)
+    return created
+
+
+def move_content(content, order):
+    """Move ``content`` to ``order``, shifting the items in between by one"""
+    with transaction.atomic():
+        lock_course(content.course_id)
+        current = CourseContent.objects.filter(pk=content.pk).values_list('order', flat=True).get()
+        order = min(order, next_order(content.course_id) - 1)
+
+        if order < current:
+            rows, shift = Q(order__gte=order, order__lt=current), F('order') + 1
+        elif order > current:
+            rows, shift = Q(order__gt=current, order__lte=order), F('order') - 1
+        else:
+            return content
+
+        renumber(
+            content.course_id,
+            rows | Q(pk=content.pk),
+            Case(When(pk=content.pk, then=Value(order)), default=shift),
+        )
+
+    content.order = order
+    return content
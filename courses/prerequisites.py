@@ -0,0 +1,141 @@
+"""
+Course prerequisite graph.
+
+``Course.prerequisites`` edges form a DAG. The whole graph is read with one
+query and its transitive closure - for each course, every course that
+must be completed before it, prerequisites first - is cached. Eligibility
+is then a set difference between a course's closure and the student's
+completed enrollments, with no graph walk per request.
+
+The cache key includes a version read from the edge table itself: its row
+count and highest id. Adding an edge raises the highest id (ids are never
+reused) and removing one lowers the count, so every process sees a change
+on its next lookup, whichever cache backend it has and however the edges
+were written.
+
+Edges that would close a cycle are rejected when they are added (see
+``check_new_prerequisites``).
+"""
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+
+from .models import Course, CourseEnrollment
+
+CLOSURE_CACHE_KEY = 'courses:prerequisite_closure:{count}:{last_id}'
+CLOSURE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class PrerequisiteCycleError(ValidationError):
+    pass
+
+
+def build_prerequisite_graph():
+    """``{course_id: {direct prerequisite ids}}`` from a single query on the M2M table"""
+    graph = {}
+    edges = Course.prerequisites.through.objects.values_list('from_course_id', 'to_course_id')
+    for course_id, prerequisite_id in edges:
+        graph.setdefault(course_id, set()).add(prerequisite_id)
+    return graph
+
+
+def transitive_closure(graph):
+    """
+    ``{course_id: [all prerequisite ids]}`` ordered so each course comes
+    after its own prerequisites. Courses without prerequisites are left out.
+    """
+    closure = {}
+
+    def visit(course_id, visiting):
+        if course_id in closure:
+            return closure[course_id]
+        visiting.add(course_id)
+        ordered, seen = [], set()
+        for prerequisite_id in sorted(graph.get(course_id, ())):
+            # Only reachable through a cycle already in the data; don't loop on it
+            if prerequisite_id in visiting:
+                continue
+            for required_id in visit(prerequisite_id, visiting) + [prerequisite_id]:
+                if required_id not in seen:
+                    seen.add(required_id)
+                    ordered.append(required_id)
+        visiting.discard(course_id)
+        closure[course_id] = ordered
+        return ordered
+
+    for course_id in graph:
+        visit(course_id, set())
+    return {course_id: required for course_id, required in closure.items() if required}
+
+
+def closure_cache_key():
+    """Cache key for the closure of the edges currently in the database"""
+    version = Course.prerequisites.through.objects.aggregate(count=Count('id'), last_id=Max('id'))
+    return CLOSURE_CACHE_KEY.format(**version)
+
+
+def get_prerequisite_closure():
+    """Cached transitive closure, rebuilt when the edges have changed"""
+    key = closure_cache_key()
+    closure = cache.get(key)
+    if closure is None:
+        closure = transitive_closure(build_prerequisite_graph())
+        cache.set(key, closure, CLOSURE_CACHE_TIMEOUT)
+    return closure
+
+
+def required_courses(course_id):
+    """Every course that must be completed before ``course_id``, prerequisites first"""
+    return get_prerequisite_closure().get(course_id, [])
+
+
+def check_new_prerequisites(edges, replacing=None):
+    """
+    Raise PrerequisiteCycleError if adding the ``(course_id,
+    prerequisite_id)`` pairs in ``edges`` would make a course (indirectly)
+    its own prerequisite. ``replacing`` names a course whose current
+    prerequisites are being swapped out for ``edges``. Reads the current
+    edges rather than the cache so the check can't race a stale closure.
+    """
+    edges = list(edges)
+    if not edges:
+        return
+    graph = build_prerequisite_graph()
+    graph.pop(replacing, None)
+    closure = transitive_closure(graph)
+    for course_id, prerequisite_id in edges:
+        if course_id == prerequisite_id or course_id in closure.get(prerequisite_id, ()):
+            raise PrerequisiteCycleError(
+                f'Course {prerequisite_id} cannot be a prerequisite of course {course_id}: '
+                'it would create a prerequisite cycle.',
+                code='prerequisite_cycle',
+            )
+
+
+def completed_course_ids(student):
+    return set(
+        CourseEnrollment.objects.filter(student=student, completion_date__isnull=False).values_list(
+            'course_id', flat=True
+        )
+    )
+
+
+def missing_prerequisites(course, student, completed=None):
+    """Ids of the courses ``student`` still has to complete before ``course``, in the order to take them"""
+    required = required_courses(course.pk)
+    if not required:
+        return []
+    if completed is None:
+        completed = completed_course_ids(student)
+    return [course_id for course_id in required if course_id not in completed]
+
+
+def eligible_course_ids(course_ids, student):
+    """The subset of ``course_ids`` whose prerequisites ``student`` has all completed"""
+    closure = get_prerequisite_closure()
+    completed = completed_course_ids(student)
+    return [
+        course_id for course_id in course_ids
+        if completed.issuperset(closure.get(course_id, ()))
+    ]
@@ -0,0 +1,122 @@
+"""
+Course progress derived from content completion.
+
+Each content item weighs its ``estimated_duration`` in minutes
+(``DEFAULT_CONTENT_MINUTES`` when unset), times ``REQUIRED_WEIGHT`` or
+``OPTIONAL_WEIGHT``; with the defaults optional items don't count.
+``CourseEnrollment.progress_percentage`` is the share of that weight a
+student has completed (see ``ContentCompletion``), and an assignment item
+counts as completed once its submission is graded.
+
+Progress is stored, never computed on read. Whenever completions change,
+the affected enrollments are recalculated with one UPDATE whose subquery
+sums the completed weights, so it stays exact instead of accumulating
+rounding from increments; whole courses are redone the same way by
+``manage.py recompute_course_progress``.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
+
+from .analytics import invalidate_course_analytics
+from .models import ContentCompletion, CourseContent, CourseEnrollment
+
+DEFAULT_CONTENT_MINUTES = 30
+REQUIRED_WEIGHT = 1
+OPTIONAL_WEIGHT = 0
+
+
+def content_weight(estimated_duration, is_required):
+    minutes = (
+        int(estimated_duration.total_seconds() // 60) if estimated_duration is not None
+        else DEFAULT_CONTENT_MINUTES
+    )
+    return minutes * (REQUIRED_WEIGHT if is_required else OPTIONAL_WEIGHT)
+
+
+def course_weights(course_id):
+    """``{content_id: weight}`` for the items of ``course_id`` that count towards progress"""
+    weights = {}
+    rows = CourseContent.objects.filter(course_id=course_id).values_list('id', 'estimated_duration', 'is_required')
+    for content_id, estimated_duration, is_required in rows:
+        weight = content_weight(estimated_duration, is_required)
+        if weight:
+            weights[content_id] = weight
+    return weights
+
+
+def progress_expression(weights):
+    """Per-enrollment progress, as a percentage of ``weights`` completed by its student"""
+    total = sum(weights.values())
+    if not total:
+        return Value(Decimal('0'), output_field=DecimalField(max_digits=5, decimal_places=2))
+
+    completed = ContentCompletion.objects.filter(
+        student_id=OuterRef('student_id'), content_id__in=weights
+    ).order_by().values('student_id').annotate(
+        weight=Sum(Case(
+            *[When(content_id=content_id, then=Value(weight)) for content_id, weight in weights.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+    ).values('weight')
+
+    percentage = Coalesce(Subquery(completed, output_field=IntegerField()), Value(0)) * Value(100.0) / Value(total)
+    return Cast(Round(percentage, 2), DecimalField(max_digits=5, decimal_places=2))
+
+
+def update_progress(course_id, student_ids=None):
+    """
+    Recalculate ``progress_percentage`` for the active enrollments in
+    ``course_id`` (only ``student_ids``' if given) with a single UPDATE.
+    Enrollments reaching 100% get a ``completion_date``, and the course's
+    cached analytics are dropped when any do.
+    """
+    enrollments = CourseEnrollment.objects.filter(course_id=course_id, is_active=True)
+    if student_ids is not None:
+        enrollments = enrollments.filter(student_id__in=student_ids)
+
+    now = timezone.now()
+    progress = progress_expression(course_weights(course_id))
+    updated = enrollments.update(
+        progress_percentage=progress,
+        completion_date=Case(
+            When(completion_date__isnull=True, then=Case(
+                When(GreaterThanOrEqual(progress, 100), then=Value(now)),
+                default=Value(None),
+            )),
+            default=F('completion_date'),
+        ),
+    )
+    # QuerySet.update() sends no post_save for the analytics receiver to see
+    if updated and enrollments.filter(completion_date=now).exists():
+        invalidate_course_analytics(course_id)
+    return updated
+
+
+def complete_content(content, student_ids):
+    """
+    Record that ``student_ids`` completed ``content`` and update the
+    progress of those for whom it's new. Returns how many were new.
+    """
+    student_ids = set(student_ids)
+    with transaction.atomic():
+        already = set(
+            ContentCompletion.objects.filter(content=content, student_id__in=student_ids).values_list(
+                'student_id', flat=True
+            )
+        )
+        new_ids = student_ids - already
+        if not new_ids:
+            return 0
+        ContentCompletion.objects.bulk_create(
+            [ContentCompletion(content=content, student_id=student_id) for student_id in new_ids],
+            ignore_conflicts=True,
+        )
+        update_progress(content.course_id, new_ids)
+    return len(new_ids)
@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .analytics import invalidate_course_analytics
+from .models import Assignment, AssignmentSubmission, Course, CourseContent, CourseEnrollment
+from .prerequisites import check_new_prerequisites
+from .progress import complete_content, update_progress
+
+
+@receiver(post_save, sender=CourseEnrollment)
+@receiver(post_delete, sender=CourseEnrollment)
+@receiver(post_save, sender=CourseContent)
+@receiver(post_delete, sender=CourseContent)
+def invalidate_analytics_for_course_row(sender, instance, **kwargs):
+    invalidate_course_analytics(instance.course_id)
+
+
+@receiver(post_save, sender=Assignment)
+@receiver(post_delete, sender=Assignment)
+def invalidate_analytics_for_assignment(sender, instance, **kwargs):
+    course_id = CourseContent.objects.filter(pk=instance.content_id).values_list('course_id', flat=True).first()
+    if course_id is not None:
+        invalidate_course_analytics(course_id)
+
+
+@receiver(post_save, sender=AssignmentSubmission)
+@receiver(post_delete, sender=AssignmentSubmission)
+def invalidate_analytics_for_submission(sender, instance, **kwargs):
+    course_id = Assignment.objects.filter(pk=instance.assignment_id).values_list(
+        'content__course_id', flat=True
+    ).first()
+    if course_id is not None:
+        invalidate_course_analytics(course_id)
+
+
+@receiver(m2m_changed, sender=Course.prerequisites.through)
+def prerequisites_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_add':
+        # course.prerequisites.add(...) or prerequisite.prerequisite_for.add(...)
+        if reverse:
+            check_new_prerequisites((course_id, instance.pk) for course_id in pk_set)
+        else:
+            check_new_prerequisites((instance.pk, prerequisite_id) for prerequisite_id in pk_set)
+
+
+@receiver(post_save, sender=CourseContent)
+@receiver(post_delete, sender=CourseContent)
+def update_progress_for_content(sender, instance, **kwargs):
+    # Adding, removing or reweighting an item changes every enrollment's share
+    course_id = instance.course_id
+    transaction.on_commit(lambda: update_progress(course_id))
+
+
+@receiver(post_save, sender=AssignmentSubmission)
+def complete_graded_assignment(sender, instance, **kwargs):
+    if instance.grade is not None:
+        content = CourseContent.objects.filter(assignment__pk=instance.assignment_id).first()
+        if content is not None:
+            complete_content(content, [instance.student_id])
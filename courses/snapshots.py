@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.db.models import Avg, Count, Q
+from django.utils import timezone
+
+from accounts.snapshots import register_snapshot
+
+from .api.serializers import CourseStatsSerializer
+from .models import Course, CourseEnrollment
+
+
+@register_snapshot('courses', max_age=60 * 10)
+def course_statistics():
+    """Overall course statistics served by CourseViewSet.statistics"""
+    course_counts = Course.objects.aggregate(
+        total_courses=Count('id'),
+        active_courses=Count('id', filter=Q(status='published')),
+        draft_courses=Count('id', filter=Q(status='draft')),
+        archived_courses=Count('id', filter=Q(status='archived')),
+    )
+    enrollment_counts = CourseEnrollment.objects.aggregate(
+        total_enrollments=Count('id', filter=Q(is_active=True)),
+        total_students=Count('student', filter=Q(is_active=True), distinct=True),
+        average_completion_rate=Avg('progress_percentage'),
+    )
+
+    stats = {
+        **course_counts,
+        **enrollment_counts,
+        'average_completion_rate': enrollment_counts['average_completion_rate'] or 0,
+        'most_popular_courses': Course.objects.with_enrollment_stats().select_related(
+            'subject', 'instructor__user'
+        ).order_by('-active_enrollment_count')[:5],
+        'recent_enrollments': CourseEnrollment.objects.filter(
+            date_enrolled__gte=timezone.now() - timedelta(days=7)
+        ).select_related('student__user', 'course__subject', 'course__instructor__user')[:10]
+    }
+
+    return CourseStatsSerializer(stats).data
@@ -1,3 +1,696 @@
-from django.test import TestCase
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from io import StringIO
+from decimal import Decimal
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import StatisticsSnapshot, UserProfile
+
+from students.models import Student
+from teachers.models import Subject, Teacher
+
+from .analytics import get_course_analytics, invalidate_course_analytics
+from .enrollment import (
+    ALREADY_ENROLLED, ENROLLED, WAITLISTED, activate_enrollment, claim_seat, enroll_student, recount_active_seats
+)
+from .prerequisites import PrerequisiteCycleError, required_courses
+from .grading import bulk_grade_submissions
+from .models import (
+    Assignment, AssignmentSubmission, ContentCompletion, Course, CourseContent, CourseEnrollment,
+    StoredFile, UploadPart
+)
+from .progress import complete_content
+
+User = get_user_model()
+
+
+class CourseFixturesMixin:
+    """Shared builders for course tests"""
+
+    def make_teacher(self, name='teacher'):
+        user = User.objects.create_user(username=name, email=f'{name}@example.com')
+        UserProfile.objects.create(user=user, user_type='teacher')
+        return Teacher.objects.create(user=user, teacher_id=name, qualification='BSc')
+
+    def make_student(self, name):
+        user = User.objects.create_user(username=name, email=f'{name}@example.com')
+        UserProfile.objects.create(user=user, user_type='student')
+        return Student.objects.create(
+            user=user, student_id=name, grade='7', address='-', parent_name='-', parent_contact='-'
+        )
+
+    def make_course(self, title, instructor, subject=None, **kwargs):
+        subject = subject or Subject.objects.get_or_create(name='Maths', code='MATH')[0]
+        defaults = {
+            'description': '-', 'start_date': date(2024, 1, 8), 'end_date': date(2024, 6, 28),
+            'status': 'published', 'max_students': 30,
+        }
+        defaults.update(kwargs)
+        return Course.objects.create(title=title, subject=subject, instructor=instructor, **defaults)
+
+
+class CourseQueryCountTests(CourseFixturesMixin, TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.teacher = self.make_teacher()
+        self.students = [self.make_student(f's{i}') for i in range(4)]
+
+    def add_courses(self, count):
+        courses = []
+        for _ in range(count):
+            course = self.make_course(f'Course {Course.objects.count()}', self.teacher, max_students=2)
+            for student in self.students[:3]:
+                CourseEnrollment.objects.create(
+                    student=student, course=course,
+                    completion_date=timezone.now() if student is self.students[0] else None
+                )
+            courses.append(course)
+        return courses
+
+    def test_list_query_count_is_constant(self):
+        self.add_courses(2)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/api/courses/courses/')
+
+        self.add_courses(6)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get('/api/courses/courses/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        row = response.data['results'][0]
+        self.assertEqual(row['enrollment_count'], 3)
+        self.assertTrue(row['is_full'])
+        self.assertEqual(row['completion_rate'], 33.33)
+
+    def test_detail_query_count_independent_of_prerequisites(self):
+        course, *prerequisites = self.add_courses(4)
+        course.prerequisites.add(prerequisites[0])
+        with CaptureQueriesContext(connection) as one:
+            self.client.get(f'/api/courses/courses/{course.id}/')
+
+        course.prerequisites.add(*prerequisites[1:])
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(f'/api/courses/courses/{course.id}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(one.captured_queries), len(many.captured_queries))
+        self.assertEqual(response.data['enrollment_count'], 3)
+        self.assertEqual([p['enrollment_count'] for p in response.data['prerequisites']], [3, 3, 3])
+
+    def test_properties_fall_back_to_queries(self):
+        course = self.add_courses(1)[0]
+        course = Course.objects.get(pk=course.pk)
+
+        self.assertEqual(course.enrollment_count, 3)
+        self.assertEqual(course.completion_rate, 33.33)
+
+
+class CourseAnalyticsTests(CourseFixturesMixin, TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.course = self.make_course('Algebra', self.make_teacher())
+        invalidate_course_analytics(self.course.id)
+        self.students = [self.make_student(f's{i}') for i in range(5)]
+        for student in self.students:
+            CourseEnrollment.objects.create(student=student, course=self.course)
+        content = CourseContent.objects.create(course=self.course, title='HW1', content_type='assignment', order=1)
+        self.assignment = Assignment.objects.create(
+            content=content, due_date=timezone.now() + timedelta(days=7), total_points=Decimal('50'),
+            submission_type='text', instructions='-'
+        )
+        # 20%, 50%, 70%, 100% and one ungraded
+        for student, grade in zip(self.students, [10, 25, 35, 50, None]):
+            AssignmentSubmission.objects.create(assignment=self.assignment, student=student, grade=grade)
+
+    def test_aggregates_histogram_and_percentiles(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = get_course_analytics(self.course)
+
+        self.assertLessEqual(len(ctx.captured_queries), 10)
+        self.assertEqual(data['enrollment_stats']['total_enrolled'], 5)
+        self.assertEqual(data['content_stats']['by_type'], [{'content_type': 'assignment', 'count': 1}])
+        self.assertEqual(data['assignment_stats']['graded_submissions'], 4)
+
+        grades = data['grade_distribution']
+        self.assertEqual((grades['average'], grades['highest'], grades['lowest']), (30.0, 50.0, 10.0))
+        self.assertEqual(grades['average_percentage'], 60.0)
+        histogram = {bucket['range']: bucket['count'] for bucket in grades['histogram']}
+        self.assertEqual((histogram['20-30'], histogram['50-60'], histogram['70-80'], histogram['90-100']), (1, 1, 1, 1))
+        self.assertEqual(grades['percentiles']['p50'], 50.0)
+        self.assertEqual(grades['percentiles']['p90'], 100.0)
+
+    def test_cached_until_submission_changes(self):
+        url = f'/api/courses/courses/{self.course.id}/analytics/'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as cached:
+            self.client.get(url)
+        # Only the course lookup and its prerequisites prefetch
+        self.assertEqual(len(cached.captured_queries), 2)
+
+        submission = AssignmentSubmission.objects.get(grade__isnull=True)
+        submission.grade = Decimal('40')
+        submission.save()
+
+        response = self.client.get(url)
+        self.assertEqual(response.data['assignment_stats']['graded_submissions'], 5)
+
+
+class CourseStatisticsSnapshotTests(CourseFixturesMixin, TestCase):
+    url = '/api/courses/courses/statistics/'
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.teacher = self.make_teacher()
+        self.make_course('Algebra', self.teacher)
+
+    def test_serves_snapshot_with_age_until_fresh(self):
+        call_command('refresh_statistics_snapshots', 'courses', stdout=StringIO())
+        StatisticsSnapshot.objects.update(computed_at=timezone.now() - timedelta(seconds=30))
+        self.make_course('Geometry', self.teacher)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(response.data['total_courses'], 1)
+        self.assertGreaterEqual(response.data['snapshot']['age_seconds'], 30)
+        self.assertEqual(response['Age'], str(response.data['snapshot']['age_seconds']))
+
+        response = self.client.get(self.url, {'fresh': 1})
+        self.assertEqual(response.data['total_courses'], 2)
+        self.assertEqual(response.data['snapshot']['age_seconds'], 0)
+
+    def test_fresh_ignored_for_non_admins_and_old_snapshots_recomputed(self):
+        call_command('refresh_statistics_snapshots', stdout=StringIO())
+        self.make_course('Geometry', self.teacher)
+        self.client.force_authenticate(self.teacher.user)
+
+        self.assertEqual(self.client.get(self.url, {'fresh': 1}).data['total_courses'], 1)
+
+        StatisticsSnapshot.objects.update(computed_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(self.client.get(self.url).data['total_courses'], 2)
+
+
+class AssignmentBulkGradeTests(CourseFixturesMixin, TestCase):
+    def setUp(self):
+        self.teacher = self.make_teacher()
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher.user)
+        course = self.make_course('Algebra', self.teacher)
+        content = CourseContent.objects.create(course=course, title='HW1', content_type='assignment', order=1)
+        self.assignment = Assignment.objects.create(
+            content=content, due_date=timezone.now() - timedelta(days=3), total_points=Decimal('100'),
+            submission_type='text', instructions='-', late_penalty_per_day=Decimal('5')
+        )
+        self.url = f'/api/courses/assignments/{self.assignment.id}/bulk_grade/'
+        self.submissions = [
+            AssignmentSubmission.objects.create(assignment=self.assignment, student=self.make_student(f's{i}'))
+            for i in range(30)
+        ]
+        # Submitted on time, except the first which came in 1.5 days late
+        AssignmentSubmission.objects.update(submitted_at=self.assignment.due_date - timedelta(hours=1))
+        AssignmentSubmission.objects.filter(pk=self.submissions[0].pk).update(
+            submitted_at=self.assignment.due_date + timedelta(hours=36)
+        )
+
+    def test_grades_in_constant_queries_with_late_penalty(self):
+        grades = [{'submission_id': s.id, 'grade': 80, 'feedback': 'ok'} for s in self.submissions]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, {'grades': grades}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_graded'], 30)
+        self.assertLess(len(ctx.captured_queries), 16)
+        late = response.data['results'][0]
+        self.assertEqual((late['days_late'], late['late_penalty'], late['grade']), (2, Decimal('10'), Decimal('70')))
+
+        self.submissions[0].refresh_from_db()
+        self.assertEqual(self.submissions[0].grade, Decimal('70'))
+        self.assertEqual(self.submissions[0].graded_by, self.teacher)
+
+    def test_reports_invalid_items_and_saves_the_rest(self):
+        response = self.client.post(self.url, {'grades': [
+            {'submission_id': self.submissions[1].id, 'grade': 90},
+            {'submission_id': self.submissions[2].id, 'grade': 101},
+            {'submission_id': self.submissions[3].id, 'grade': 'A'},
+            {'submission_id': 999999, 'grade': 50},
+            {'submission_id': self.submissions[1].id, 'grade': 10},
+        ]}, format='json')
+
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, ['graded', 'error', 'error', 'error', 'error'])
+        self.assertEqual(AssignmentSubmission.objects.filter(grade__isnull=False).count(), 1)
+
+
+class EnrollmentCapacityTests(CourseFixturesMixin, TestCase):
+    def setUp(self):
+        self.course = self.make_course('Algebra', self.make_teacher(), max_students=2)
+        self.students = [self.make_student(f's{i}') for i in range(4)]
+        self.client = APIClient()
+
+    def post(self, student, action):
+        self.client.force_authenticate(student.user)
+        return self.client.post(f'/api/courses/courses/{self.course.id}/{action}/')
+
+    def test_full_course_waitlists_and_promotes_in_order(self):
+        responses = [self.post(student, 'enroll') for student in self.students]
+
+        self.assertEqual([r.status_code for r in responses], [201, 201, 202, 202])
+        self.assertEqual([r.data['waitlist_position'] for r in responses[2:]], [1, 2])
+        self.assertEqual(self.post(self.students[0], 'enroll').status_code, 400)
+
+        self.assertEqual(self.post(self.students[0], 'unenroll').status_code, 200)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.active_seat_count, 2)
+        self.assertEqual(
+            set(self.course.enrollments.filter(is_active=True).values_list('student', flat=True)),
+            {self.students[1].pk, self.students[2].pk}
+        )
+        self.assertEqual(list(self.course.waitlist.values_list('student', flat=True)), [self.students[3].pk])
+
+        # Re-enrolling reuses the inactive enrollment row and joins the back of the queue
+        self.assertEqual(self.post(self.students[0], 'enroll').data['waitlist_position'], 2)
+
+    def test_activating_an_active_enrollment_gives_the_seat_back(self):
+        enroll_student(self.course, self.students[0])
+        self.assertTrue(claim_seat(self.course.id))
+
+        activate_enrollment(self.course.id, self.students[0].id)
+
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.active_seat_count, 1)
+
+    def test_last_seat_goes_to_exactly_one_claim(self):
+        enroll_student(self.course, self.students[0])
+        # Both requests loaded the course while one seat was still free
+        first, second = Course.objects.get(pk=self.course.pk), Course.objects.get(pk=self.course.pk)
+        self.assertEqual(second.active_seat_count, 1)
+
+        self.assertTrue(claim_seat(first.pk))
+        self.assertFalse(claim_seat(second.pk))
+
+        # The stale instance doesn't let a later enrollment past the cap either
+        self.assertEqual(enroll_student(second, self.students[1])[0], WAITLISTED)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.active_seat_count, 2)
+
+    def test_recount_matches_enrollment_rows(self):
+        CourseEnrollment.objects.create(student=self.students[0], course=self.course)
+        CourseEnrollment.objects.create(student=self.students[1], course=self.course, is_active=False)
+
+        recount_active_seats([self.course.id])
+
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.active_seat_count, 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs a database with concurrent writers')
+class ConcurrentEnrollmentTests(CourseFixturesMixin, TransactionTestCase):
+    workers = 40
+
+    def test_cap_holds_under_concurrent_enrollments(self):
+        course = self.make_course('Algebra', self.make_teacher(), max_students=10)
+        students = [self.make_student(f's{i}') for i in range(self.workers)]
+        barrier = threading.Barrier(self.workers)
+
+        def enroll(student):
+            barrier.wait()
+            try:
+                return enroll_student(course, student)[0]
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(enroll, students))
+
+        course.refresh_from_db()
+        self.assertEqual(results.count(ENROLLED), 10)
+        self.assertEqual(results.count(WAITLISTED), self.workers - 10)
+        self.assertEqual(course.active_seat_count, 10)
+        self.assertEqual(course.enrollments.filter(is_active=True).count(), 10)
+        self.assertEqual(course.waitlist.count(), self.workers - 10)
+
+    def test_same_student_enrolling_concurrently_takes_one_seat(self):
+        course = self.make_course('Algebra', self.make_teacher(), max_students=10)
+        student = self.make_student('s1')
+        workers = 8
+        barrier = threading.Barrier(workers)
+
+        def enroll(_):
+            barrier.wait()
+            try:
+                return enroll_student(course, student)[0]
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(enroll, range(workers)))
+
+        course.refresh_from_db()
+        self.assertEqual(results.count(ENROLLED), 1)
+        self.assertEqual(results.count(ALREADY_ENROLLED), workers - 1)
+        self.assertEqual(course.active_seat_count, 1)
+
+
+class PrerequisiteTests(CourseFixturesMixin, TestCase):
+    def setUp(self):
+        self.teacher = self.make_teacher()
+        # basics -> algebra -> calculus, and geometry -> calculus
+        self.basics, self.algebra, self.geometry, self.calculus = [
+            self.make_course(title, self.teacher) for title in ['Basics', 'Algebra', 'Geometry', 'Calculus']
+        ]
+        self.algebra.prerequisites.add(self.basics)
+        self.calculus.prerequisites.add(self.algebra, self.geometry)
+        self.student = self.make_student('s1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.student.user)
+
+    def complete(self, *courses):
+        for course in courses:
+            CourseEnrollment.objects.create(
+                student=self.student, course=course, is_active=False, completion_date=timezone.now()
+            )
+
+    def test_closure_is_cached_and_invalidated(self):
+        self.assertEqual(required_courses(self.calculus.id), [self.basics.id, self.algebra.id, self.geometry.id])
+        # Only the version check
+        with CaptureQueriesContext(connection) as ctx:
+            required_courses(self.calculus.id)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        self.calculus.prerequisites.remove(self.geometry)
+        self.assertEqual(required_courses(self.calculus.id), [self.basics.id, self.algebra.id])
+
+    def test_closure_follows_edges_written_without_signals(self):
+        required_courses(self.calculus.id)
+        Edge = Course.prerequisites.through
+        # As another process would: nothing here is told about either change
+        Edge.objects.bulk_create([Edge(from_course=self.geometry, to_course=self.basics)])
+        self.assertEqual(required_courses(self.calculus.id), [self.basics.id, self.algebra.id, self.geometry.id])
+        self.assertEqual(required_courses(self.geometry.id), [self.basics.id])
+
+        Edge.objects.filter(from_course=self.algebra).delete()
+        self.assertEqual(required_courses(self.algebra.id), [])
+
+    def test_cycles_rejected_on_write(self):
+        # The signal aborts add(), which leaves its transaction unusable
+        with self.assertRaises(PrerequisiteCycleError), transaction.atomic():
+            self.basics.prerequisites.add(self.calculus)
+        with self.assertRaises(PrerequisiteCycleError), transaction.atomic():
+            self.calculus.prerequisite_for.add(self.basics)
+
+        self.client.force_authenticate(self.teacher.user)
+        response = self.client.patch(
+            f'/api/courses/courses/{self.basics.id}/', {'prerequisites': [self.algebra.id]}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('prerequisites', response.data)
+        self.assertFalse(self.basics.prerequisites.exists())
+
+    def test_enroll_lists_missing_prerequisites_in_order(self):
+        self.complete(self.geometry)
+
+        response = self.client.post(f'/api/courses/courses/{self.calculus.id}/enroll/')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([c['id'] for c in response.data['missing_prerequisites']], [self.basics.id, self.algebra.id])
+
+        self.complete(self.basics, self.algebra)
+        response = self.client.post(f'/api/courses/courses/{self.calculus.id}/enroll/')
+        self.assertEqual(response.status_code, 201)
+
+    def test_eligible_courses(self):
+        self.complete(self.basics)
+
+        response = self.client.get('/api/courses/courses/eligible_courses/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({c['id'] for c in response.data['results']}, {self.algebra.id, self.geometry.id})
+
+
+class CourseContentOrderingTests(CourseFixturesMixin, TestCase):
+    url = '/api/courses/content/bulk_create/'
+
+    def setUp(self):
+        self.teacher = self.make_teacher()
+        self.course = self.make_course('Algebra', self.teacher)
+        for order in (1, 2, 3):
+            CourseContent.objects.create(course=self.course, title=f'Existing {order}', content_type='lecture', order=order)
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher.user)
+
+    def titles(self):
+        return list(self.course.contents.order_by('order').values_list('order', 'title'))
+
+    def items(self, count):
+        return [{'title': f'New {i}', 'content_type': 'reading'} for i in range(count)]
+
+    def test_inserts_syllabus_in_constant_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                self.url, {'course': self.course.id, 'contents': self.items(150), 'position': 2}, format='json'
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 150)
+        self.assertLess(len(ctx.captured_queries), 15)
+        rows = self.titles()
+        self.assertEqual([order for order, _ in rows], list(range(1, 154)))
+        self.assertEqual((rows[0][1], rows[1][1], rows[151][1], rows[152][1]), ('Existing 1', 'New 0', 'Existing 2', 'Existing 3'))
+
+    def test_invalid_item_writes_nothing(self):
+        items = self.items(3)
+        items[2]['content_type'] = 'podcast'
+
+        response = self.client.post(self.url, {'course': self.course.id, 'contents': items}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['contents'][:2], [{}, {}])
+        self.assertIn('content_type', response.data['contents'][2])
+        self.assertEqual(self.course.contents.count(), 3)
+
+    def test_other_teachers_cannot_add_content(self):
+        self.client.force_authenticate(self.make_teacher('other').user)
+        response = self.client.post(self.url, {'course': self.course.id, 'contents': self.items(1)}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_move_renumbers_in_between(self):
+        last = self.course.contents.get(order=3)
+
+        response = self.client.post(f'/api/courses/content/{last.id}/move/', {'order': 1}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.titles(), [(1, 'Existing 3'), (2, 'Existing 1'), (3, 'Existing 2')])
+
+        self.client.post(f'/api/courses/content/{last.id}/move/', {'order': 99}, format='json')
+        self.assertEqual(self.titles(), [(1, 'Existing 1'), (2, 'Existing 2'), (3, 'Existing 3')])
+
+
+class ProgressTests(CourseFixturesMixin, TestCase):
+    def setUp(self):
+        self.teacher = self.make_teacher()
+        self.course = self.make_course('Algebra', self.teacher)
+        self.lecture = CourseContent.objects.create(
+            course=self.course, title='Lecture', content_type='lecture', order=1,
+            estimated_duration=timedelta(minutes=60)
+        )
+        homework = CourseContent.objects.create(course=self.course, title='HW1', content_type='assignment', order=2)
+        self.extra = CourseContent.objects.create(
+            course=self.course, title='Extra', content_type='reading', order=3, is_required=False
+        )
+        self.assignment = Assignment.objects.create(
+            content=homework, due_date=timezone.now() + timedelta(days=7), total_points=Decimal('10'),
+            submission_type='text', instructions='-'
+        )
+        self.student = self.make_student('s1')
+        self.enrollment = CourseEnrollment.objects.create(student=self.student, course=self.course)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student.user)
+
+    def test_completion_updates_weighted_progress_in_one_update(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(f'/api/courses/content/{self.lecture.id}/complete/')
+
+        self.assertEqual(response.status_code, 200)
+        # 60 of 90 required minutes; the homework has no duration so weighs the default 30
+        self.assertEqual(response.data['progress_percentage'], Decimal('66.67'))
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "courses_courseenrollment"')]
+        self.assertEqual(len(updates), 1)
+
+        self.client.post(f'/api/courses/content/{self.extra.id}/complete/')
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.progress_percentage, Decimal('66.67'))
+        self.assertIsNone(self.enrollment.completion_date)
+
+    def test_grading_completes_assignment_content(self):
+        ContentCompletion.objects.create(student=self.student, content=self.lecture)
+        submission = AssignmentSubmission.objects.create(assignment=self.assignment, student=self.student)
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.progress_percentage, 0)
+
+        bulk_grade_submissions(self.assignment, [{'submission_id': submission.id, 'grade': 8}])
+
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.progress_percentage, 100)
+        self.assertIsNotNone(self.enrollment.completion_date)
+
+    def test_completing_the_course_refreshes_cached_analytics(self):
+        self.assertEqual(get_course_analytics(self.course)['enrollment_stats']['completed'], 0)
+
+        complete_content(self.lecture, [self.student.pk])
+        complete_content(self.assignment.content, [self.student.pk])
+
+        self.assertEqual(get_course_analytics(self.course)['enrollment_stats']['completed'], 1)
+
+    def test_recompute_command(self):
+        ContentCompletion.objects.create(student=self.student, content=self.lecture)
+
+        out = StringIO()
+        call_command('recompute_course_progress', str(self.course.id), stdout=out)
+
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.progress_percentage, Decimal('66.67'))
+        self.assertIn('1 enrollments', out.getvalue())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ChunkedUploadTests(CourseFixturesMixin, TestCase):
+    url = '/api/courses/uploads/'
+    chunk_size = 64 * 1024
+
+    def setUp(self):
+        self.teacher = self.make_teacher()
+        course = self.make_course('Algebra', self.teacher)
+        self.content = CourseContent.objects.create(course=course, title='Video', content_type='video', order=1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher.user)
+        self.data = bytes(range(256)) * 700  # 175 KB: two full parts and a short one
+
+    def upload(self, data, order=None, **extra):
+        session = self.client.post(
+            self.url, {'filename': 'lecture.mp4', 'size': len(data), 'chunk_size': self.chunk_size}, format='json'
+        ).data
+        for index in order or range(session['part_count']):
+            part = data[index * self.chunk_size:(index + 1) * self.chunk_size]
+            response = self.client.put(
+                f"{self.url}{session['id']}/parts/{index}/", part, content_type='application/octet-stream'
+            )
+            self.assertEqual(response.status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f"{self.url}{session['id']}/complete/", extra, format='json')
+
+    def test_resumable_upload_assembles_hashes_and_attaches(self):
+        session = self.client.post(
+            self.url, {'filename': 'lecture.mp4', 'size': len(self.data), 'chunk_size': self.chunk_size}, format='json'
+        ).data
+        self.assertEqual(session['part_count'], 3)
+        self.client.put(f"{self.url}{session['id']}/parts/2/", self.data[2 * self.chunk_size:],
+                        content_type='application/octet-stream')
+        self.assertEqual(self.client.get(f"{self.url}{session['id']}/").data['missing_parts'], [0, 1])
+        self.assertEqual(self.client.post(f"{self.url}{session['id']}/complete/").status_code, 400)
+
+        response = self.upload(self.data, order=[1, 0, 2], content=self.content.id)
+
+        self.assertEqual(response.status_code, 200)
+        stored = StoredFile.objects.get()
+        self.assertEqual(stored.sha256, hashlib.sha256(self.data).hexdigest())
+        self.content.refresh_from_db()
+        with self.content.file_upload.open('rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertFalse(UploadPart.objects.filter(session_id=response.data['id']).exists())
+
+    def test_identical_files_are_stored_once(self):
+        first = self.upload(self.data).data
+        second = self.upload(self.data).data
+
+        self.assertEqual(first['stored_file']['id'], second['stored_file']['id'])
+        self.assertEqual(StoredFile.objects.count(), 1)
+
+    def test_wrong_part_size_and_foreign_targets_rejected(self):
+        session = self.client.post(
+            self.url, {'filename': 'a.bin', 'size': len(self.data), 'chunk_size': self.chunk_size}, format='json'
+        ).data
+        response = self.client.put(f"{self.url}{session['id']}/parts/0/", b'short',
+                                   content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(self.make_teacher('other').user)
+        self.assertEqual(self.client.get(f"{self.url}{session['id']}/").status_code, 404)
+        response = self.upload(self.data, content=self.content.id)
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), MEDIA_SENDFILE='')
+class MediaDeliveryTests(CourseFixturesMixin, TestCase):
+    def setUp(self):
+        course = self.make_course('Algebra', self.make_teacher())
+        self.content = CourseContent.objects.create(course=course, title='Video', content_type='video', order=1)
+        self.content.file_upload.save('lecture.mp4', ContentFile(bytes(range(256)) * 4))
+        self.url = f'/api/courses/content/{self.content.id}/download/'
+        self.student = self.make_student('s1')
+        CourseEnrollment.objects.create(student=self.student, course=course)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student.user)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_download_and_conditional_get(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.body(response)), 1024)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=256-511')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 256-511/1024')
+        self.assertEqual(self.body(response), bytes(range(256)))
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(response['Content-Range'], 'bytes 1014-1023/1024')
+
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=2000-').status_code, 416)
+        # A stale If-Range gets the whole file
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_requires_enrollment_and_can_hand_off_to_nginx(self):
+        self.client.force_authenticate(self.make_student('s2').user)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        self.client.force_authenticate(self.student.user)
+        with self.settings(MEDIA_SENDFILE='nginx'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.content.file_upload.name}')
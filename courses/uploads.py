@@ -0,0 +1,194 @@
+"""
+Chunked, resumable uploads.
+
+A client opens an ``UploadSession`` with the file's name and size, PUTs
+the parts (``chunk_size`` bytes each, the last one shorter) in any order,
+retrying any that fail, and then completes the session. Each part is
+streamed from the request into the default storage, so no worker holds a
+whole file in memory. Completing streams the parts back in order into the
+final file, hashing as it goes; if a ``StoredFile`` with the same SHA-256
+already exists the new copy is deleted and the existing one is reused, so
+identical files are stored once. Parts are removed after assembly.
+
+Works with any Django storage backend, including FileSystemStorage.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import StoredFile, UploadPart, UploadSession
+
+DEFAULT_CHUNK_SIZE = 5 * 1024 * 1024
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024 * 1024
+READ_SIZE = 64 * 1024
+# Parts are spooled in memory up to this size before going to a temp file
+SPOOL_MAX_SIZE = 1024 * 1024
+PARTS_PREFIX = 'upload_parts'
+
+
+class UploadError(ValueError):
+    pass
+
+
+def start_upload(owner, filename, size, chunk_size=None):
+    filename = os.path.basename(filename or '').strip()
+    if not filename:
+        raise UploadError('filename is required')
+    if size < 0 or size > MAX_UPLOAD_SIZE:
+        raise UploadError(f'size must be between 0 and {MAX_UPLOAD_SIZE} bytes')
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+        raise UploadError(f'chunk_size must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE} bytes')
+    return UploadSession.objects.create(owner=owner, filename=filename, size=size, chunk_size=chunk_size)
+
+
+def part_name(session, index):
+    return f'{PARTS_PREFIX}/{session.pk}/{index:06d}'
+
+
+def save_part(session, index, stream):
+    """
+    Stream one part from ``stream`` (anything with ``read(n)``) into
+    storage, replacing an earlier attempt at the same part.
+    """
+    if session.status != 'pending':
+        raise UploadError('Upload is already complete')
+    if not 0 <= index < session.part_count:
+        raise UploadError(f'Part index must be between 0 and {session.part_count - 1}')
+
+    expected = session.expected_part_size(index)
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as buffer:
+        received = 0
+        while True:
+            chunk = stream.read(min(READ_SIZE, expected + 1 - received))
+            if not chunk:
+                break
+            received += len(chunk)
+            if received > expected:
+                break
+            buffer.write(chunk)
+        if received != expected:
+            raise UploadError(f'Part {index} must be exactly {expected} bytes')
+
+        buffer.seek(0)
+        name = part_name(session, index)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        name = default_storage.save(name, File(buffer, name=name))
+
+    part, _ = UploadPart.objects.update_or_create(
+        session=session, index=index,
+        defaults={'name': name, 'size': received, 'received_at': timezone.now()},
+    )
+    return part
+
+
+def missing_parts(session):
+    received = set(session.parts.values_list('index', flat=True))
+    return [index for index in range(session.part_count) if index not in received]
+
+
+class PartsReader(io.RawIOBase):
+    """Reads the parts back as one stream, hashing the bytes as they pass"""
+
+    def __init__(self, names):
+        self.names = iter(names)
+        self.current = None
+        self.hasher = hashlib.sha256()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self.current is None:
+                name = next(self.names, None)
+                if name is None:
+                    return 0
+                self.current = default_storage.open(name, 'rb')
+            data = self.current.read(len(buffer))
+            if data:
+                buffer[:len(data)] = data
+                self.hasher.update(data)
+                return len(data)
+            self.current.close()
+            self.current = None
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+        super().close()
+
+
+def complete_upload(session):
+    """
+    Assemble the parts into a ``StoredFile`` (reusing an identical one if
+    it exists) and mark the session complete. Returns the StoredFile.
+    """
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if session.status == 'complete':
+            return session.stored_file
+
+        missing = missing_parts(session)
+        if missing:
+            raise UploadError(f'Missing parts: {missing}')
+
+        names = list(session.parts.order_by('index').values_list('name', flat=True))
+        reader = PartsReader(names)
+        content = File(io.BufferedReader(reader, READ_SIZE), name=session.filename)
+        content.size = session.size
+        try:
+            name = default_storage.save(f'uploads/{session.pk}/{session.filename}', content)
+        finally:
+            content.close()
+        digest = reader.hasher.hexdigest()
+
+        stored, created = StoredFile.objects.get_or_create(
+            sha256=digest, defaults={'file': name, 'size': session.size}
+        )
+        if not created:
+            default_storage.delete(name)
+
+        session.status = 'complete'
+        session.stored_file = stored
+        session.completed_at = timezone.now()
+        session.save(update_fields=['status', 'stored_file', 'completed_at'])
+
+        transaction.on_commit(lambda: delete_parts(session.pk, names))
+
+    return stored
+
+
+def delete_parts(session_id, names):
+    for name in names:
+        default_storage.delete(name)
+    UploadPart.objects.filter(session_id=session_id).delete()
+
+
+def purge_stale_uploads(older_than=timedelta(days=1)):
+    """Drop unfinished sessions (and their parts) started before ``older_than`` ago"""
+    stale = UploadSession.objects.filter(status='pending', created_at__lt=timezone.now() - older_than)
+    count = 0
+    for session in list(stale):
+        delete_parts(session.pk, list(session.parts.values_list('name', flat=True)))
+        session.delete()
+        count += 1
+    return count
+
+
+def attach_stored_file(instance, field_name, stored):
+    """Point ``instance.<field_name>`` at ``stored``'s existing file without copying it"""
+    getattr(instance, field_name).name = stored.file.name
+    instance.save(update_fields=[field_name])
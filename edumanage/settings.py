@@ -148,7 +148,10 @@ ACCOUNT_EMAIL_VERIFICATION = 'mandatory'
 ACCOUNT_LOGIN_ON_PASSWORD_RESET = True
 ACCOUNT_LOGIN_ON_EMAIL_CONFIRMATION = True
 SOCIALACCOUNT_AUTO_SIGNUP = True
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Mail is queued in the communication outbox and sent by `manage.py send_queued_email`.
+# Set EMAIL_BACKEND to django.core.mail.backends.locmem/filebased.EmailBackend to run offline.
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', BASE_DIR / 'sent_emails')
 EMAIL_HOST = 'smtp.gmail.com'  # For Gmail
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -273,3 +276,9 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'  # For collectstatic in production/Docker
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Course files are served through permission-checked views (courses/media.py).
+# Set MEDIA_SENDFILE to 'nginx' (X-Accel-Redirect under MEDIA_ACCEL_REDIRECT_PREFIX,
+# an internal location aliased to MEDIA_ROOT) or 'apache' (mod_xsendfile) to let the
+# web server stream the bytes once the check has passed.
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE', '').lower()
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
@@ -1,3 +1,9 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import GradeBoundary
+
+
+@admin.register(GradeBoundary)
+class GradeBoundaryAdmin(admin.ModelAdmin):
+    list_display = ['letter', 'min_percentage']
+    ordering = ['-min_percentage']
@@ -1,5 +1,8 @@
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db.models import Avg
 from django.utils import timezone
 from ..models import (
     Exam, ExamResult, Test, Question, Answer, 
@@ -64,15 +67,21 @@ class ExamSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
     
+    # Exam.objects.with_result_stats() annotates these; query only without it
+    
     def get_student_count(self, obj):
-        return obj.students.count()
+        if hasattr(obj, 'result_count'):
+            return obj.result_count
+        return obj.results.count()
     
     def get_average_score(self, obj):
-        results = obj.results.filter(is_graded=True)
-        if results.exists():
-            scores = [result.score for result in results if result.score is not None]
-            return round(sum(scores) / len(scores), 2) if scores else None
-        return None
+        if hasattr(obj, 'graded_average_score'):
+            average = obj.graded_average_score
+        else:
+            average = obj.results.filter(is_graded=True, score__isnull=False).aggregate(
+                average=Avg('score')
+            )['average']
+        return round(average, 2) if average is not None else None
 class ExamResultSerializer(serializers.ModelSerializer):
     """Enhanced serializer for Exam Result model"""
     exam_title = serializers.CharField(source='exam.title', read_only=True)
@@ -163,9 +172,9 @@ class TestSerializer(serializers.ModelSerializer):
             'time_limit_minutes', 'max_attempts', 'shuffle_questions',
             'shuffle_answers', 'question_display', 'show_correct_answers',
             'show_feedback', 'total_points', 'passing_score', 'is_published',
-            'question_count', 'is_available', 'created_at', 'updated_at'
+            'paper_version', 'question_count', 'is_available', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'total_points', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'total_points', 'paper_version', 'created_at', 'updated_at']
 
 
 class TestDetailSerializer(TestSerializer):
@@ -203,7 +212,7 @@ class TestAttemptSerializer(serializers.ModelSerializer):
             'id', 'test', 'student', 'test_title', 'student_name',
             'started_at', 'submitted_at', 'time_taken_seconds',
             'score', 'percentage', 'is_graded', 'graded_by', 'graded_at',
-            'is_submitted', 'is_completed', 'attempt_number', 'is_passed',
+            'is_submitted', 'is_completed', 'attempt_number', 'paper_version', 'is_passed',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
@@ -232,13 +241,24 @@ class BulkGradeExamSerializer(serializers.Serializer):
         for result_data in value:
             if 'result_id' not in result_data:
                 raise serializers.ValidationError("result_id is required for each result")
+            try:
+                int(result_data['result_id'])
+            except (ValueError, TypeError):
+                raise serializers.ValidationError("result_id must be an integer")
             if 'score' not in result_data:
                 raise serializers.ValidationError("score is required for each result")
             
             try:
-                float(result_data['score'])
-            except (ValueError, TypeError):
+                score = Decimal(str(result_data['score']))
+            except (InvalidOperation, ValueError, TypeError):
                 raise serializers.ValidationError("Score must be a valid number")
+            if not score.is_finite():
+                raise serializers.ValidationError("Score must be a valid number")
+            if score < 0:
+                raise serializers.ValidationError("Score cannot be negative")
+            exam = self.context.get('exam')
+            if exam is not None and score > exam.max_marks:
+                raise serializers.ValidationError(f"Score cannot exceed the exam's {exam.max_marks} marks")
         
         return value
 
@@ -268,6 +288,19 @@ class BulkGradeTestSerializer(serializers.Serializer):
         return value
 
 
+class AutosaveAnswerSerializer(serializers.Serializer):
+    """One answer in an autosave batch"""
+    question = serializers.IntegerField()
+    selected_answer = serializers.IntegerField(required=False, allow_null=True)
+    text_answer = serializers.CharField(required=False, allow_blank=True, default='')
+    time_spent_seconds = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+
+
+class AutosaveSerializer(serializers.Serializer):
+    """Serializer for saving a batch of answers to an open attempt"""
+    answers = AutosaveAnswerSerializer(many=True, allow_empty=False)
+
+
 # Statistics Serializers
 class ExamStatsSerializer(serializers.Serializer):
     """Serializer for exam statistics"""
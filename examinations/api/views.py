@@ -3,25 +3,29 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Count, Avg, Sum, Max, Min
+from django.db.models import Sum
 from django.utils import timezone
-from datetime import datetime, timedelta
-from collections import defaultdict
 from django.contrib.auth import get_user_model
+from django.http import HttpResponseNotModified
 from accounts.permissions import (
     IsOwnerOrAdmin, IsStaffOrAdmin, IsTeacherOrAdmin,
-    IsStudentOrTeacherOrAdmin, CanAccessExaminations
+    IsStudentOrTeacherOrAdmin, IsStudentUser, CanAccessExaminations
 )
 
+from courses.media import etag_matches
 from ..models import (
     Exam, ExamResult, Test, Question, Answer, 
-    TestAttempt, StudentAnswer
+    TestAttempt, StudentAnswer, TestPaper
 )
+from ..grading import bulk_grade_exam_results
+from ..statistics import DEFAULT_HISTOGRAM_BINS, MAX_HISTOGRAM_BINS, exam_statistics, result_statistics
+from ..papers import ANSWER_KEY, PAPER, current_paper_version, get_paper, paper_etag
+from ..taking import AttemptError, attempt_deadline, attempt_paper, save_answers, start_attempt, submit_attempt
 from .serializers import (
     ExamSerializer, ExamResultSerializer, ExamCreateSerializer,
     TestSerializer, TestDetailSerializer, QuestionSerializer, AnswerSerializer,
     TestAttemptSerializer, TestAttemptDetailSerializer, StudentAnswerSerializer,
-    BulkGradeExamSerializer, BulkGradeTestSerializer,
+    BulkGradeExamSerializer, BulkGradeTestSerializer, AutosaveSerializer,
     ExamStatsSerializer, TestStatsSerializer
 )
 
@@ -58,7 +62,7 @@ class ExamViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Filter queryset based on user role and permissions"""
-        queryset = Exam.objects.select_related('course', 'created_by').prefetch_related('results')
+        queryset = Exam.objects.select_related('course', 'created_by__user').with_result_stats()
         user = self.request.user
         
         if user.is_staff or user.is_superuser:
@@ -81,7 +85,7 @@ class ExamViewSet(viewsets.ModelViewSet):
                 try:
                     student = user.student
                     # Get exams for student's enrolled courses
-                    enrolled_courses = student.enrollments.filter(
+                    enrolled_courses = student.courseenrollment_set.filter(
                         is_active=True
                     ).values_list('course', flat=True)
                     return queryset.filter(course__in=enrolled_courses)
@@ -91,6 +95,13 @@ class ExamViewSet(viewsets.ModelViewSet):
         except:
             return queryset.none()
 
+    def histogram_bins(self):
+        try:
+            bins = int(self.request.query_params.get('bins', DEFAULT_HISTOGRAM_BINS))
+        except ValueError:
+            bins = DEFAULT_HISTOGRAM_BINS
+        return min(max(bins, 1), MAX_HISTOGRAM_BINS)
+
     def perform_create(self, serializer):
         """Set created_by to current teacher"""
         try:
@@ -116,78 +127,30 @@ class ExamViewSet(viewsets.ModelViewSet):
         
         serializer = ExamResultSerializer(results, many=True)
         
-        # Calculate statistics
-        graded_results = results.filter(is_graded=True, score__isnull=False)
-        total_students = results.count()
-        graded_count = graded_results.count()
-        
-        if graded_count > 0:
-            scores = [r.score for r in graded_results]
-            avg_score = sum(scores) / len(scores)
-            highest_score = max(scores)
-            lowest_score = min(scores)
-            passed_count = graded_results.filter(score__gte=exam.passing_marks).count()
-            pass_rate = (passed_count / graded_count) * 100
-        else:
-            avg_score = highest_score = lowest_score = 0
-            passed_count = 0
-            pass_rate = 0
-        
         return Response({
             'exam': ExamSerializer(exam).data,
             'results': serializer.data,
-            'statistics': {
-                'total_students': total_students,
-                'graded_count': graded_count,
-                'pending_count': total_students - graded_count,
-                'average_score': round(avg_score, 2),
-                'highest_score': highest_score,
-                'lowest_score': lowest_score,
-                'passed_count': passed_count,
-                'failed_count': graded_count - passed_count,
-                'pass_rate': round(pass_rate, 2)
-            }
+            'statistics': exam_statistics(exam, bins=self.histogram_bins())
         })
 
     @action(detail=True, methods=['post'])
     def bulk_grade(self, request, pk=None):
         """Bulk grade exam results"""
         exam = self.get_object()
-        serializer = BulkGradeExamSerializer(data=request.data)
+        serializer = BulkGradeExamSerializer(data=request.data, context={'exam': exam})
         
         if serializer.is_valid():
-            try:
-                teacher = request.user.teacher
-                exam_results = serializer.validated_data['exam_results']
-                updated_count = 0
-                
-                for result_data in exam_results:
-                    try:
-                        result = ExamResult.objects.get(
-                            id=result_data['result_id'],
-                            exam=exam
-                        )
-                        result.score = result_data['score']
-                        result.grade_comment = result_data.get('grade_comment', '')
-                        result.teacher_feedback = result_data.get('teacher_feedback', '')
-                        result.graded_by = teacher
-                        result.graded_at = timezone.now()
-                        result.is_graded = True
-                        result.save()
-                        updated_count += 1
-                    except ExamResult.DoesNotExist:
-                        continue
-                
-                return Response({
-                    'message': f'Successfully graded {updated_count} exam results',
-                    'updated_count': updated_count
-                })
-                
-            except Exception as e:
+            teacher = getattr(request.user, 'teacher', None)
+            if teacher is None:
                 return Response(
-                    {'error': str(e)}, 
+                    {'error': 'Only teachers can grade exam results'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            results = bulk_grade_exam_results(exam, serializer.validated_data['exam_results'], grader=teacher)
+            return Response({
+                'message': f'Successfully graded {len(results)} exam results',
+                'updated_count': len(results)
+            })
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -206,53 +169,32 @@ class ExamViewSet(viewsets.ModelViewSet):
             except:
                 return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
         
+        # Narrow to one course or teacher
+        for param, field in (('course', 'course_id'), ('teacher', 'created_by_id')):
+            value = request.query_params.get(param)
+            if value:
+                if not value.isdigit():
+                    return Response({'error': f'{param} must be an id'}, status=status.HTTP_400_BAD_REQUEST)
+                queryset = queryset.filter(**{field: value})
+        
         # Date filtering
         now = timezone.now()
         month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         
+        score_stats = result_statistics(
+            ExamResult.objects.filter(exam__in=queryset), bins=self.histogram_bins()
+        )
         stats = {
             'total_exams': queryset.count(),
             'exams_this_month': queryset.filter(created_at__gte=month_start).count(),
-            'total_students_examined': ExamResult.objects.filter(
-                exam__in=queryset
-            ).values('student').distinct().count(),
+            'total_students_examined': score_stats['total_students'],
             'recent_exams': ExamSerializer(
-                queryset.order_by('-created_at')[:5], many=True
-            ).data
+                queryset.select_related('course', 'created_by__user').with_result_stats().order_by('-created_at')[:5],
+                many=True
+            ).data,
+            **score_stats,
         }
         
-        # Calculate score statistics
-        graded_results = ExamResult.objects.filter(
-            exam__in=queryset, 
-            is_graded=True, 
-            score__isnull=False
-        )
-        
-        if graded_results.exists():
-            scores = graded_results.values_list('score', flat=True)
-            stats.update({
-                'average_score': round(sum(scores) / len(scores), 2),
-                'highest_score': max(scores),
-                'lowest_score': min(scores),
-            })
-            
-            # Calculate pass rate (assuming passing score is exam-specific)
-            passed = 0
-            total = 0
-            for result in graded_results.select_related('exam'):
-                total += 1
-                if result.score >= result.exam.passing_marks:
-                    passed += 1
-            
-            stats['pass_rate'] = round((passed / total) * 100, 2) if total > 0 else 0
-        else:
-            stats.update({
-                'average_score': 0,
-                'highest_score': 0,
-                'lowest_score': 0,
-                'pass_rate': 0
-            })
-        
         return Response(stats)
 
 
@@ -309,6 +251,10 @@ class TestViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             permission_classes = [IsTeacherOrAdmin]
+        elif self.action == 'start':
+            permission_classes = [IsStudentUser]
+        elif self.action == 'answer_key':
+            permission_classes = [IsTeacherOrAdmin]
         else:
             permission_classes = [CanAccessExaminations]
         
@@ -335,7 +281,7 @@ class TestViewSet(viewsets.ModelViewSet):
             
             elif user_profile.user_type == 'student':
                 student = user.student
-                enrolled_courses = student.enrollments.filter(
+                enrolled_courses = student.courseenrollment_set.filter(
                     is_active=True
                 ).values_list('course', flat=True)
                 return queryset.filter(course__in=enrolled_courses, is_published=True)
@@ -351,6 +297,64 @@ class TestViewSet(viewsets.ModelViewSet):
             from rest_framework import serializers as drf_serializers
             raise drf_serializers.ValidationError("Only teachers can create tests")
 
+    def paper_response(self, request, test, part):
+        version = request.query_params.get('version')
+        if version is not None:
+            try:
+                version = int(version)
+            except ValueError:
+                return Response({'error': 'version must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            version = current_paper_version(test)
+
+        etag = paper_etag(test.pk, version, part)
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            response = HttpResponseNotModified()
+        else:
+            try:
+                response = Response(get_paper(test.pk, version, part))
+            except TestPaper.DoesNotExist:
+                return Response({'error': 'No such paper version'}, status=status.HTTP_404_NOT_FOUND)
+        response['ETag'] = etag
+        # A numbered version never changes; "latest" must be revalidated
+        response['Cache-Control'] = (
+            'private, max-age=31536000, immutable' if request.query_params.get('version') else 'private, no-cache'
+        )
+        return response
+
+    @action(detail=True, methods=['get'])
+    def paper(self, request, pk=None):
+        """Compiled question paper (latest, or ?version=N) without the answer key"""
+        test = self.get_object()
+        # Students only see the questions once the test opens
+        if timezone.now() < test.available_from and not IsTeacherOrAdmin().has_permission(request, self):
+            return Response({'error': 'This test is not open yet'}, status=status.HTTP_403_FORBIDDEN)
+        return self.paper_response(request, test, PAPER)
+
+    @action(detail=True, methods=['get'], url_path='answer-key')
+    def answer_key(self, request, pk=None):
+        """Answer key of a compiled paper version (latest, or ?version=N)"""
+        return self.paper_response(request, self.get_object(), ANSWER_KEY)
+
+    @action(detail=True, methods=['post'])
+    def start(self, request, pk=None):
+        """Start the student's next attempt, or resume the open one"""
+        test = self.get_object()
+        try:
+            attempt, created = start_attempt(
+                test, request.user.student,
+                ip_address=request.META.get('REMOTE_ADDR'),
+                user_agent=request.headers.get('User-Agent', ''),
+            )
+        except AttemptError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'attempt': TestAttemptSerializer(attempt).data,
+            'deadline': attempt_deadline(test, attempt),
+            'questions': attempt_paper(test, attempt),
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
     @action(detail=True, methods=['get'])
     def attempts(self, request, pk=None):
         """Get all attempts for a specific test"""
@@ -501,6 +505,8 @@ class TestAttemptViewSet(viewsets.ReadOnlyModelViewSet):
     ordering = ['-started_at']
     
     def get_permissions(self):
+        if self.action in ['save_answers', 'submit']:
+            return [IsStudentUser()]
         return [CanAccessExaminations()]
 
     def get_serializer_class(self):
@@ -528,3 +534,31 @@ class TestAttemptViewSet(viewsets.ReadOnlyModelViewSet):
                 
         except:
             return queryset.none()
+
+    @action(detail=True, methods=['get'])
+    def paper(self, request, pk=None):
+        """The attempt's questions, in the order this student sees them"""
+        attempt = self.get_object()
+        return Response({
+            'attempt': TestAttemptSerializer(attempt).data,
+            'deadline': attempt_deadline(attempt.test, attempt),
+            'questions': attempt_paper(attempt.test, attempt),
+        })
+
+    @action(detail=True, methods=['post'], url_path='answers')
+    def save_answers(self, request, pk=None):
+        """Autosave a batch of answers to an open attempt"""
+        attempt = self.get_object()
+        serializer = AutosaveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            saved = save_answers(attempt, serializer.validated_data['answers'])
+        except AttemptError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'saved': saved})
+
+    @action(detail=True, methods=['post'])
+    def submit(self, request, pk=None):
+        """Submit the attempt for grading"""
+        attempt = submit_attempt(self.get_object())
+        return Response(TestAttemptSerializer(attempt).data)
@@ -0,0 +1,282 @@
+"""
+Automatic grading of test attempts.
+
+The test's answer key is loaded once (two queries: questions, then their
+answers) and every objective answer in a batch of attempts is scored
+against it in memory; the results are written back with ``bulk_update``.
+
+How each question type is scored:
+
+- ``multiple_choice`` / ``true_false``: full points when the selected
+  answer is marked correct. A true/false ``text_answer`` such as "true"
+  is matched against the answer texts.
+- ``short_answer`` / ``fill_blank``: full points when the normalized
+  ``text_answer`` equals the normalized text of any correct answer
+  (case, accents-compatibility, spacing and trailing punctuation ignored).
+- ``matching``: each correct answer holds one pair as
+  ``"prompt :: match"``; the student's ``text_answer`` is a JSON object
+  mapping prompts to matches. Points are awarded pro rata to the pairs
+  matched.
+- ``essay`` is left for the teacher (``bulk_grade_answers``); an attempt
+  is only marked graded once no essay answers are waiting.
+
+Exam results are graded in bulk too (``bulk_grade_exam_results``): the
+exam and all targeted results are loaded once, and percentages and
+letter grades are computed for the whole batch with NumPy. Letters come
+from the ``GradeBoundary`` table, which is cached, with
+``DEFAULT_GRADING_SCALE`` used while that table is empty.
+"""
+
+import json
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Answer, ExamResult, GradeBoundary, Question, StudentAnswer, TestAttempt
+
+AUTO_GRADED_TYPES = {'multiple_choice', 'true_false', 'short_answer', 'fill_blank', 'matching'}
+MATCHING_SEPARATOR = '::'
+REGRADE_BATCH_SIZE = 500
+CENTS = Decimal('0.01')
+
+GRADING_SCALE_CACHE_KEY = 'examinations:grading_scale'
+GRADING_SCALE_CACHE_TIMEOUT = 60 * 60
+DEFAULT_GRADING_SCALE = [
+    (Decimal('90'), 'A+'), (Decimal('85'), 'A'), (Decimal('80'), 'A-'), (Decimal('75'), 'B+'),
+    (Decimal('70'), 'B'), (Decimal('65'), 'B-'), (Decimal('60'), 'C+'), (Decimal('55'), 'C'),
+    (Decimal('50'), 'C-'), (Decimal('0'), 'F'),
+]
+
+_SPACES = re.compile(r'\s+')
+_TRAILING_PUNCTUATION = '.,;:!?'
+
+
+def normalize_text(value):
+    value = unicodedata.normalize('NFKC', value or '').casefold()
+    return _SPACES.sub(' ', value).strip().rstrip(_TRAILING_PUNCTUATION).strip()
+
+
+@dataclass
+class QuestionKey:
+    question_type: str
+    points: Decimal
+    correct_ids: set = field(default_factory=set)
+    accepted_texts: set = field(default_factory=set)
+    pairs: dict = field(default_factory=dict)
+
+
+def load_answer_key(test):
+    """``{question_id: QuestionKey}`` for every question of ``test``"""
+    key = {
+        question_id: QuestionKey(question_type, points)
+        for question_id, question_type, points in Question.objects.filter(test=test).values_list(
+            'id', 'question_type', 'points'
+        )
+    }
+    answers = Answer.objects.filter(question__test=test, is_correct=True).values_list(
+        'id', 'question_id', 'answer_text'
+    )
+    for answer_id, question_id, answer_text in answers:
+        question = key[question_id]
+        question.correct_ids.add(answer_id)
+        if question.question_type == 'matching':
+            prompt, _, match = answer_text.partition(MATCHING_SEPARATOR)
+            question.pairs[normalize_text(prompt)] = normalize_text(match)
+        else:
+            question.accepted_texts.add(normalize_text(answer_text))
+    return key
+
+
+def score_matching(question, text_answer):
+    if not question.pairs:
+        return Decimal('0')
+    try:
+        given = json.loads(text_answer or '{}')
+    except ValueError:
+        return Decimal('0')
+    if not isinstance(given, dict):
+        return Decimal('0')
+    given = {normalize_text(str(prompt)): normalize_text(str(match)) for prompt, match in given.items()}
+    matched = sum(1 for prompt, match in question.pairs.items() if given.get(prompt) == match)
+    return (question.points * matched / len(question.pairs)).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def score_answer(question, selected_answer_id, text_answer):
+    """Points for one answer, or None if the question isn't auto-graded"""
+    question_type = question.question_type
+    if question_type not in AUTO_GRADED_TYPES:
+        return None
+    if question_type == 'matching':
+        return score_matching(question, text_answer)
+    if question_type in ('multiple_choice', 'true_false') and selected_answer_id is not None:
+        correct = selected_answer_id in question.correct_ids
+    else:
+        correct = bool(text_answer) and normalize_text(text_answer) in question.accepted_texts
+    return question.points if correct else Decimal('0')
+
+
+def test_total_points(test, key):
+    if test.total_points:
+        return Decimal(test.total_points)
+    return sum((question.points for question in key.values()), Decimal('0'))
+
+
+def grade_attempts(test, attempts, key=None, grader=None):
+    """
+    Score every objective answer of ``attempts`` (TestAttempts of
+    ``test``) against the answer key and update each attempt's score and
+    percentage. Essay answers keep whatever the teacher gave them.
+    Returns the number of answers scored.
+
+    Runs a fixed number of queries however many attempts are passed.
+    """
+    key = key if key is not None else load_answer_key(test)
+    attempts = list(attempts)
+    if not attempts:
+        return 0
+    total_points = test_total_points(test, key)
+    now = timezone.now()
+
+    answers = list(
+        StudentAnswer.objects.filter(attempt__in=attempts).only(
+            'id', 'attempt_id', 'question_id', 'selected_answer_id', 'text_answer', 'points_earned', 'is_graded'
+        )
+    )
+    scored = []
+    pending_attempts = set()
+    for answer in answers:
+        question = key.get(answer.question_id)
+        points = score_answer(question, answer.selected_answer_id, answer.text_answer) if question else None
+        if points is None:
+            if not answer.is_graded:
+                pending_attempts.add(answer.attempt_id)
+            continue
+        answer.points_earned = points
+        answer.is_graded = True
+        scored.append(answer)
+
+    totals = {}
+    for answer in answers:
+        if answer.points_earned is not None:
+            totals[answer.attempt_id] = totals.get(answer.attempt_id, Decimal('0')) + answer.points_earned
+
+    for attempt in attempts:
+        attempt.score = totals.get(attempt.pk, Decimal('0')).quantize(CENTS)
+        attempt.percentage = (
+            (attempt.score * 100 / total_points).quantize(CENTS, rounding=ROUND_HALF_UP) if total_points else Decimal('0')
+        )
+        attempt.is_graded = attempt.pk not in pending_attempts
+        attempt.graded_at = now if attempt.is_graded else None
+        if attempt.is_graded and grader is not None:
+            attempt.graded_by = grader
+
+    with transaction.atomic():
+        StudentAnswer.objects.bulk_update(scored, ['points_earned', 'is_graded'], batch_size=REGRADE_BATCH_SIZE)
+        TestAttempt.objects.bulk_update(
+            attempts, ['score', 'percentage', 'is_graded', 'graded_at', 'graded_by'], batch_size=REGRADE_BATCH_SIZE
+        )
+    return len(scored)
+
+
+def grade_attempt(attempt, grader=None):
+    """Auto-grade a single submitted attempt"""
+    return grade_attempts(attempt.test, [attempt], grader=grader)
+
+
+def regrade_test(test, batch_size=REGRADE_BATCH_SIZE):
+    """
+    Re-score every submitted attempt of ``test`` in batches of
+    ``batch_size`` attempts, loading the answer key once. Returns
+    ``(attempts, answers)`` counts.
+    """
+    key = load_answer_key(test)
+    attempt_ids = list(
+        TestAttempt.objects.filter(test=test, is_submitted=True).order_by('pk').values_list('pk', flat=True)
+    )
+    attempts_done = answers_done = 0
+    for start in range(0, len(attempt_ids), batch_size):
+        batch = TestAttempt.objects.filter(pk__in=attempt_ids[start:start + batch_size]).only(
+            'id', 'test_id', 'score', 'percentage', 'is_graded', 'graded_at', 'graded_by'
+        )
+        batch = list(batch)
+        answers_done += grade_attempts(test, batch, key=key)
+        attempts_done += len(batch)
+    return attempts_done, answers_done
+
+
+def get_grading_scale():
+    """``[(min_percentage, letter), ...]`` from the GradeBoundary table, highest first"""
+    scale = cache.get(GRADING_SCALE_CACHE_KEY)
+    if scale is None:
+        scale = list(GradeBoundary.objects.order_by('-min_percentage').values_list('min_percentage', 'letter'))
+        scale = scale or DEFAULT_GRADING_SCALE
+        cache.set(GRADING_SCALE_CACHE_KEY, scale, GRADING_SCALE_CACHE_TIMEOUT)
+    return scale
+
+
+def invalidate_grading_scale():
+    cache.delete(GRADING_SCALE_CACHE_KEY)
+
+
+def grade_letters(percentages, scale=None):
+    """Letter for each of ``percentages``; below the lowest boundary gets the lowest letter"""
+    scale = scale or get_grading_scale()
+    minimums = np.array([float(minimum) for minimum, _ in reversed(scale)])
+    letters = np.array([letter for _, letter in reversed(scale)])
+    positions = np.searchsorted(minimums, np.asarray(percentages, dtype=float), side='right') - 1
+    return letters[np.clip(positions, 0, None)].tolist()
+
+
+def letter_for(percentage, scale=None):
+    return grade_letters([percentage], scale)[0]
+
+
+def bulk_grade_exam_results(exam, items, grader=None):
+    """
+    Grade the ``exam``'s results listed in ``items`` (dicts with
+    ``result_id``, ``score`` and optionally ``grade_comment`` and
+    ``teacher_feedback``) in one transaction. Results of other exams are
+    ignored. As in ``ExamResult.save``, scores only change when there is a
+    ``grader``. Returns the updated results.
+    """
+    items = {int(item['result_id']): item for item in items}
+    results = list(ExamResult.objects.filter(exam=exam, pk__in=items))
+    if not results:
+        return []
+
+    if grader is not None:
+        for result in results:
+            result.score = Decimal(str(items[result.pk]['score'])).quantize(CENTS)
+    scores = np.array([np.nan if result.score is None else float(result.score) for result in results])
+    max_marks = float(exam.max_marks)
+    percentages = np.round(scores / max_marks * 100, 2) if max_marks > 0 else np.full(len(results), np.nan)
+    letters = grade_letters(np.nan_to_num(percentages))
+    now = timezone.now()
+
+    for result, percentage, letter in zip(results, percentages.tolist(), letters):
+        item = items[result.pk]
+        if not np.isnan(percentage):
+            result.percentage = Decimal(str(percentage)).quantize(CENTS)
+            result.grade_letter = letter
+        result.grade_comment = item.get('grade_comment', '')
+        result.teacher_feedback = item.get('teacher_feedback', '')
+        result.updated_at = now
+        if grader is not None:
+            result.graded_by = grader
+            result.graded_at = now
+            result.is_graded = True
+
+    with transaction.atomic():
+        ExamResult.objects.bulk_update(
+            results,
+            ['score', 'percentage', 'grade_letter', 'grade_comment', 'teacher_feedback',
+             'graded_by', 'graded_at', 'is_graded', 'updated_at'],
+            batch_size=REGRADE_BATCH_SIZE,
+        )
+    return results
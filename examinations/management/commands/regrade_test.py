@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from examinations.grading import REGRADE_BATCH_SIZE, regrade_test
+from examinations.models import Test
+
+
+class Command(BaseCommand):
+    help = 'Re-score every submitted attempt of a test against its current answer key'
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_id', type=int, help='Test id')
+        parser.add_argument(
+            '--batch-size', type=int, default=REGRADE_BATCH_SIZE,
+            help=f'Attempts graded per batch (default {REGRADE_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            test = Test.objects.get(pk=options['test_id'])
+        except Test.DoesNotExist:
+            raise CommandError(f'Test {options["test_id"]} does not exist')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        attempts, answers = regrade_test(test, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Re-graded {answers} answers in {attempts} attempts'))
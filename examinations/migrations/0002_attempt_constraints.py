@@ -0,0 +1,43 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:31
+
+from django.db import migrations, models
+
+
+def close_duplicate_open_attempts(apps, schema_editor):
+    # Keep each student's latest unsubmitted attempt per test open
+    TestAttempt = apps.get_model('examinations', 'TestAttempt')
+    seen = set()
+    stale = []
+    for pk, test_id, student_id in TestAttempt.objects.filter(is_submitted=False).order_by(
+        '-attempt_number'
+    ).values_list('pk', 'test_id', 'student_id'):
+        if (test_id, student_id) in seen:
+            stale.append(pk)
+        seen.add((test_id, student_id))
+    TestAttempt.objects.filter(pk__in=stale).update(is_submitted=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('examinations', '0001_initial'),
+        ('students', '0002_student_class_group'),
+        ('teachers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testattempt',
+            name='shuffle_seed',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(close_duplicate_open_attempts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='testattempt',
+            constraint=models.CheckConstraint(check=models.Q(('attempt_number__gte', 1)), name='test_attempt_number_positive'),
+        ),
+        migrations.AddConstraint(
+            model_name='testattempt',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_submitted', False)), fields=('test', 'student'), name='one_open_attempt_per_test'),
+        ),
+    ]
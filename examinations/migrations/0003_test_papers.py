@@ -0,0 +1,41 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('examinations', '0002_attempt_constraints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='paper_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='testattempt',
+            name='paper_version',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='TestPaper',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('content_hash', models.CharField(max_length=64)),
+                ('paper', models.JSONField()),
+                ('answer_key', models.JSONField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='papers', to='examinations.test')),
+            ],
+            options={
+                'ordering': ['test', '-version'],
+                'unique_together': {('test', 'version')},
+            },
+        ),
+    ]
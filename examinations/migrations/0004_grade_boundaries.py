@@ -0,0 +1,41 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:35
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# The letter grades ExamResult.save used to hard-code
+DEFAULT_SCALE = [
+    ('A+', 90), ('A', 85), ('A-', 80), ('B+', 75), ('B', 70),
+    ('B-', 65), ('C+', 60), ('C', 55), ('C-', 50), ('F', 0),
+]
+
+
+def seed_grading_scale(apps, schema_editor):
+    GradeBoundary = apps.get_model('examinations', 'GradeBoundary')
+    GradeBoundary.objects.bulk_create(
+        [GradeBoundary(letter=letter, min_percentage=Decimal(minimum)) for letter, minimum in DEFAULT_SCALE]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('examinations', '0003_test_papers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradeBoundary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('letter', models.CharField(max_length=2, unique=True)),
+                ('min_percentage', models.DecimalField(decimal_places=2, max_digits=5, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'grade boundaries',
+                'ordering': ['-min_percentage'],
+            },
+        ),
+        migrations.RunPython(seed_grading_scale, migrations.RunPython.noop),
+    ]
@@ -6,6 +6,20 @@ from teachers.models import Teacher
 from courses.models import Course
 
 
+class ExamQuerySet(models.QuerySet):
+    def with_result_stats(self):
+        """
+        Annotate the result count and the average graded score so exam
+        lists don't query per exam (see ExamSerializer).
+        """
+        return self.annotate(
+            result_count=models.Count('results'),
+            graded_average_score=models.Avg(
+                'results__score', filter=models.Q(results__is_graded=True, results__score__isnull=False)
+            ),
+        )
+
+
 class Exam(models.Model):
     """Enhanced Exam model for comprehensive assessment management"""
     EXAM_TYPES = [
@@ -55,6 +69,8 @@ class Exam(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ExamQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-date', '-start_time']
     
@@ -64,23 +80,36 @@ class Exam(models.Model):
     @property
     def is_active(self):
         now = timezone.now()
-        exam_start = timezone.datetime.combine(self.date, self.start_time)
-        exam_end = timezone.datetime.combine(self.date, self.end_time)
+        exam_start = timezone.make_aware(timezone.datetime.combine(self.date, self.start_time))
+        exam_end = timezone.make_aware(timezone.datetime.combine(self.date, self.end_time))
         return exam_start <= now <= exam_end
     
     @property
     def is_upcoming(self):
         now = timezone.now()
-        exam_start = timezone.datetime.combine(self.date, self.start_time)
+        exam_start = timezone.make_aware(timezone.datetime.combine(self.date, self.start_time))
         return now < exam_start
     
     @property
     def is_completed(self):
         now = timezone.now()
-        exam_end = timezone.datetime.combine(self.date, self.end_time)
+        exam_end = timezone.make_aware(timezone.datetime.combine(self.date, self.end_time))
         return now > exam_end
 
 
+class GradeBoundary(models.Model):
+    """One row of the grading scale: results at or above min_percentage get letter"""
+    letter = models.CharField(max_length=2, unique=True)
+    min_percentage = models.DecimalField(max_digits=5, decimal_places=2, unique=True)
+    
+    class Meta:
+        ordering = ['-min_percentage']
+        verbose_name_plural = 'grade boundaries'
+    
+    def __str__(self):
+        return f"{self.letter} (>= {self.min_percentage}%)"
+
+
 class ExamResult(models.Model):
     """Enhanced ExamResult model for detailed grading"""
     exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='results')
@@ -123,28 +152,10 @@ class ExamResult(models.Model):
         if self.score is not None and self.exam.max_marks > 0:
             self.percentage = (self.score / self.exam.max_marks) * 100
             
-        # Calculate letter grade based on percentage
+        # Letter grade from the grading scale table
         if self.percentage is not None:
-            if self.percentage >= 90:
-                self.grade_letter = 'A+'
-            elif self.percentage >= 85:
-                self.grade_letter = 'A'
-            elif self.percentage >= 80:
-                self.grade_letter = 'A-'
-            elif self.percentage >= 75:
-                self.grade_letter = 'B+'
-            elif self.percentage >= 70:
-                self.grade_letter = 'B'
-            elif self.percentage >= 65:
-                self.grade_letter = 'B-'
-            elif self.percentage >= 60:
-                self.grade_letter = 'C+'
-            elif self.percentage >= 55:
-                self.grade_letter = 'C'
-            elif self.percentage >= 50:
-                self.grade_letter = 'C-'
-            else:
-                self.grade_letter = 'F'
+            from .grading import letter_for  # grading imports these models
+            self.grade_letter = letter_for(self.percentage)
         
         # Prevent students from changing their exam scores (security measure)
         if self.pk:
@@ -201,6 +212,8 @@ class Test(models.Model):
     
     # Status
     is_published = models.BooleanField(default=False)
+    # Latest compiled TestPaper version (0 until first published)
+    paper_version = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -277,6 +290,25 @@ class Answer(models.Model):
         return f"{self.question.question_text[:30]}... - {self.answer_text[:30]}..."
 
 
+class TestPaper(models.Model):
+    """Immutable compiled version of a test's questions (see examinations.papers)"""
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='papers')
+    version = models.PositiveIntegerField()
+    content_hash = models.CharField(max_length=64)
+    # Student-safe questions and the answer key. Kept in the database, not
+    # MEDIA_ROOT, so they're only reachable through the permission-checked API
+    paper = models.JSONField()
+    answer_key = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        unique_together = ['test', 'version']
+        ordering = ['test', '-version']
+    
+    def __str__(self):
+        return f"{self.test.title} v{self.version}"
+
+
 class TestAttempt(models.Model):
     """Student test attempts"""
     test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='attempts')
@@ -298,6 +330,10 @@ class TestAttempt(models.Model):
     is_submitted = models.BooleanField(default=False)
     is_completed = models.BooleanField(default=False)
     attempt_number = models.PositiveIntegerField()
+    # Seeds the question/answer shuffle so a resumed attempt sees the same order
+    shuffle_seed = models.PositiveIntegerField(default=0, editable=False)
+    # TestPaper version the student was shown
+    paper_version = models.PositiveIntegerField(null=True, blank=True, editable=False)
     
     # Additional data
     ip_address = models.GenericIPAddressField(null=True, blank=True)
@@ -309,6 +345,13 @@ class TestAttempt(models.Model):
     class Meta:
         unique_together = ['test', 'student', 'attempt_number']
         ordering = ['-created_at']
+        constraints = [
+            models.CheckConstraint(check=models.Q(attempt_number__gte=1), name='test_attempt_number_positive'),
+            models.UniqueConstraint(
+                fields=['test', 'student'], condition=models.Q(is_submitted=False),
+                name='one_open_attempt_per_test',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.student.user.get_full_name()} - {self.test.title} (Attempt {self.attempt_number})"
@@ -0,0 +1,141 @@
+"""
+Compiled, versioned test papers.
+
+When a test is published, and after every edit to a published test's
+questions or answers, ``compile_test_paper`` writes a new ``TestPaper``
+version containing two JSON documents. They are stored on the row, not
+in media storage, so they can only be read through the
+permission-checked API:
+
+- the student-safe paper: questions and choices, with no ``is_correct``;
+  matching questions show their prompts and a sorted list of matches.
+- the answer key: every answer with its ``is_correct`` flag.
+
+A version is never changed once written. A compile whose content matches
+the latest version reuses that version, so repeated signals are
+harmless. ``Test.paper_version`` points at the latest version, and each
+``TestAttempt`` records the version it was shown. Because versions are
+immutable, each one can be cached without invalidation and served with a
+strong ETag built from the test id and version.
+"""
+
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.http import quote_etag
+
+from .grading import MATCHING_SEPARATOR
+from .models import Answer, Question, Test, TestPaper
+
+PAPER_CACHE_TIMEOUT = 60 * 60 * 24
+CHOICE_TYPES = ('multiple_choice', 'true_false')
+PAPER = 'paper'
+ANSWER_KEY = 'answer_key'
+
+
+def paper_cache_key(test_id, version, part=PAPER):
+    return f'examinations:test_paper:{test_id}:{version}:{part}'
+
+
+def paper_etag(test_id, version, *extra):
+    return quote_etag('-'.join(str(part) for part in (test_id, f'v{version}', *extra)))
+
+
+def to_json(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'))
+
+
+def compile_questions(test_id):
+    """``(questions, answer_key)`` for ``test_id`` as it stands in the database"""
+    answers = {}
+    rows = Answer.objects.filter(question__test_id=test_id).order_by('order', 'pk').values_list(
+        'id', 'question_id', 'answer_text', 'is_correct'
+    )
+    for answer_id, question_id, answer_text, is_correct in rows:
+        answers.setdefault(question_id, []).append((answer_id, answer_text, is_correct))
+
+    questions, answer_key = [], []
+    rows = Question.objects.filter(test_id=test_id).order_by('order').values(
+        'id', 'question_text', 'question_type', 'points', 'order', 'image', 'is_required', 'time_limit_seconds'
+    )
+    for question in rows:
+        choices = answers.get(question['id'], [])
+        question['points'] = str(question['points'])
+        question['image'] = default_storage.url(question['image']) if question['image'] else None
+        answer_key.append({
+            'id': question['id'], 'question_type': question['question_type'], 'points': question['points'],
+            'answers': [
+                {'id': answer_id, 'answer_text': text, 'is_correct': is_correct}
+                for answer_id, text, is_correct in choices
+            ],
+        })
+        if question['question_type'] in CHOICE_TYPES:
+            question['answers'] = [{'id': answer_id, 'answer_text': text} for answer_id, text, _ in choices]
+        elif question['question_type'] == 'matching':
+            pairs = [text.partition(MATCHING_SEPARATOR) for _, text, is_correct in choices if is_correct]
+            question['prompts'] = [prompt.strip() for prompt, _, _ in pairs]
+            question['matches'] = sorted(match.strip() for _, _, match in pairs)
+        questions.append(question)
+    return questions, answer_key
+
+
+def compile_test_paper(test_id):
+    """
+    Write a new TestPaper version for ``test_id`` unless its questions are
+    unchanged since the latest one. Returns the current TestPaper, or None
+    if the test no longer exists.
+    """
+    with transaction.atomic():
+        test = Test.objects.select_for_update().filter(pk=test_id).only('id', 'paper_version').first()
+        if test is None:
+            return None
+        questions, answer_key = compile_questions(test_id)
+        content_hash = hashlib.sha256(to_json([questions, answer_key]).encode()).hexdigest()
+
+        latest = TestPaper.objects.filter(test_id=test_id).only('version', 'content_hash').order_by('-version').first()
+        if latest is not None and latest.content_hash == content_hash:
+            paper = latest
+        else:
+            version = (latest.version if latest else 0) + 1
+            contents = {
+                PAPER: {'test_id': test_id, 'version': version, 'questions': questions},
+                ANSWER_KEY: {'test_id': test_id, 'version': version, 'questions': answer_key},
+            }
+            paper = TestPaper.objects.create(
+                test_id=test_id, version=version, content_hash=content_hash, **contents
+            )
+            cache.set_many(
+                {paper_cache_key(test_id, version, part): data for part, data in contents.items()},
+                PAPER_CACHE_TIMEOUT,
+            )
+
+        if test.paper_version != paper.version:
+            Test.objects.filter(pk=test_id).update(paper_version=paper.version)
+    return paper
+
+
+def current_paper_version(test):
+    """``test``'s latest paper version, compiling the first one if needed"""
+    if not test.paper_version:
+        test.paper_version = compile_test_paper(test.pk).version
+    return test.paper_version
+
+
+def get_paper(test_id, version, part=PAPER):
+    """The ``part`` (PAPER or ANSWER_KEY) of version ``version``, from the cache or database"""
+    key = paper_cache_key(test_id, version, part)
+    data = cache.get(key)
+    if data is None:
+        data = TestPaper.objects.filter(test_id=test_id, version=version).values_list(part, flat=True).first()
+        if data is None:
+            raise TestPaper.DoesNotExist(f'Test {test_id} has no paper version {version}')
+        cache.set(key, data, PAPER_CACHE_TIMEOUT)
+    return data
+
+
+def schedule_compile(test_id):
+    transaction.on_commit(lambda: compile_test_paper(test_id))
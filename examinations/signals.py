@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .grading import grade_attempt, invalidate_grading_scale
+from .models import Answer, GradeBoundary, Question, Test, TestAttempt
+from .papers import schedule_compile
+
+
+@receiver(post_save, sender=TestAttempt)
+def auto_grade_submitted_attempt(sender, instance, **kwargs):
+    # grade_attempts writes with bulk_update, so this doesn't fire again
+    if instance.is_submitted and not instance.is_graded:
+        transaction.on_commit(lambda: grade_attempt(instance))
+
+
+@receiver(post_save, sender=Test)
+def compile_published_test(sender, instance, **kwargs):
+    # A no-op when the questions haven't changed since the latest version
+    if instance.is_published:
+        schedule_compile(instance.pk)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def recompile_for_question(sender, instance, **kwargs):
+    if Test.objects.filter(pk=instance.test_id, is_published=True).exists():
+        schedule_compile(instance.test_id)
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def recompile_for_answer(sender, instance, **kwargs):
+    test_id = Question.objects.filter(pk=instance.question_id, test__is_published=True).values_list(
+        'test_id', flat=True
+    ).first()
+    if test_id is not None:
+        schedule_compile(test_id)
+
+
+@receiver(post_save, sender=GradeBoundary)
+@receiver(post_delete, sender=GradeBoundary)
+def grading_scale_changed(sender, instance, **kwargs):
+    invalidate_grading_scale()
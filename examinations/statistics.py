@@ -0,0 +1,90 @@
+"""
+Exam result statistics for an exam, a course or a teacher.
+
+Counts, pass rate, mean, extremes and standard deviation come from one
+aggregate query. Pass/fail compares each score with its own exam's
+``passing_marks`` in SQL. Median, quartiles and the histogram need the
+distribution, so the graded percentages are fetched once with
+``values_list`` and summarized with NumPy. Percentages are used for the
+distribution so that exams with different ``max_marks`` can be combined.
+"""
+
+import numpy as np
+from django.db.models import Avg, Count, F, Max, Min, Q, StdDev
+
+from .models import ExamResult
+
+DEFAULT_HISTOGRAM_BINS = 10
+MAX_HISTOGRAM_BINS = 100
+QUARTILES = (25, 50, 75)
+
+
+def as_float(value, digits=2):
+    return round(float(value), digits) if value is not None else None
+
+
+def histogram(percentages, bins=DEFAULT_HISTOGRAM_BINS):
+    """``bins`` equal buckets over 0-100; the top bucket also holds 100 and anything above"""
+    edges = np.linspace(0, 100, bins + 1)
+    counts, _ = np.histogram(np.clip(percentages, 0, 100), bins=edges)
+    return [
+        {'range': f'{low:g}-{high:g}', 'count': int(count)}
+        for low, high, count in zip(edges[:-1], edges[1:], counts)
+    ]
+
+
+def result_statistics(results, bins=DEFAULT_HISTOGRAM_BINS):
+    """Statistics over the ExamResult queryset ``results``"""
+    graded = Q(is_graded=True, score__isnull=False)
+    totals = results.aggregate(
+        total_results=Count('id'),
+        total_students=Count('student', distinct=True),
+        graded_count=Count('id', filter=graded),
+        passed_count=Count('id', filter=graded & Q(score__gte=F('exam__passing_marks'))),
+        average_score=Avg('score', filter=graded),
+        highest_score=Max('score', filter=graded),
+        lowest_score=Min('score', filter=graded),
+        mean_percentage=Avg('percentage', filter=graded),
+        stddev_percentage=StdDev('percentage', filter=graded),
+    )
+
+    graded_count = totals['graded_count']
+    stats = {
+        'total_results': totals['total_results'],
+        'total_students': totals['total_students'],
+        'graded_count': graded_count,
+        'pending_count': totals['total_results'] - graded_count,
+        'passed_count': totals['passed_count'],
+        'failed_count': graded_count - totals['passed_count'],
+        'pass_rate': round(totals['passed_count'] / graded_count * 100, 2) if graded_count else 0,
+        'average_score': as_float(totals['average_score']),
+        'highest_score': as_float(totals['highest_score']),
+        'lowest_score': as_float(totals['lowest_score']),
+        'mean_percentage': as_float(totals['mean_percentage']),
+        'stddev_percentage': as_float(totals['stddev_percentage']),
+        'median_percentage': None,
+        'quartiles': {},
+        'histogram': histogram(np.array([]), bins),
+    }
+
+    percentages = np.array(
+        results.filter(graded, percentage__isnull=False).values_list('percentage', flat=True), dtype=float
+    )
+    if percentages.size:
+        q1, median, q3 = np.percentile(percentages, QUARTILES)
+        stats['median_percentage'] = round(float(median), 2)
+        stats['quartiles'] = {'q1': round(float(q1), 2), 'q2': round(float(median), 2), 'q3': round(float(q3), 2)}
+        stats['histogram'] = histogram(percentages, bins)
+    return stats
+
+
+def exam_statistics(exam, bins=DEFAULT_HISTOGRAM_BINS):
+    return result_statistics(ExamResult.objects.filter(exam=exam), bins)
+
+
+def course_statistics(course, bins=DEFAULT_HISTOGRAM_BINS):
+    return result_statistics(ExamResult.objects.filter(exam__course=course), bins)
+
+
+def teacher_statistics(teacher, bins=DEFAULT_HISTOGRAM_BINS):
+    return result_statistics(ExamResult.objects.filter(exam__created_by=teacher), bins)
@@ -0,0 +1,177 @@
+"""
+Taking a test online: start, autosave and submit.
+
+Questions come from the test's compiled paper (``examinations.papers``).
+Each attempt records the paper version it started on and keeps seeing
+that version after later edits. Each attempt also gets a random
+``shuffle_seed`` when it starts. With ``shuffle_questions`` /
+``shuffle_answers`` the attempt's order is derived from that seed, so a
+student who reloads sees the same paper without anything being stored per
+attempt.
+
+Attempt limits hold under concurrent starts because of the database,
+not a count-then-insert check:
+
+- ``(test, student, attempt_number)`` is unique.
+- Only one unsubmitted attempt per test and student may exist.
+
+If two requests race for the same number, one gets an IntegrityError and
+resumes the attempt the other created.
+
+Autosave writes a batch of answers with one INSERT ... ON CONFLICT UPDATE.
+The server enforces the deadline: the earlier of ``started_at +
+time_limit_minutes`` and the test's ``available_until``. After the
+deadline (plus ``AUTOSAVE_GRACE_SECONDS`` for requests already in flight)
+answers are refused. An overdue attempt is submitted when the student
+next starts the test.
+"""
+
+import random
+import secrets
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import StudentAnswer, TestAttempt
+from .papers import current_paper_version, get_paper
+
+AUTOSAVE_GRACE_SECONDS = 30
+
+
+class AttemptError(ValueError):
+    pass
+
+
+def attempt_paper_version(test, attempt):
+    # Attempts started before papers were versioned get the current one
+    return attempt.paper_version or current_paper_version(test)
+
+
+def attempt_questions(test, attempt):
+    """``{question_id: question}`` from the paper version ``attempt`` was shown"""
+    paper = get_paper(test.pk, attempt_paper_version(test, attempt))
+    return {question['id']: question for question in paper['questions']}
+
+
+def attempt_paper(test, attempt):
+    """The questions of ``attempt``'s paper version, in its order"""
+    rng = random.Random(attempt.shuffle_seed)
+    paper = get_paper(test.pk, attempt_paper_version(test, attempt))
+    questions = [dict(question) for question in paper['questions']]
+    if test.shuffle_questions:
+        rng.shuffle(questions)
+    if test.shuffle_answers:
+        for question in questions:
+            for field in ('answers', 'matches'):
+                if field in question:
+                    question[field] = list(question[field])
+                    rng.shuffle(question[field])
+    return questions
+
+
+def attempt_deadline(test, attempt):
+    deadline = test.available_until
+    if test.time_limit_minutes:
+        deadline = min(deadline, attempt.started_at + timedelta(minutes=test.time_limit_minutes))
+    return deadline
+
+
+def start_attempt(test, student, ip_address=None, user_agent=''):
+    """
+    Start (or resume) ``student``'s attempt at ``test``. Returns
+    ``(attempt, created)``.
+    """
+    now = timezone.now()
+    if not test.is_published or not test.available_from <= now < test.available_until:
+        raise AttemptError('This test is not open')
+
+    attempts = TestAttempt.objects.filter(test=test, student=student)
+    current = attempts.filter(is_submitted=False).first()
+    if current is not None:
+        if now < attempt_deadline(test, current):
+            return current, False
+        submit_attempt(current)
+
+    number = (attempts.aggregate(last=Max('attempt_number'))['last'] or 0) + 1
+    if number > test.max_attempts:
+        raise AttemptError('No attempts left for this test')
+
+    try:
+        with transaction.atomic():
+            attempt = TestAttempt.objects.create(
+                test=test, student=student, attempt_number=number, started_at=now,
+                shuffle_seed=secrets.randbits(31), paper_version=current_paper_version(test),
+                ip_address=ip_address, user_agent=user_agent,
+            )
+    except IntegrityError:
+        # A concurrent request from the same student got there first
+        current = attempts.filter(is_submitted=False).first()
+        if current is None:
+            raise AttemptError('No attempts left for this test')
+        return current, False
+    return attempt, True
+
+
+def lock_open_attempt(attempt):
+    attempt = TestAttempt.objects.select_for_update().select_related('test').get(pk=attempt.pk)
+    if attempt.is_submitted:
+        raise AttemptError('This attempt has already been submitted')
+    return attempt
+
+
+def save_answers(attempt, items):
+    """
+    Upsert ``items`` (dicts with ``question`` and optionally
+    ``selected_answer``, ``text_answer``, ``time_spent_seconds``) into
+    ``attempt``'s answers in one statement. Returns how many were saved.
+    """
+    questions = attempt_questions(attempt.test, attempt)
+    latest = {}
+    for item in items:
+        question = questions.get(item['question'])
+        if question is None:
+            raise AttemptError(f'Question {item["question"]} is not part of this test')
+        selected = item.get('selected_answer')
+        if selected is not None and selected not in {answer['id'] for answer in question.get('answers', ())}:
+            raise AttemptError(f'Answer {selected} is not a choice for question {question["id"]}')
+        latest[question['id']] = item
+
+    now = timezone.now()
+    with transaction.atomic():
+        attempt = lock_open_attempt(attempt)
+        if now > attempt_deadline(attempt.test, attempt) + timedelta(seconds=AUTOSAVE_GRACE_SECONDS):
+            raise AttemptError('Time is up for this attempt')
+        StudentAnswer.objects.bulk_create(
+            [
+                StudentAnswer(
+                    attempt=attempt, question_id=question_id,
+                    selected_answer_id=item.get('selected_answer'),
+                    text_answer=item.get('text_answer') or '',
+                    time_spent_seconds=item.get('time_spent_seconds'),
+                    answered_at=now,
+                )
+                for question_id, item in latest.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['attempt', 'question'],
+            update_fields=['selected_answer', 'text_answer', 'time_spent_seconds', 'answered_at'],
+        )
+    return len(latest)
+
+
+def submit_attempt(attempt):
+    """Close ``attempt``; grading follows on commit (see ``examinations.signals``)"""
+    with transaction.atomic():
+        try:
+            attempt = lock_open_attempt(attempt)
+        except AttemptError:
+            return TestAttempt.objects.get(pk=attempt.pk)
+        submitted_at = min(timezone.now(), attempt_deadline(attempt.test, attempt))
+        attempt.submitted_at = submitted_at
+        attempt.time_taken_seconds = max(int((submitted_at - attempt.started_at).total_seconds()), 0)
+        attempt.is_submitted = True
+        attempt.is_completed = True
+        attempt.save(update_fields=['submitted_at', 'time_taken_seconds', 'is_submitted', 'is_completed', 'updated_at'])
+    return attempt
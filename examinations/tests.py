@@ -1,3 +1,489 @@
+import json
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from courses.models import CourseEnrollment
+from courses.tests import CourseFixturesMixin
+
+from .grading import bulk_grade_exam_results, grade_attempts, grade_letters, normalize_text
+from .models import (
+    Answer, Exam, ExamResult, GradeBoundary, Question, StudentAnswer, Test, TestAttempt, TestPaper
+)
+from .papers import ANSWER_KEY, get_paper
+from .statistics import exam_statistics, histogram, teacher_statistics
+
+
+class ExaminationFixturesMixin(CourseFixturesMixin):
+    """Shared builders for examination tests"""
+
+    def make_test(self, course, teacher, **kwargs):
+        now = timezone.now()
+        defaults = {
+            'available_from': now - timedelta(days=1), 'available_until': now + timedelta(days=1),
+            'time_limit_minutes': 30,
+        }
+        defaults.update(kwargs)
+        return Test.objects.create(title='Quiz', course=course, created_by=teacher, **defaults)
+
+    def make_question(self, test, question_type, answers=(), points=2):
+        question = Question.objects.create(
+            test=test, question_text='?', question_type=question_type, points=points,
+            order=test.questions.count() + 1,
+        )
+        for order, (text, is_correct) in enumerate(answers):
+            Answer.objects.create(question=question, answer_text=text, is_correct=is_correct, order=order)
+        return question
+
+    def make_exam(self, course, teacher, **kwargs):
+        return Exam.objects.create(
+            title='Midterm', course=course, subject='Maths', created_by=teacher, date=date(2024, 3, 4),
+            start_time=time(9), end_time=time(11), duration_minutes=120, **kwargs
+        )
+
+    def make_attempt(self, test, student, number=1, **kwargs):
+        return TestAttempt.objects.create(
+            test=test, student=student, attempt_number=number, started_at=timezone.now(), **kwargs
+        )
+
+
+class AutoGradingTests(ExaminationFixturesMixin, TestCase):
+    def setUp(self):
+        self.teacher = self.make_teacher()
+        self.course = self.make_course('Algebra', self.teacher)
+        self.test = self.make_test(self.course, self.teacher, total_points=10)
+        self.choice = self.make_question(self.test, 'multiple_choice', [('3', False), ('4', True)])
+        self.true_false = self.make_question(self.test, 'true_false', [('True', True), ('False', False)])
+        self.short = self.make_question(self.test, 'short_answer', [('Pythagoras', True), ('Pythagoras of Samos', True)])
+        self.matching = self.make_question(
+            self.test, 'matching', [('x^2 :: square', True), ('x^3 :: cube', True)]
+        )
+        self.essay = self.make_question(self.test, 'essay')
+        self.right = {answer.question_id: answer.pk for answer in Answer.objects.filter(is_correct=True)}
+
+    def answer_all(self, attempt, correct=True, essay=True):
+        wrong = Answer.objects.get(question=self.choice, is_correct=False)
+        StudentAnswer.objects.create(
+            attempt=attempt, question=self.choice,
+            selected_answer_id=self.right[self.choice.pk] if correct else wrong.pk,
+        )
+        StudentAnswer.objects.create(attempt=attempt, question=self.true_false, text_answer=' true ')
+        StudentAnswer.objects.create(attempt=attempt, question=self.short, text_answer='  PYTHAGORAS. ')
+        StudentAnswer.objects.create(
+            attempt=attempt, question=self.matching,
+            text_answer=json.dumps({'X^2': 'Square', 'x^3': 'square'}),
+        )
+        if essay:
+            StudentAnswer.objects.create(attempt=attempt, question=self.essay, text_answer='...')
+
+    def test_normalize_text(self):
+        self.assertEqual(normalize_text('  Ｈello   World!! '), 'hello world')
+
+    def test_scores_objective_questions_and_leaves_essays(self):
+        attempt = self.make_attempt(self.test, self.make_student('s1'))
+        self.answer_all(attempt)
+
+        grade_attempts(self.test, [attempt])
+
+        points = dict(StudentAnswer.objects.filter(attempt=attempt).values_list('question_id', 'points_earned'))
+        self.assertEqual(points[self.choice.pk], Decimal('2'))
+        self.assertEqual(points[self.true_false.pk], Decimal('2'))
+        self.assertEqual(points[self.short.pk], Decimal('2'))
+        self.assertEqual(points[self.matching.pk], Decimal('1'))
+        self.assertIsNone(points[self.essay.pk])
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.score, Decimal('7'))
+        self.assertEqual(attempt.percentage, Decimal('70'))
+        self.assertFalse(attempt.is_graded)
+
+    def test_attempt_without_essay_is_graded(self):
+        attempt = self.make_attempt(self.test, self.make_student('s1'))
+        self.answer_all(attempt, correct=False, essay=False)
+
+        grade_attempts(self.test, [attempt])
+
+        attempt.refresh_from_db()
+        self.assertTrue(attempt.is_graded)
+        self.assertIsNotNone(attempt.graded_at)
+        self.assertEqual(attempt.score, Decimal('5'))
+
+    def test_query_count_is_independent_of_attempt_count(self):
+        attempts = []
+        for i in range(5):
+            attempt = self.make_attempt(self.test, self.make_student(f's{i}'))
+            self.answer_all(attempt)
+            attempts.append(attempt)
+
+        with CaptureQueriesContext(connection) as queries:
+            grade_attempts(self.test, attempts)
+
+        self.assertLess(len(queries), 10)
+
+    def test_submitting_an_attempt_grades_it(self):
+        attempt = self.make_attempt(self.test, self.make_student('s1'))
+        self.answer_all(attempt, essay=False)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            attempt.is_submitted = True
+            attempt.save()
+
+        attempt.refresh_from_db()
+        self.assertTrue(attempt.is_graded)
+        self.assertEqual(attempt.score, Decimal('7'))
+
+    def test_regrade_command_applies_changed_key(self):
+        attempts = []
+        for i in range(3):
+            attempt = self.make_attempt(self.test, self.make_student(f's{i}'), is_submitted=True)
+            self.answer_all(attempt, correct=False, essay=False)
+            attempts.append(attempt)
+        grade_attempts(self.test, attempts)
+        Answer.objects.filter(question=self.choice).update(is_correct=True)
+
+        out = StringIO()
+        call_command('regrade_test', self.test.pk, '--batch-size', '2', stdout=out)
+
+        self.assertIn('in 3 attempts', out.getvalue())
+        self.assertEqual(
+            set(TestAttempt.objects.filter(test=self.test).values_list('score', flat=True)), {Decimal('7')}
+        )
+
+
+class TestTakingTests(ExaminationFixturesMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = self.make_teacher()
+        self.course = self.make_course('Algebra', self.teacher)
+        self.test = self.make_test(
+            self.course, self.teacher, is_published=True, max_attempts=2, total_points=4,
+            shuffle_questions=True, shuffle_answers=True,
+        )
+        self.choice = self.make_question(self.test, 'multiple_choice', [('3', False), ('4', True), ('5', False)])
+        self.short = self.make_question(self.test, 'short_answer', [('Pythagoras', True)])
+        self.student = self.make_student('s1')
+        CourseEnrollment.objects.create(student=self.student, course=self.course)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student.user)
+
+    def start(self):
+        return self.client.post(f'/api/examinations/tests/{self.test.pk}/start/')
+
+    def test_start_returns_paper_without_answer_key(self):
+        response = self.start()
+
+        self.assertEqual(response.status_code, 201)
+        questions = {question['id']: question for question in response.data['questions']}
+        self.assertEqual(set(questions), {self.choice.pk, self.short.pk})
+        self.assertNotIn('is_correct', questions[self.choice.pk]['answers'][0])
+        self.assertNotIn('answers', questions[self.short.pk])
+
+    def test_start_resumes_open_attempt_in_same_order(self):
+        first = self.start()
+        second = self.start()
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.data['attempt']['id'], second.data['attempt']['id'])
+        self.assertEqual(first.data['questions'], second.data['questions'])
+
+    def test_max_attempts_enforced(self):
+        for _ in range(2):
+            attempt_id = self.start().data['attempt']['id']
+            self.client.post(f'/api/examinations/test-attempts/{attempt_id}/submit/')
+
+        response = self.start()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(TestAttempt.objects.filter(test=self.test).count(), 2)
+
+    def test_one_open_attempt_per_student_in_database(self):
+        self.make_attempt(self.test, self.student, number=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.make_attempt(self.test, self.student, number=2)
+
+    def test_autosave_upserts_and_submit_grades(self):
+        attempt_id = self.start().data['attempt']['id']
+        correct = Answer.objects.get(question=self.choice, is_correct=True)
+        wrong = Answer.objects.filter(question=self.choice, is_correct=False).first()
+        url = f'/api/examinations/test-attempts/{attempt_id}/answers/'
+
+        self.client.post(url, {'answers': [
+            {'question': self.choice.pk, 'selected_answer': wrong.pk},
+            {'question': self.short.pk, 'text_answer': 'Euclid'},
+        ]}, format='json')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'answers': [
+                {'question': self.choice.pk, 'selected_answer': correct.pk},
+                {'question': self.short.pk, 'text_answer': 'pythagoras'},
+            ]}, format='json')
+
+        self.assertEqual(response.data, {'saved': 2})
+        self.assertEqual(sum('INSERT' in query['sql'] for query in queries), 1)
+        self.assertEqual(StudentAnswer.objects.filter(attempt_id=attempt_id).count(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/examinations/test-attempts/{attempt_id}/submit/')
+
+        self.assertEqual(response.status_code, 200)
+        attempt = TestAttempt.objects.get(pk=attempt_id)
+        self.assertTrue(attempt.is_submitted)
+        self.assertEqual(attempt.score, Decimal('4'))
+
+    def test_autosave_rejects_foreign_choice(self):
+        attempt_id = self.start().data['attempt']['id']
+        other = self.make_question(self.test, 'multiple_choice', [('x', True)])
+        foreign = Answer.objects.get(question=other)
+
+        response = self.client.post(f'/api/examinations/test-attempts/{attempt_id}/answers/', {
+            'answers': [{'question': self.choice.pk, 'selected_answer': foreign.pk}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_autosave_after_time_limit_is_refused(self):
+        attempt_id = self.start().data['attempt']['id']
+        TestAttempt.objects.filter(pk=attempt_id).update(started_at=timezone.now() - timedelta(hours=1))
+
+        response = self.client.post(f'/api/examinations/test-attempts/{attempt_id}/answers/', {
+            'answers': [{'question': self.short.pk, 'text_answer': 'late'}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StudentAnswer.objects.filter(attempt_id=attempt_id).exists())
+
+    def test_closed_test_cannot_be_started(self):
+        Test.objects.filter(pk=self.test.pk).update(available_until=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(self.start().status_code, 400)
+
+
+class TestPaperTests(ExaminationFixturesMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = self.make_teacher()
+        self.course = self.make_course('Algebra', self.teacher)
+        self.test = self.make_test(self.course, self.teacher)
+        self.question = self.make_question(self.test, 'multiple_choice', [('3', False), ('4', True)])
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher.user)
+
+    def publish(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test.is_published = True
+            self.test.save()
+        self.test.refresh_from_db()
+
+    def test_publishing_compiles_paper_and_key(self):
+        self.publish()
+
+        self.assertEqual(self.test.paper_version, 1)
+        paper = TestPaper.objects.get(test=self.test)
+        self.assertNotIn('is_correct', json.dumps(paper.paper['questions']))
+        key = get_paper(self.test.pk, 1, ANSWER_KEY)
+        self.assertEqual(
+            [answer['is_correct'] for answer in key['questions'][0]['answers']], [False, True]
+        )
+
+    def test_edits_bump_version_and_unchanged_saves_do_not(self):
+        self.publish()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test.save()
+        self.assertEqual(TestPaper.objects.filter(test=self.test).count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Answer.objects.filter(question=self.question, answer_text='3').get().delete()
+
+        self.test.refresh_from_db()
+        self.assertEqual(self.test.paper_version, 2)
+        self.assertEqual(len(get_paper(self.test.pk, 1)['questions'][0]['answers']), 2)
+        self.assertEqual(len(get_paper(self.test.pk, 2)['questions'][0]['answers']), 1)
+
+    def test_attempt_keeps_the_version_it_started_on(self):
+        self.publish()
+        student = self.make_student('s1')
+        CourseEnrollment.objects.create(student=student, course=self.course)
+        self.client.force_authenticate(student.user)
+        attempt_id = self.client.post(f'/api/examinations/tests/{self.test.pk}/start/').data['attempt']['id']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_question(self.test, 'short_answer', [('x', True)])
+
+        response = self.client.get(f'/api/examinations/test-attempts/{attempt_id}/paper/')
+        self.assertEqual(response.data['attempt']['paper_version'], 1)
+        self.assertEqual(len(response.data['questions']), 1)
+
+    def test_paper_served_with_etag(self):
+        self.publish()
+        url = f'/api/examinations/tests/{self.test.pk}/paper/'
+
+        response = self.client.get(url, {'version': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+
+        again = self.client.get(url, {'version': 1}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(self.client.get(url, {'version': 9}).status_code, 404)
+
+    def test_students_get_paper_only_once_open_and_never_the_key(self):
+        self.publish()
+        Test.objects.filter(pk=self.test.pk).update(available_from=timezone.now() + timedelta(hours=1))
+        student = self.make_student('s1')
+        CourseEnrollment.objects.create(student=student, course=self.course)
+        self.client.force_authenticate(student.user)
+
+        self.assertEqual(self.client.get(f'/api/examinations/tests/{self.test.pk}/paper/').status_code, 403)
+        self.assertEqual(self.client.get(f'/api/examinations/tests/{self.test.pk}/answer-key/').status_code, 403)
+
+        Test.objects.filter(pk=self.test.pk).update(available_from=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.client.get(f'/api/examinations/tests/{self.test.pk}/paper/').status_code, 200)
+
+
+class ExamGradingTests(ExaminationFixturesMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = self.make_teacher()
+        self.course = self.make_course('Algebra', self.teacher)
+        self.exam = self.make_exam(self.course, self.teacher, max_marks=80)
+        self.results = [
+            ExamResult.objects.create(exam=self.exam, student=self.make_student(f's{i}')) for i in range(6)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher.user)
+
+    def test_grade_letters_follow_scale_table(self):
+        self.assertEqual(grade_letters([95, 90, 89.99, 50, 12.5]), ['A+', 'A+', 'A', 'C-', 'F'])
+
+        GradeBoundary.objects.all().delete()
+        GradeBoundary.objects.create(letter='P', min_percentage=40)
+        GradeBoundary.objects.create(letter='U', min_percentage=0)
+
+        self.assertEqual(grade_letters([40, 39]), ['P', 'U'])
+        result = self.results[0]
+        result.score = 32
+        result.save()
+        self.assertEqual(result.grade_letter, 'P')
+
+    def test_bulk_grade_computes_percentage_and_letter(self):
+        scores = [80, 72, 60, 44, 20, 0]
+        items = [{'result_id': result.pk, 'score': score} for result, score in zip(self.results, scores)]
+
+        with CaptureQueriesContext(connection) as queries:
+            bulk_grade_exam_results(self.exam, items, grader=self.teacher)
+
+        self.assertLess(len(queries), 8)
+        graded = ExamResult.objects.filter(exam=self.exam).order_by('pk')
+        self.assertEqual(
+            [(result.percentage, result.grade_letter) for result in graded],
+            [(Decimal('100'), 'A+'), (Decimal('90'), 'A+'), (Decimal('75'), 'B+'),
+             (Decimal('55'), 'C'), (Decimal('25'), 'F'), (Decimal('0'), 'F')],
+        )
+        self.assertTrue(all(result.is_graded and result.graded_by_id == self.teacher.pk for result in graded))
+
+    def test_bulk_grade_without_grader_keeps_scores(self):
+        result = self.results[0]
+        ExamResult.objects.filter(pk=result.pk).update(score=40)
+
+        bulk_grade_exam_results(self.exam, [{'result_id': result.pk, 'score': 80, 'grade_comment': 'ok'}])
+
+        result.refresh_from_db()
+        self.assertEqual(result.score, Decimal('40'))
+        self.assertEqual(result.grade_comment, 'ok')
+
+    def test_bulk_grade_endpoint_ignores_other_exams(self):
+        other = ExamResult.objects.create(exam=self.make_exam(self.course, self.teacher), student=self.make_student('x'))
+
+        response = self.client.post(f'/api/examinations/exams/{self.exam.pk}/bulk_grade/', {'exam_results': [
+            {'result_id': self.results[0].pk, 'score': 40},
+            {'result_id': other.pk, 'score': 40},
+        ]}, format='json')
+
+        self.assertEqual(response.data['updated_count'], 1)
+        other.refresh_from_db()
+        self.assertIsNone(other.score)
+
+    def test_bulk_grade_endpoint_rejects_non_finite_and_out_of_range_scores(self):
+        url = f'/api/examinations/exams/{self.exam.pk}/bulk_grade/'
+        for score in ['inf', 'nan', -1, self.exam.max_marks + 1]:
+            response = self.client.post(url, {'exam_results': [
+                {'result_id': self.results[0].pk, 'score': score},
+            ]}, format='json')
+            self.assertEqual(response.status_code, 400, score)
+
+        self.results[0].refresh_from_db()
+        self.assertIsNone(self.results[0].score)
+
+
+class ExamStatisticsTests(ExaminationFixturesMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = self.make_teacher()
+        self.course = self.make_course('Algebra', self.teacher)
+        self.exam = self.make_exam(self.course, self.teacher, max_marks=50, passing_marks=25)
+        scores = [50, 40, 30, 20, 10]
+        for i, score in enumerate(scores):
+            ExamResult.objects.create(
+                exam=self.exam, student=self.make_student(f's{i}'), score=score, is_graded=True,
+                graded_by=self.teacher,
+            )
+        ExamResult.objects.create(exam=self.exam, student=self.make_student('pending'))
+        self.admin = get_user_model().objects.create_user(username='admin', email='admin@example.com', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_exam_statistics(self):
+        stats = exam_statistics(self.exam, bins=5)
+
+        self.assertEqual(stats['total_results'], 6)
+        self.assertEqual(stats['pending_count'], 1)
+        self.assertEqual((stats['passed_count'], stats['failed_count']), (3, 2))
+        self.assertEqual(stats['pass_rate'], 60.0)
+        self.assertEqual(stats['average_score'], 30.0)
+        self.assertEqual(stats['median_percentage'], 60.0)
+        self.assertEqual(stats['quartiles'], {'q1': 40.0, 'q2': 60.0, 'q3': 80.0})
+        self.assertAlmostEqual(stats['stddev_percentage'], 28.28, places=2)
+        self.assertEqual([bucket['count'] for bucket in stats['histogram']], [0, 1, 1, 1, 2])
+
+    def test_pass_mark_is_per_exam(self):
+        strict = self.make_exam(self.course, self.teacher, max_marks=50, passing_marks=45)
+        ExamResult.objects.create(exam=strict, student=self.make_student('t'), score=40, is_graded=True)
+
+        stats = teacher_statistics(self.teacher)
+
+        self.assertEqual((stats['graded_count'], stats['passed_count']), (6, 3))
+
+    def test_histogram_top_bucket_holds_100_and_bonus(self):
+        self.assertEqual([bucket['count'] for bucket in histogram([0, 99.5, 100, 104], 2)], [1, 3])
+
+    def test_statistics_endpoint_filters_by_course(self):
+        other = self.make_course('Geometry', self.teacher)
+        self.make_exam(other, self.teacher)
+
+        response = self.client.get('/api/examinations/exams/statistics/', {'course': self.course.pk, 'bins': 4})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_exams'], 1)
+        self.assertEqual(response.data['pass_rate'], 60.0)
+        self.assertEqual(len(response.data['histogram']), 4)
+        self.assertEqual(response.data['recent_exams'][0]['average_score'], 30)
+
+    def test_exam_list_query_count_is_constant(self):
+        def list_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/api/examinations/exams/')
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        baseline = list_queries()
+        for _ in range(3):
+            exam = self.make_exam(self.course, self.teacher)
+            ExamResult.objects.create(exam=exam, student=self.make_student(f'x{exam.pk}'), score=5, is_graded=True)
 
-# Create your tests here.
+        self.assertEqual(list_queries(), baseline)
@@ -23,7 +23,7 @@ class StudentSerializer(serializers.ModelSerializer):
         model = Student
         fields = [
             'id', 'user', 'student_id', 'date_of_birth', 'grade', 
-            'address', 'parent_name', 'parent_contact', 'user_details', 'full_name'
+            'address', 'parent_name', 'parent_contact', 'class_group', 'user_details', 'full_name'
         ]
         read_only_fields = ['id', 'user']
     
@@ -47,7 +47,7 @@ class StudentCreateSerializer(serializers.ModelSerializer):
         model = Student
         fields = [
             'user', 'student_id', 'date_of_birth', 'grade',
-            'address', 'parent_name', 'parent_contact'
+            'address', 'parent_name', 'parent_contact', 'class_group'
         ]
     
     def create(self, validated_data):
@@ -81,7 +81,7 @@ class StudentDetailSerializer(serializers.ModelSerializer):
         model = Student
         fields = [
             'id', 'user', 'student_id', 'date_of_birth', 'grade',
-            'address', 'parent_name', 'parent_contact', 'full_name',
+            'address', 'parent_name', 'parent_contact', 'class_group', 'full_name',
             'academic_records'
         ]
         read_only_fields = ['id', 'user']
@@ -10,6 +10,9 @@ class Student(models.Model):
     address = models.TextField()
     parent_name = models.CharField(max_length=100)
     parent_contact = models.CharField(max_length=20)
+    class_group = models.ForeignKey(
+        'teachers.Class', on_delete=models.SET_NULL, null=True, blank=True, related_name='students'
+    )
 
     def __str__(self):
         return f"{self.user.get_full_name()} ({self.student_id})"